@@ -3,9 +3,8 @@ import time
 import os
 import sys
 import json
-import sqlite3
 from datetime import datetime, timedelta
-from typing import Dict, Any
+from typing import Any
 
 from fastapi import FastAPI, Request, Depends, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
@@ -79,10 +78,6 @@ def get_seat_limit(plan: str) -> int:
 import database
 from database import (
     init_db, save_trends, get_latest_trends,
-    migrate_add_niche_column,
-    migrate_context_column,
-    migrate_content_library_columns,
-    seed_question_bank,
     library_save, library_get_all, library_get_item,
     library_update, library_delete,
     schedule_upsert, schedules_get_all, schedule_get,
@@ -92,11 +87,11 @@ from database import (
     generate_compliance_pdf,
     get_compliance_records,
     get_compliance_records_for_broker,
-    backfill_compliance_records,
     get_broker_office_stats,
     get_broker_agent_content,
     get_team_stats,
     save_agent_setup, get_agent_setup,
+    bump_public_version, refresh_post_slug, _compliance_verdict,
     get_user_results,
     market_report_save, market_report_list,
     market_report_get, market_report_update_extracted,
@@ -114,7 +109,6 @@ from database import (
     cancel_subscription,
     get_subscription_status,
     _compute_next_billing_reset,
-    DB_NAME,
     # Video Identity — Session 49
     profile_photo_save,
     profile_photo_get_path,
@@ -148,16 +142,11 @@ from database import (
     partner_remove_override,
 )
 
-# ── Safe fallback in case database.py is older version ──
-try:
-    from database import migrate_context_column
-except ImportError:
-    def migrate_context_column():
-        print("[Startup] migrate_context_column not available in this database.py version")
-
 from auth import router as auth_router, get_current_user, forbid_demo
-from content_engine import router as content_engine_router, admin_router as compliance_admin_router, generate_content_core, hb_marketing_router, run_public_compliance_check
+from content_engine import router as content_engine_router, admin_router as compliance_admin_router, generate_content_core, hb_marketing_router, run_public_compliance_check, run_blocking, _llm_create
 from social import router as social_router
+from rate_limit import SlidingWindowLimiter
+from http_clients import upstream_client
 
 
 
@@ -375,6 +364,13 @@ def _run_r2_backup(db_path, bucket, endpoint_url, access_key, secret_key, retain
     timestamp = now.strftime("%Y-%m-%d-%H%M%S")
     key       = f"homebridge-{timestamp}.db"
 
+    # WAL mode: recent commits may still live in homebridge.db-wal. Checkpoint
+    # first so the single uploaded file is a complete, restorable database.
+    try:
+        database.checkpoint_wal()
+    except Exception as _ckpt_err:
+        print(f"[R2Backup] WAL checkpoint failed (uploading anyway): {_ckpt_err}")
+
     try:
         with open(db_path, "rb") as f:
             s3.upload_fileobj(f, bucket, key)
@@ -416,18 +412,23 @@ async def startup_event():
     except Exception as _sa_e:
         print(f"[Startup] Super admin check: {_sa_e}")
     print("[Startup] Initializing database...")
-    init_db()
-    migrate_add_niche_column()
-    migrate_content_library_columns()
-    migrate_context_column()  # safe no-op if column already exists
+    init_db()  # runs only the pending steps in database.MIGRATIONS
     try:
-        seed_question_bank()  # DQ-1 — idempotent, skips questions already present
-    except Exception as _sqb_e:
-        print(f"[Startup] question_bank seed skipped: {_sqb_e}")
+        _vb_filled = database.backfill_content_verdicts()
+        if _vb_filled:
+            print(f"[Startup] Compliance verdicts backfilled for {_vb_filled} library item(s).")
+    except Exception as _vb_e:
+        print(f"[Startup] Verdict backfill deferred: {_vb_e}")
     try:
-        backfill_compliance_records()  # one-time, skips already-present records
-    except Exception as _bf_e:
-        print(f"[Startup] compliance_records backfill skipped: {_bf_e}")
+        from content_engine import SEMANTIC_CACHE_TTL_DAYS, _get_rules_version_and_dates
+        _sc_removed = database.semantic_cache_purge(
+            keep_rules_version=_get_rules_version_and_dates()[0],
+            max_age_days=SEMANTIC_CACHE_TTL_DAYS,
+        )
+        if _sc_removed:
+            print(f"[Startup] Semantic review cache: purged {_sc_removed} stale row(s).")
+    except Exception as _sc_e:
+        print(f"[Startup] Semantic review cache purge skipped: {_sc_e}")
     print("[Startup] Starting content scheduler...")
     t2 = threading.Thread(target=content_scheduler_worker, daemon=True)
     t2.start()
@@ -440,6 +441,21 @@ async def startup_event():
             print(f"[Startup] Signal collector failed to start: {e}")
     else:
         print("[Startup] Signal collector DISABLED (SIGNAL_ENABLED=false) — set env var to true to enable.")
+    print("[Startup] Starting notification dispatcher...")
+    try:
+        from notifications import start_notification_dispatcher
+        start_notification_dispatcher()
+    except Exception as e:
+        print(f"[Startup] Notification dispatcher failed to start: {e}")
+    print("[Startup] Starting distribution drip worker...")
+    try:
+        from distribution_worker import DISTRIBUTION_ENABLED, start_distribution_worker
+        if DISTRIBUTION_ENABLED:
+            start_distribution_worker()
+        else:
+            print("[Startup] Distribution drip worker DISABLED (DISTRIBUTION_ENABLED=false).")
+    except Exception as e:
+        print(f"[Startup] Distribution drip worker failed to start: {e}")
     print("[Startup] Starting quarterly partner tier evaluator...")
     t3 = threading.Thread(target=quarterly_evaluator_worker, daemon=True)
     t3.start()
@@ -818,7 +834,8 @@ async def generate_from_signal(body: GenerateFromSignalRequest, current_user=Dep
             _sit_pool = NICHE_SITUATIONS.get(niche) or DEFAULT_SITUATIONS
             situation = _random.choice(_sit_pool)
 
-        result = generate_content_core(
+        result = await run_blocking(
+            generate_content_core,
             agent_name           = user_row["agent_name"],
             brokerage            = user_row["brokerage"],
             market               = setup.get("market", ""),
@@ -979,7 +996,7 @@ async def generate_from_answer_route(body: dict, current_user=Depends(get_curren
     answer_id = body.get("answer_id")
     if not answer_id:
         raise HTTPException(status_code=400, detail="answer_id is required.")
-    result = _run_foundation_generation(current_user["id"], answer_id)
+    result = await run_blocking(_run_foundation_generation, current_user["id"], answer_id)
     if not result.get("ok"):
         raise HTTPException(status_code=result.get("status", 500), detail=result.get("error", "Generation failed."))
     return result
@@ -1136,6 +1153,7 @@ async def foundation_paste_samples(body: dict, current_user=Depends(get_current_
             "UPDATE content_library SET status = 'approved', approved_at = ? WHERE id = ? AND user_id = ?",
             (datetime.utcnow().isoformat(), item["id"], user_id),
         )
+        bump_public_version(user_id, conn)
         conn.commit()
         conn.close()
         saved_ids.append(item["id"])
@@ -1412,27 +1430,27 @@ def _send_batch_notification(payload: dict) -> dict:
         }
     # ---- Stage H ONLY (currently unreachable: BATCH_NOTIFY_ENABLED is False) -------
     # ONE email + at most ONE SMS per batch day. Consolidated, never per-item.
-    import asyncio
-    from social import send_approval_email, send_approval_sms
+    # Queued to the notification dispatcher, which delivers and retries.
+    from notifications import enqueue_approval_email, enqueue_approval_sms
     sent = {"email": False, "sms": False}
     to_email = payload.get("to_email", "")
     if to_email:
         try:
-            asyncio.run(send_approval_email(
+            enqueue_approval_email(
                 to_email, payload.get("agent_name", "there"),
-                payload.get("subject", ""), payload.get("review_url", "")))
+                payload.get("subject", ""), payload.get("review_url", ""))
             sent["email"] = True
         except Exception as e:
-            print(f"[BatchNotify] email failed: {e}")
+            print(f"[BatchNotify] email enqueue failed: {e}")
     phone = payload.get("phone", "")
     if phone:
         try:
-            asyncio.run(send_approval_sms(
+            enqueue_approval_sms(
                 phone, payload.get("agent_name", "there"),
-                payload.get("subject", ""), payload.get("review_url", "")))
+                payload.get("subject", ""), payload.get("review_url", ""))
             sent["sms"] = True
         except Exception as e:
-            print(f"[BatchNotify] sms failed: {e}")
+            print(f"[BatchNotify] sms enqueue failed: {e}")
     return {"sent": True, "channels": sent}
 
 
@@ -1474,6 +1492,75 @@ def run_batch_notifications_once() -> list:
 _scheduler_started = False
 _scheduler_start_lock = threading.Lock()
 
+# Scheduled generation runs on a bounded worker pool: one job per user (so a
+# user's niches still run in order and produce ONE consolidated notification),
+# many users in parallel. The Claude calls inside each job additionally go
+# through content_engine's global LLM_MAX_INFLIGHT limit.
+SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", "8"))
+
+# Last completed cycle — read by /admin/scheduler-stats.
+_scheduler_metrics: dict = {}
+_scheduler_metrics_lock = threading.Lock()
+
+
+def _run_scheduled_users_concurrently(by_user: dict) -> dict:
+    """
+    Process {user_id: [sched, ...]} on a bounded ThreadPoolExecutor, logging
+    queue depth as jobs finish and per-job latency. Returns cycle metrics.
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    total = len(by_user)
+    if not total:
+        return {}
+    cycle_start = time.monotonic()
+    state = {"running": 0, "waiting": total}
+    state_lock = threading.Lock()
+
+    def _job(user_id, scheds):
+        with state_lock:
+            state["waiting"] -= 1
+            state["running"] += 1
+        t0 = time.monotonic()
+        ok = True
+        try:
+            _run_scheduled_generation_for_user(user_id, scheds)
+        except Exception as e:
+            ok = False
+            print(f"[Scheduler] ✗ Job for user {user_id} raised: {e}")
+        finally:
+            with state_lock:
+                state["running"] -= 1
+        return time.monotonic() - t0, ok
+
+    workers = max(1, min(SCHEDULER_WORKERS, total))
+    print(f"[Scheduler] Dispatching {total} user job(s) across {workers} worker(s).")
+    latencies, failures = [], 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sched-gen") as pool:
+        futures = {pool.submit(_job, uid, scheds): uid for uid, scheds in by_user.items()}
+        for fut in as_completed(futures):
+            uid = futures[fut]
+            elapsed, ok = fut.result()
+            latencies.append(elapsed)
+            failures += 0 if ok else 1
+            with state_lock:
+                waiting, running = state["waiting"], state["running"]
+            print(f"[Scheduler] User {uid} job finished in {elapsed:.1f}s "
+                  f"({len(latencies)}/{total} done, {running} running, {waiting} queued)")
+
+    latencies.sort()
+    metrics = {
+        "finished_at":   datetime.utcnow().isoformat(),
+        "jobs":          total,
+        "failed":        failures,
+        "workers":       workers,
+        "cycle_seconds": round(time.monotonic() - cycle_start, 2),
+        "job_p50_seconds": round(latencies[len(latencies) // 2], 2),
+        "job_max_seconds": round(latencies[-1], 2),
+    }
+    print(f"[Scheduler] Cycle complete: {metrics}")
+    return metrics
+
 
 def content_scheduler_worker():
     global _scheduler_started
@@ -1515,8 +1602,11 @@ def content_scheduler_worker():
             by_user = defaultdict(list)
             for sched in due:
                 by_user[sched["user_id"]].append(sched)
-            for user_id, scheds in by_user.items():
-                _run_scheduled_generation_for_user(user_id, scheds)
+            if by_user:
+                metrics = _run_scheduled_users_concurrently(by_user)
+                with _scheduler_metrics_lock:
+                    _scheduler_metrics.clear()
+                    _scheduler_metrics.update(metrics)
         except Exception as e:
             print(f"[Scheduler] Error in worker: {e}")
         time.sleep(15 * 60)
@@ -1607,8 +1697,7 @@ def _run_scheduled_generation(sched: dict):
         # Create a one-time approval token and send the link so the agent
         # can review and approve directly from their phone or inbox.
         try:
-            from social import send_approval_email, send_approval_sms
-            import asyncio
+            from notifications import enqueue_approval_email, enqueue_approval_sms
 
             item_id    = saved_item.get("id")
             token      = create_approval_token(user_id, item_id)
@@ -1626,19 +1715,19 @@ def _run_scheduled_generation(sched: dict):
                 to_email = user_row["notification_email"] if user_row["notification_email"] else user_row["email"]
             if to_email:
                 try:
-                    asyncio.run(send_approval_email(to_email, agent_name, headline, approve_url))
-                    print(f"[Scheduler] ✓ Approval email sent to {to_email}")
+                    enqueue_approval_email(to_email, agent_name, headline, approve_url)
+                    print(f"[Scheduler] ✓ Approval email queued for {to_email}")
                 except Exception as email_err:
-                    print(f"[Scheduler] ✗ Email failed: {email_err}")
+                    print(f"[Scheduler] ✗ Email enqueue failed: {email_err}")
 
             # SMS — use phone from user record, fall back to setup approvalPhone
             phone = (user_row["phone"] if user_row else "") or setup.get("approvalPhone", "") or setup.get("phone", "")
             if phone:
                 try:
-                    asyncio.run(send_approval_sms(phone, agent_name, headline, approve_url))
-                    print(f"[Scheduler] ✓ Approval SMS sent to {phone}")
+                    enqueue_approval_sms(phone, agent_name, headline, approve_url)
+                    print(f"[Scheduler] ✓ Approval SMS queued for {phone}")
                 except Exception as sms_err:
-                    print(f"[Scheduler] ✗ SMS failed (check Twilio env vars): {sms_err}")
+                    print(f"[Scheduler] ✗ SMS enqueue failed: {sms_err}")
             else:
                 print(f"[Scheduler] No phone on file for user {user_id} — SMS skipped.")
 
@@ -1825,8 +1914,7 @@ def _run_scheduled_generation_for_user(user_id: int, scheds: list):
         return
 
     try:
-        from social import send_approval_email, send_approval_sms
-        import asyncio
+        from notifications import enqueue_approval_email, enqueue_approval_sms
         from database import get_conn as _gc2, create_approval_token
 
         conn2 = _gc2()
@@ -1859,17 +1947,17 @@ def _run_scheduled_generation_for_user(user_id: int, scheds: list):
 
         if to_email:
             try:
-                asyncio.run(send_approval_email(to_email, agent_name, headline_for_email, approve_url))
-                print(f"[Scheduler] ✓ Consolidated approval email sent to {to_email} ({len(saved_items)} item(s))")
+                enqueue_approval_email(to_email, agent_name, headline_for_email, approve_url)
+                print(f"[Scheduler] ✓ Consolidated approval email queued for {to_email} ({len(saved_items)} item(s))")
             except Exception as email_err:
-                print(f"[Scheduler] ✗ Email failed: {email_err}")
+                print(f"[Scheduler] ✗ Email enqueue failed: {email_err}")
 
         if phone:
             try:
-                asyncio.run(send_approval_sms(phone, agent_name, headline_for_email, approve_url))
-                print(f"[Scheduler] ✓ Approval SMS sent to {phone}")
+                enqueue_approval_sms(phone, agent_name, headline_for_email, approve_url)
+                print(f"[Scheduler] ✓ Approval SMS queued for {phone}")
             except Exception as sms_err:
-                print(f"[Scheduler] ✗ SMS failed: {sms_err}")
+                print(f"[Scheduler] ✗ SMS enqueue failed: {sms_err}")
 
     except Exception as notify_err:
         print(f"[Scheduler] ✗ Notification error (content was saved): {notify_err}")
@@ -1882,7 +1970,7 @@ async def latest_trends():
 
 @app.get("/trends/by-niche")
 async def trends_by_niche(niche: str):
-    conn = sqlite3.connect(DB_NAME)
+    conn = database.get_conn()
     c = conn.cursor()
     c.execute("SELECT source, topic, collected_at FROM trends WHERE niche = ? ORDER BY collected_at DESC LIMIT 200", (niche,))
     rows = c.fetchall()
@@ -1977,6 +2065,7 @@ async def save_setup(body: SetupSaveRequest, current_user=Depends(get_current_us
             _auto_slug = f"{_auto_slug}-{current_user['id']}"
         _c_s.execute("UPDATE users SET agent_slug = ? WHERE id = ?",
                      (_auto_slug, current_user["id"]))
+        bump_public_version(current_user["id"], _conn_s)
 
     _conn_s.commit()
     _conn_s.close()
@@ -2321,7 +2410,6 @@ async def invite_agent(request: Request, current_user=Depends(get_current_user))
     sendgrid_from = os.getenv("SENDGRID_FROM_EMAIL", "support@homebridgegroup.co")
     if sendgrid_key:
         try:
-            import httpx as _httpx
             html_body = f"""
 <div style="font-family:sans-serif;max-width:560px;margin:0 auto;padding:32px 24px;">
   <div style="font-size:22px;font-weight:700;color:#1a1a1a;margin-bottom:8px;">You're invited to HomeBridge</div>
@@ -2342,11 +2430,12 @@ async def invite_agent(request: Request, current_user=Depends(get_current_user))
                 "subject": f"{inviter_name} invited you to HomeBridge",
                 "content": [{"type": "text/html", "value": html_body}],
             }
-            r = await _httpx.AsyncClient().post(
-                "https://api.sendgrid.com/v3/mail/send",
-                headers={"Authorization": f"Bearer {sendgrid_key}", "Content-Type": "application/json"},
-                json=payload, timeout=10,
-            )
+            async with upstream_client("sendgrid", timeout=10) as client:
+                r = await client.post(
+                    "https://api.sendgrid.com/v3/mail/send",
+                    headers={"Authorization": f"Bearer {sendgrid_key}", "Content-Type": "application/json"},
+                    json=payload,
+                )
             email_sent = r.status_code in (200, 202)
         except Exception as e:
             print(f"[Invite] Email send failed: {e}")
@@ -2590,7 +2679,7 @@ async def public_agent_profile(user_id: int):
         month_ago = (now - timedelta(days=30)).isoformat()
 
         c.execute("""
-            SELECT id, status, approved_at, published_at, niche, content, cir_id, compliance
+            SELECT id, status, approved_at, published_at, niche, content, cir_id, verdict
             FROM content_library
             WHERE user_id = ? AND status IN ('approved','published')
             ORDER BY approved_at DESC
@@ -2629,14 +2718,7 @@ async def public_agent_profile(user_id: int):
                     break
 
         # Compliance pct — clean passes only
-        clean_count = 0
-        for item in all_items:
-            try:
-                comp = json.loads(item.get("compliance") or "{}")
-                if comp.get("overallStatus") in ("compliant", "pass"):
-                    clean_count += 1
-            except Exception:
-                clean_count += 1
+        clean_count = sum(1 for item in all_items if item.get("verdict") == "pass")
         compliance_pct = round((clean_count / posts_total * 100)) if posts_total > 0 else 100
 
         # Recent headlines — last 3, title only, no full content
@@ -2934,7 +3016,7 @@ async def public_agent_profile(slug: str):
 
     c.execute("""
         SELECT id, niche, content, compliance, cir_id,
-               approved_at, published_at, status, origin_type, answer_ref
+               approved_at, published_at, status, origin_type, answer_ref, post_slug, verdict
         FROM content_library
         WHERE user_id = ? AND status IN ('approved','published','archived')
         ORDER BY approved_at DESC
@@ -2952,14 +3034,7 @@ async def public_agent_profile(slug: str):
     # posts_total = all CIR-reviewed posts per compliance_records — permanent, not affected by deletion.
     posts_total   = cir_count
 
-    clean_count = 0
-    for item in active_items:
-        try:
-            comp = _json.loads(item.get("compliance") or "{}")
-            if comp.get("overallStatus") in ("compliant","pass"):
-                clean_count += 1
-        except Exception:
-            clean_count += 1
+    clean_count = sum(1 for item in active_items if item.get("verdict") == "pass")
     compliance_pct = round((clean_count / posts_total * 100)) if posts_total > 0 else 100
 
     # Member since
@@ -2995,12 +3070,6 @@ async def public_agent_profile(slug: str):
                 break
 
     # Build posts array — full text + per-post slug for individual URLs
-    import re as _re
-    def _post_slug(headline, post_id):
-        base = _re.sub(r"[^a-z0-9]+", "-",
-               (headline or "post").lower().strip()).strip("-")[:60]
-        return f"{base}-{post_id}"
-
     posts = []
     for item in items:
         try:
@@ -3011,7 +3080,7 @@ async def public_agent_profile(slug: str):
         headline = cd.get("headline","") or cd.get("title","")
         if not body and not headline:
             continue
-        ps = _post_slug(headline, item["id"])
+        ps = item.get("post_slug") or _post_slug_make(headline, item["id"])
         posts.append({
             "id":          item["id"],
             "slug":        ps,
@@ -3061,7 +3130,7 @@ async def public_agent_profile(slug: str):
 
 
 @app.get("/public/agent/{slug}/feed")
-async def public_agent_rss(slug: str):
+async def public_agent_rss(slug: str, request: Request = None):
     """
     RSS feed for an agent's verified posts.
     URL: {slug}.homebridgegroup.co/feed
@@ -3076,19 +3145,20 @@ async def public_agent_rss(slug: str):
     if not user:
         raise HTTPException(404, "Agent not found.")
 
+    validators = _public_validators(f"feed:{slug}", str(user.get("public_version") or 0),
+                                    user.get("public_updated_at"))
+    not_modified = _not_modified(request, validators)
+    if not_modified:
+        return not_modified
+
     user_id = user["id"]
     conn    = _gc()
     c       = conn.cursor()
 
-    # Setup
-    c.execute("SELECT setup_json FROM agent_setup WHERE user_id = ?", (user_id,))
-    row   = c.fetchone()
-    setup = {}
-    if row:
-        try: setup = _json.loads(row["setup_json"] or "{}")
-        except: pass
-
-    market = setup.get("market","")
+    # Setup — only the market is needed, so read the projected column
+    c.execute("SELECT market FROM agent_setup WHERE user_id = ?", (user_id,))
+    row    = c.fetchone()
+    market = (row["market"] or "") if row else ""
 
     c.execute("""
         SELECT id, niche, content, cir_id, approved_at
@@ -3144,7 +3214,7 @@ async def public_agent_rss(slug: str):
   </channel>
 </rss>"""
 
-    return _Response(content=rss, media_type="application/rss+xml")
+    return _Response(content=rss, media_type="application/rss+xml", headers=validators)
 
 
 @app.get("/public/agent/{slug}/posts/{post_slug}")
@@ -3155,58 +3225,41 @@ async def public_agent_post(slug: str, post_slug: str):
     URL: {slug}.homebridgegroup.co/posts/{post-slug}
     Serves agent.html — JavaScript reads the path and fetches this data.
     """
-    import json as _json, re as _re
-    from database import get_conn as _gc
-    from fastapi.responses import JSONResponse
+    import json as _json
+    from database import library_get_public_post
+    from fastapi.responses import JSONResponse, RedirectResponse
 
     user = _get_agent_by_slug(slug)
     if not user:
         raise HTTPException(404, "Agent not found.")
 
-    conn = _gc()
-    c    = conn.cursor()
-
-    # Find post by matching slug pattern (headline-based + id suffix)
-    c.execute("""
-        SELECT id, niche, content, cir_id, approved_at, status
-        FROM content_library
-        WHERE user_id = ? AND status IN ('approved','published','archived')
-        ORDER BY approved_at DESC
-    """, (user["id"],))
-    items = [dict(r) for r in c.fetchall()]
-    conn.close()
-
-    def _make_post_slug(headline, item_id):
-        base = _re.sub(r"[^a-z0-9]+", "-",
-               (headline or "post").lower().strip()).strip("-")[:60]
-        return f"{base}-{item_id}"
-
-    matched = None
-    for item in items:
-        try:
-            cd = _json.loads(item.get("content") or "{}")
-        except Exception:
-            cd = {}
-        headline = cd.get("headline","") or cd.get("title","")
-        if _make_post_slug(headline, item["id"]) == post_slug:
-            body = cd.get("body","") or cd.get("post","") or cd.get("content","")
-            matched = {
-                "id":          item["id"],
-                "slug":        post_slug,
-                "headline":    headline,
-                "body":        body,
-                "niche":       item.get("niche",""),
-                "cir_id":      item.get("cir_id",""),
-                "approved_at": (item.get("approved_at") or "")[:10],
-                "agent_name":  user["agent_name"],
-                "brokerage":   user.get("brokerage",""),
-                "profile_url": f"https://{slug}.homebridgegroup.co",
-                "verify_url":  f"https://{slug}.homebridgegroup.co/verify/{item['cir_id']}" if item.get("cir_id") else "",
-            }
-            break
-
-    if not matched:
+    # Keyed lookup on the trailing item id; a stale headline segment redirects
+    # to the stored slug.
+    item = library_get_public_post(user["id"], post_slug)
+    if not item:
         raise HTTPException(404, "Post not found.")
+    if item["post_slug"] != post_slug:
+        return RedirectResponse(f"/public/agent/{slug}/posts/{item['post_slug']}", status_code=301)
+
+    try:
+        cd = _json.loads(item.get("content") or "{}")
+    except Exception:
+        cd = {}
+    headline = cd.get("headline","") or cd.get("title","")
+    body     = cd.get("body","") or cd.get("post","") or cd.get("content","")
+    matched = {
+        "id":          item["id"],
+        "slug":        post_slug,
+        "headline":    headline,
+        "body":        body,
+        "niche":       item.get("niche",""),
+        "cir_id":      item.get("cir_id",""),
+        "approved_at": (item.get("approved_at") or "")[:10],
+        "agent_name":  user["agent_name"],
+        "brokerage":   user.get("brokerage",""),
+        "profile_url": f"https://{slug}.homebridgegroup.co",
+        "verify_url":  f"https://{slug}.homebridgegroup.co/verify/{item['cir_id']}" if item.get("cir_id") else "",
+    }
 
     return JSONResponse(matched)
 
@@ -3298,7 +3351,8 @@ async def public_verify_cir(cir_id: str):
 #   GET /public/agent/{slug}/page        — full authority page HTML
 #   GET /public/agent/{slug}/posts/{post_slug}/page  — per-record post page HTML
 #   GET /public/verify/{cir_id}/page     — CPR record verification page HTML
-#   GET /public/sitemap.xml              — platform-wide sitemap
+#   GET /public/sitemap.xml              — platform sitemap index
+#   GET /public/sitemap-agents-{n}.xml   — authority-page shard n of the index
 #   GET /public/agent/{slug}/sitemap.xml — per-agent sitemap
 #   GET /robots.txt                      — robots file pointing to sitemap
 #
@@ -3355,9 +3409,8 @@ def _headline_to_question(h: str) -> str:
 
 
 def _post_slug_make(headline: str, post_id: int) -> str:
-    import re as _re3
-    base = _re3.sub(r"[^a-z0-9]+", "-", (headline or "post").lower().strip()).strip("-")[:60]
-    return f"{base}-{post_id}"
+    from database import make_post_slug
+    return make_post_slug(headline, post_id)
 
 
 def _opening_sentences(text: str, max_sentences: int = 3, hard_cap: int = 600) -> str:
@@ -4003,6 +4056,111 @@ def _build_verify_page_html(d: dict) -> str:
     return html
 
 
+# ── Rendered authority-page cache ────────────────────────────────────────────
+# Two layers: a small in-process LRU in front of rendered_page_cache (shared by
+# every worker). Entries are valid for one (public_version, UTC date) pair —
+# writers bump users.public_version, and the date term rolls over the
+# "last 30 days" / streak figures at midnight. Demo and ghost pages bypass it.
+PAGE_CACHE_MAX_ENTRIES = int(os.getenv("PAGE_CACHE_MAX_ENTRIES", "500"))
+
+from collections import OrderedDict as _OrderedDict
+_page_cache: "_OrderedDict[str, tuple]" = _OrderedDict()   # key -> (version, html)
+_page_cache_lock = threading.Lock()
+
+
+def _page_version(user: dict) -> str:
+    return f"{user.get('public_version') or 0}:{datetime.utcnow().strftime('%Y-%m-%d')}"
+
+
+def _page_cache_get(key: str, version: str) -> str | None:
+    with _page_cache_lock:
+        hit = _page_cache.get(key)
+        if hit and hit[0] == version:
+            _page_cache.move_to_end(key)
+            return hit[1]
+    from database import page_cache_get
+    try:
+        html = page_cache_get(key, version)
+    except Exception as e:
+        print(f"[PageCache] read failed for {key}: {e}")
+        return None
+    if html is not None:
+        _page_cache_remember(key, version, html)
+    return html
+
+
+def _page_cache_remember(key: str, version: str, html: str):
+    with _page_cache_lock:
+        _page_cache[key] = (version, html)
+        _page_cache.move_to_end(key)
+        while len(_page_cache) > PAGE_CACHE_MAX_ENTRIES:
+            _page_cache.popitem(last=False)
+
+
+def _page_cache_put(key: str, user_id: int, version: str, html: str):
+    _page_cache_remember(key, version, html)
+    from database import page_cache_put
+    try:
+        page_cache_put(key, user_id, version, html)
+    except Exception as e:
+        print(f"[PageCache] write failed for {key}: {e}")
+
+
+# ── Conditional GET for public pages ─────────────────────────────────────────
+# Every public SSR/feed route derives a strong ETag from the content version it
+# is cached on (see _page_version / public_version) plus a Last-Modified from
+# users.public_updated_at, and answers If-None-Match / If-Modified-Since with a
+# 304 before reading content_library or rendering anything.
+
+def _public_validators(scope: str, version: str, updated_at=None) -> dict:
+    """ETag (+ Last-Modified when known) headers for one representation."""
+    import hashlib as _hl
+    headers = {"ETag": '"' + _hl.sha1(f"{scope}|{version}".encode()).hexdigest()[:24] + '"'}
+    if updated_at:
+        from email.utils import format_datetime
+        from datetime import timezone as _tz
+        try:
+            dt = updated_at if isinstance(updated_at, datetime) else datetime.fromisoformat(str(updated_at))
+            headers["Last-Modified"] = format_datetime(dt.replace(tzinfo=_tz.utc, microsecond=0), usegmt=True)
+        except (TypeError, ValueError):
+            pass
+    return headers
+
+
+def _not_modified(request: Request | None, headers: dict):
+    """304 response if the request's validators match headers, else None."""
+    if request is None:
+        return None
+    from fastapi.responses import Response as _Resp
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        # If-None-Match wins over If-Modified-Since (RFC 9110 §13.2.2).
+        tags = {t.strip().removeprefix("W/") for t in inm.split(",")}
+        if "*" in tags or headers["ETag"] in tags:
+            return _Resp(status_code=304, headers=headers)
+        return None
+    ims = request.headers.get("if-modified-since")
+    if ims and "Last-Modified" in headers:
+        from email.utils import parsedate_to_datetime
+        try:
+            if parsedate_to_datetime(headers["Last-Modified"]) <= parsedate_to_datetime(ims):
+                return _Resp(status_code=304, headers=headers)
+        except (TypeError, ValueError):
+            pass
+    return None
+
+
+def _day_floor_updated(user: dict) -> datetime:
+    """Last-Modified for date-sensitive pages: the later of the last content
+    change and today's UTC midnight (when day-relative figures roll over)."""
+    midnight = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    try:
+        updated = datetime.fromisoformat(user.get("public_updated_at") or "")
+    except (TypeError, ValueError):
+        return midnight
+    return max(updated, midnight)
+
+
 @app.get("/public/agent/{slug}/page")
 async def public_agent_authority_page(slug: str, request: Request):
     """
@@ -4032,16 +4190,30 @@ async def public_agent_authority_page(slug: str, request: Request):
         if expired:
             raise HTTPException(404, "This preview has expired.")
 
-    # Reuse the existing public_agent_profile data assembly
-    response_data = await public_agent_profile(slug)
-    response_data["is_demo"]  = is_demo
-    response_data["is_ghost"] = is_ghost
-
-    html = _build_authority_page_html(response_data, slug)
-    return _HTMLResponse(content=html, status_code=200, headers={
+    cacheable = not (is_demo or is_ghost)
+    cache_key = f"authority:{slug}"
+    version   = _page_version(user)
+    headers   = {
         "Cache-Control": "no-store" if is_demo else "public, max-age=300",
         "X-Robots-Tag": "noindex, nofollow" if is_demo else "index, follow",
-    })
+    }
+    if cacheable:
+        headers.update(_public_validators(cache_key, version, _day_floor_updated(user)))
+        not_modified = _not_modified(request, headers)
+        if not_modified:
+            return not_modified
+    html = _page_cache_get(cache_key, version) if cacheable else None
+
+    if html is None:
+        # Reuse the existing public_agent_profile data assembly
+        response_data = await public_agent_profile(slug)
+        response_data["is_demo"]  = is_demo
+        response_data["is_ghost"] = is_ghost
+
+        html = _build_authority_page_html(response_data, slug)
+        if cacheable:
+            _page_cache_put(cache_key, user["id"], version, html)
+    return _HTMLResponse(content=html, status_code=200, headers=headers)
 
 
 # =====================================================================
@@ -4109,46 +4281,14 @@ body{font-family:'Inter',system-ui,-apple-system,sans-serif;background:var(--pap
 def registry_agents() -> list:
     """
     Build the public registry list: one dict per qualifying agent.
-    Qualifying = role 'agent', active, has a live slug, and at least one
-    permanent CPR (compliance_records) on file. The CPR count comes from
-    cpr_count_for_user (the same source the authority page reports); market
-    and niches come from the agent_setup JSON blob. Sorted by CPR count
-    descending, then name ascending as a tiebreaker.
+    Qualifying = active, has a live slug, not a demo/ghost, and at least one
+    permanent CPR (compliance_records) on file. Rows come from the
+    registry_entries summary table, which database.registry_refresh_user keeps
+    current on every approval, setup save, slug and activation change. Sorted
+    by CPR count descending, then name ascending as a tiebreaker.
     """
-    from database import get_conn, cpr_count_for_user
-    conn = get_conn()
-    c = conn.cursor()
-    c.execute(
-        """SELECT u.id, u.agent_name, u.agent_slug
-           FROM users u
-           WHERE u.is_active = 1
-             AND u.agent_slug IS NOT NULL
-             AND u.agent_slug != ''
-             AND u.is_demo = 0
-             AND u.ghost_expires_at IS NULL
-             AND EXISTS (SELECT 1 FROM compliance_records cr WHERE cr.user_id = u.id)"""
-    )
-    rows = c.fetchall()
-    conn.close()
-
-    agents = []
-    for r in rows:
-        uid = r["id"]
-        try:
-            setup = get_agent_setup(uid) or {}
-        except Exception:
-            # Skip any agent whose setup load fails - never break the page.
-            continue
-        agents.append({
-            "name":   r["agent_name"] or "",
-            "slug":   r["agent_slug"] or "",
-            "cpr":    cpr_count_for_user(uid),
-            "market": setup.get("market", ""),
-            "niches": setup.get("primaryNiches", []),
-        })
-
-    agents.sort(key=lambda a: (-a["cpr"], a["name"].lower()))
-    return agents
+    from database import registry_list
+    return registry_list()
 
 
 def _build_registry_html(agents: list) -> str:
@@ -4392,27 +4532,44 @@ def _build_glassbox_html(slug: str) -> str:
 
 
 @app.get("/glassbox")
-async def glassbox_page():
+async def glassbox_page(request: Request):
     """Public SSR Glass Box scoreboard. Crawlable; renders GLASSBOX_SLUG."""
     from fastapi.responses import HTMLResponse as _HTMLResponse
-    html = _build_glassbox_html(GLASSBOX_SLUG)
-    return _HTMLResponse(content=html, status_code=200, headers={
+    headers = {
         "Cache-Control": "public, max-age=300",
         "X-Robots-Tag": "index, follow",
-    })
+    }
+    # CPR count and lab-notebook entries both bump the slug's public_version
+    # (see admin_glassbox_log); the date term covers the "Updated" fallback.
+    user = _get_agent_by_slug(GLASSBOX_SLUG)
+    if user:
+        headers.update(_public_validators("glassbox", _page_version(user), _day_floor_updated(user)))
+        not_modified = _not_modified(request, headers)
+        if not_modified:
+            return not_modified
+    html = _build_glassbox_html(GLASSBOX_SLUG)
+    return _HTMLResponse(content=html, status_code=200, headers=headers)
 
 
 @app.get("/registry")
-async def registry_page():
+async def registry_page(request: Request):
     """Public SSR Certified Provenance Registry. Crawlable; lists qualifying agents."""
     from fastapi.responses import HTMLResponse as _HTMLResponse
     try:
-        agents = registry_agents()
-        html = _build_registry_html(agents)
-        return _HTMLResponse(content=html, status_code=200, headers={
+        # Every listed agent is in the platform sitemap set, so its version
+        # moves on any change the registry can show.
+        _, version, updated_at = _platform_sitemap_state()
+        headers = {
             "Cache-Control": "public, max-age=300",
             "X-Robots-Tag": "index, follow",
-        })
+            **_public_validators("registry", version, updated_at),
+        }
+        not_modified = _not_modified(request, headers)
+        if not_modified:
+            return not_modified
+        agents = registry_agents()
+        html = _build_registry_html(agents)
+        return _HTMLResponse(content=html, status_code=200, headers=headers)
     except Exception as _reg_exc:
         print(f"[Registry] render error: {_reg_exc}")
         _err_html = (
@@ -4445,6 +4602,7 @@ async def admin_glassbox_log(req: dict, current_user: dict = Depends(get_current
     cpr = cpr_count_for_user(user["id"])
     entry_date = _dtg.utcnow().strftime("%Y-%m-%d")
     entry = glassbox_upsert_entry(GLASSBOX_SLUG, entry_date, google, bing, cpr, note)
+    bump_public_version(user["id"])
     return {"ok": True, "entry": entry}
 
 
@@ -4458,53 +4616,48 @@ async def admin_glassbox_recent(current_user: dict = Depends(get_current_user)):
 
 
 @app.get("/public/agent/{slug}/posts/{post_slug}/page")
-async def public_agent_post_page(slug: str, post_slug: str):
+async def public_agent_post_page(slug: str, post_slug: str, request: Request = None):
     """
     Server-side rendered individual post page.
     Each approved post gets its own crawlable, citable URL.
     URL: https://{slug}.homebridgegroup.co/posts/{post-slug}
     """
-    from fastapi.responses import HTMLResponse as _HTMLResponse
-    import json as _json5, re as _re5
-    from database import get_conn as _gc5
+    from fastapi.responses import HTMLResponse as _HTMLResponse, RedirectResponse as _Redirect
+    import json as _json5
+    from database import library_get_public_post
 
     user = _get_agent_by_slug(slug)
     if not user:
         raise HTTPException(404, "Agent not found.")
 
-    conn = _gc5()
-    c    = conn.cursor()
-    c.execute("""
-        SELECT id, niche, content, cir_id, approved_at, status
-        FROM content_library
-        WHERE user_id = ? AND status IN ('approved','published','archived')
-        ORDER BY approved_at DESC
-    """, (user["id"],))
-    items = [dict(r) for r in c.fetchall()]
-    conn.close()
-
-    matched = None
-    for item in items:
-        try:
-            cd = _json5.loads(item.get("content") or "{}")
-        except Exception:
-            cd = {}
-        headline = cd.get("headline", "") or cd.get("title", "")
-        if _post_slug_make(headline, item["id"]) == post_slug:
-            body = cd.get("body", "") or cd.get("post", "") or cd.get("content", "")
-            matched = {
-                "headline":    headline,
-                "body":        body,
-                "niche":       item.get("niche", ""),
-                "cir_id":      item.get("cir_id", ""),
-                "approved_at": (item.get("approved_at") or "")[:10],
-                "agent_name":  user["agent_name"],
-                "brokerage":   user.get("brokerage", ""),
-            }
-            break
+    validators = _public_validators(f"post:{slug}/{post_slug}",
+                                    str(user.get("public_version") or 0),
+                                    user.get("public_updated_at"))
+    not_modified = _not_modified(request, {**validators, "Cache-Control": "public, max-age=300"})
+    if not_modified:
+        return not_modified
 
-    if not matched:
+    item = library_get_public_post(user["id"], post_slug)
+    if not item:
         raise HTTPException(404, "Post not found.")
+    if item["post_slug"] != post_slug:
+        # Headline edited since the URL was shared — send crawlers to the live slug.
+        return _Redirect(f"https://{slug}.homebridgegroup.co/posts/{item['post_slug']}",
+                         status_code=301)
+
+    try:
+        cd = _json5.loads(item.get("content") or "{}")
+    except Exception:
+        cd = {}
+    matched = {
+        "headline":    cd.get("headline", "") or cd.get("title", ""),
+        "body":        cd.get("body", "") or cd.get("post", "") or cd.get("content", ""),
+        "niche":       item.get("niche", ""),
+        "cir_id":      item.get("cir_id", ""),
+        "approved_at": (item.get("approved_at") or "")[:10],
+        "agent_name":  user["agent_name"],
+        "brokerage":   user.get("brokerage", ""),
+    }
 
     import json as _j6
     schema = {
@@ -4589,45 +4742,105 @@ async def public_agent_post_page(slug: str, post_slug: str):
 </div>
 </body>
 </html>"""
-    return _HTMLResponse(content=html, status_code=200, headers={"Cache-Control": "public, max-age=300"})
+    return _HTMLResponse(content=html, status_code=200,
+                         headers={**validators, "Cache-Control": "public, max-age=300"})
 
 
 @app.get("/public/verify/{cir_id}/page")
-async def public_verify_cir_page(cir_id: str):
+async def public_verify_cir_page(cir_id: str, request: Request = None):
     """
     Server-side rendered CPR record verification page.
     All content in HTML source — crawlable, citable.
     URL: https://{slug}.homebridgegroup.co/verify/{cir_id}
     """
     from fastapi.responses import HTMLResponse as _HTMLResponse
+    from database import get_conn as _gcv
+
+    headers = {
+        "Cache-Control": "public, max-age=300",
+        "X-Robots-Tag": "index, follow",
+    }
+    # Records are permanent; only the owning agent's details can change, so
+    # the agent's public_version validates the page. Legacy records that only
+    # live in content_library go without validators.
+    conn = _gcv()
+    owner = conn.execute("""
+        SELECT u.public_version, u.public_updated_at
+        FROM compliance_records cr JOIN users u ON cr.user_id = u.id
+        WHERE cr.cir_id = ?
+    """, (cir_id,)).fetchone()
+    conn.close()
+    if owner:
+        headers.update(_public_validators(f"verify:{cir_id}", str(owner["public_version"] or 0),
+                                          owner["public_updated_at"]))
+        not_modified = _not_modified(request, headers)
+        if not_modified:
+            return not_modified
 
     # Reuse existing verify data endpoint
     data = await public_verify_cir(cir_id)
     html = _build_verify_page_html(data)
-    return _HTMLResponse(content=html, status_code=200, headers={
-        "Cache-Control": "public, max-age=300",
-        "X-Robots-Tag": "index, follow",
-    })
+    return _HTMLResponse(content=html, status_code=200, headers=headers)
 
 
-@app.get("/public/agent/{slug}/sitemap.xml")
-async def public_agent_sitemap(slug: str):
-    """
-    Per-agent sitemap listing authority page + all per-record post pages.
-    Auto-generated from database. Submit to Google Search Console.
-    """
+# ── Sitemaps ──────────────────────────────────────────────────────────────────
+# /public/sitemap.xml is a sitemap index over SITEMAP_SHARD_SIZE-URL shards of
+# authority pages (the protocol caps a urlset at 50,000 URLs). Per-agent
+# sitemaps and shards are rendered once per content version through the page
+# cache and kept gzip-compressed in memory for clients that accept it.
+SITEMAP_SHARD_SIZE = min(int(os.getenv("SITEMAP_SHARD_SIZE", "50000")), 50000)
+
+_gzip_cache: "_OrderedDict[str, tuple]" = _OrderedDict()   # key -> (version, gz bytes)
+
+
+def _wants_gzip(request: Request | None) -> bool:
+    return request is not None and "gzip" in request.headers.get("accept-encoding", "").lower()
+
+
+def _xml_headers(request: Request | None, cache_key: str, version: str, updated_at=None) -> dict:
+    """Validators for one encoding of a cached XML document (gzip and identity
+    bodies differ, so they get distinct strong ETags)."""
+    scope = cache_key + (":gz" if _wants_gzip(request) else "")
+    return {"Vary": "Accept-Encoding", "Cache-Control": "public, max-age=3600",
+            **_public_validators(scope, version, updated_at)}
+
+
+def _xml_response(xml: str, request: Request | None, cache_key: str, version: str,
+                  headers: dict):
+    """XML response, gzip-encoded (from a per-version memo) when the client accepts it."""
     from fastapi.responses import Response as _Resp
-    import json as _json7
+    headers = dict(headers)
+    if not _wants_gzip(request):
+        return _Resp(content=xml, media_type="application/xml", headers=headers)
+    import gzip as _gzip
+    with _page_cache_lock:
+        hit = _gzip_cache.get(cache_key)
+    if hit and hit[0] == version:
+        body = hit[1]
+    else:
+        body = _gzip.compress(xml.encode("utf-8"), compresslevel=6, mtime=0)
+        with _page_cache_lock:
+            _gzip_cache[cache_key] = (version, body)
+            _gzip_cache.move_to_end(cache_key)
+            while len(_gzip_cache) > PAGE_CACHE_MAX_ENTRIES:
+                _gzip_cache.popitem(last=False)
+    headers["Content-Encoding"] = "gzip"
+    return _Resp(content=body, media_type="application/xml", headers=headers)
 
-    user = _get_agent_by_slug(slug)
-    if not user:
-        raise HTTPException(404, "Agent not found.")
 
+def _urlset(urls: list) -> str:
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+            + "\n".join(urls) + "\n</urlset>")
+
+
+def _build_agent_sitemap_xml(user: dict, slug: str) -> str:
+    import json as _json7
     from database import get_conn as _gc7
     conn = _gc7()
     c    = conn.cursor()
     c.execute("""
-        SELECT id, content, cir_id, approved_at
+        SELECT id, content, cir_id, approved_at, post_slug
         FROM content_library
         WHERE user_id = ? AND status IN ('approved','published','archived')
         ORDER BY approved_at DESC
@@ -4635,8 +4848,11 @@ async def public_agent_sitemap(slug: str):
     items = [dict(r) for r in c.fetchall()]
     conn.close()
 
-    base = f"https://{slug}.homebridgegroup.co"
-    urls = [f"  <url><loc>{base}</loc><changefreq>daily</changefreq><priority>1.0</priority></url>"]
+    base    = f"https://{slug}.homebridgegroup.co"
+    latest  = max(((i.get("approved_at") or "")[:10] for i in items), default="")
+    urls    = [f"  <url><loc>{base}</loc>"
+               + (f"<lastmod>{latest}</lastmod>" if latest else "")
+               + "<changefreq>daily</changefreq><priority>1.0</priority></url>"]
     for item in items:
         try:
             cd = _json7.loads(item.get("content") or "{}")
@@ -4645,7 +4861,7 @@ async def public_agent_sitemap(slug: str):
         headline = cd.get("headline", "") or cd.get("title", "")
         if not headline:
             continue
-        ps  = _post_slug_make(headline, item["id"])
+        ps  = item.get("post_slug") or _post_slug_make(headline, item["id"])
         loc = f"{base}/posts/{ps}"
         lastmod = (item.get("approved_at") or "")[:10]
         urls.append(
@@ -4660,52 +4876,131 @@ async def public_agent_sitemap(slug: str):
                 + (f"<lastmod>{lastmod}</lastmod>" if lastmod else "")
                 + "<changefreq>never</changefreq><priority>0.6</priority></url>"
             )
-
-    xml = '<?xml version="1.0" encoding="UTF-8"?>\n'
-    xml += '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
-    xml += "\n".join(urls)
-    xml += "\n</urlset>"
-    return _Resp(content=xml, media_type="application/xml")
+    return _urlset(urls)
 
 
-@app.get("/public/sitemap.xml")
-async def public_platform_sitemap():
+@app.get("/public/agent/{slug}/sitemap.xml")
+async def public_agent_sitemap(slug: str, request: Request = None):
     """
-    Platform-wide sitemap listing all active agent authority pages.
-    Submit this to Google Search Console as the master sitemap.
+    Per-agent sitemap listing authority page + all per-record post pages.
+    Auto-generated from database. Submit to Google Search Console.
+    Rebuilt only when the agent's public_version moves.
     """
-    from fastapi.responses import Response as _Resp2
-    from database import get_conn as _gc8
+    user = _get_agent_by_slug(slug)
+    if not user:
+        raise HTTPException(404, "Agent not found.")
 
+    cache_key = f"sitemap:{slug}"
+    version   = str(user.get("public_version") or 0)
+    headers   = _xml_headers(request, cache_key, version, user.get("public_updated_at"))
+    not_modified = _not_modified(request, headers)
+    if not_modified:
+        return not_modified
+
+    xml = _page_cache_get(cache_key, version)
+    if xml is None:
+        xml = _build_agent_sitemap_xml(user, slug)
+        _page_cache_put(cache_key, user["id"], version, xml)
+    return _xml_response(xml, request, cache_key, version, headers)
+
+
+def _platform_sitemap_state() -> tuple:
+    """(listed agent count, version, last update) — the version moves whenever
+    any listed agent's public_version is bumped, which covers slug, activation,
+    setup and approval changes."""
+    from database import get_conn as _gc8
     conn = _gc8()
     c    = conn.cursor()
     c.execute("""
-        SELECT agent_slug, created_at
+        SELECT COUNT(*) AS n, COALESCE(SUM(COALESCE(public_version, 0)), 0) AS v,
+               MAX(public_updated_at) AS updated_at
         FROM users
         WHERE agent_slug IS NOT NULL AND agent_slug != '' AND is_active = 1
-        ORDER BY created_at DESC
     """)
+    row = c.fetchone()
+    conn.close()
+    return row["n"], f"{row['n']}:{row['v']}", row["updated_at"]
+
+
+def _platform_shard_rows(shard: int) -> list:
+    """Authority pages in one shard, with lastmod = latest approval (else signup)."""
+    from database import get_conn as _gc8
+    conn = _gc8()
+    c    = conn.cursor()
+    c.execute("""
+        SELECT u.agent_slug,
+               COALESCE((SELECT MAX(cl.approved_at) FROM content_library cl
+                         WHERE cl.user_id = u.id
+                           AND cl.status IN ('approved','published','archived')),
+                        u.created_at) AS lastmod
+        FROM users u
+        WHERE u.agent_slug IS NOT NULL AND u.agent_slug != '' AND u.is_active = 1
+        ORDER BY u.id
+        LIMIT ? OFFSET ?
+    """, (SITEMAP_SHARD_SIZE, shard * SITEMAP_SHARD_SIZE))
     rows = [dict(r) for r in c.fetchall()]
     conn.close()
+    return rows
 
-    urls = []
-    for row in rows:
-        slug_val = row.get("agent_slug", "")
-        if not slug_val:
-            continue
-        loc     = f"https://{slug_val}.homebridgegroup.co"
-        lastmod = (row.get("created_at") or "")[:10]
-        urls.append(
-            f"  <url><loc>{loc}</loc>"
-            + (f"<lastmod>{lastmod}</lastmod>" if lastmod else "")
-            + "<changefreq>daily</changefreq><priority>1.0</priority></url>"
-        )
 
-    xml = '<?xml version="1.0" encoding="UTF-8"?>\n'
-    xml += '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
-    xml += "\n".join(urls)
-    xml += "\n</urlset>"
-    return _Resp2(content=xml, media_type="application/xml")
+@app.get("/public/sitemap.xml")
+async def public_platform_sitemap(request: Request = None):
+    """
+    Platform sitemap index — one entry per authority-page shard.
+    Submit this to Google Search Console as the master sitemap.
+    """
+    count, version, updated_at = _platform_sitemap_state()
+    cache_key = "sitemap-index"
+    headers   = _xml_headers(request, cache_key, version, updated_at)
+    not_modified = _not_modified(request, headers)
+    if not_modified:
+        return not_modified
+
+    xml = _page_cache_get(cache_key, version)
+    if xml is None:
+        shards  = max(1, -(-count // SITEMAP_SHARD_SIZE))
+        entries = []
+        for n in range(shards):
+            rows    = _platform_shard_rows(n)
+            lastmod = max(((r.get("lastmod") or "")[:10] for r in rows), default="")
+            entries.append(
+                f"  <sitemap><loc>https://api.homebridgegroup.co/public/sitemap-agents-{n + 1}.xml</loc>"
+                + (f"<lastmod>{lastmod}</lastmod>" if lastmod else "")
+                + "</sitemap>"
+            )
+        xml = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+               '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+               + "\n".join(entries) + "\n</sitemapindex>")
+        _page_cache_put(cache_key, None, version, xml)
+    return _xml_response(xml, request, cache_key, version, headers)
+
+
+@app.get("/public/sitemap-agents-{shard}.xml")
+async def public_platform_sitemap_shard(shard: int, request: Request = None):
+    """One shard of up to SITEMAP_SHARD_SIZE agent authority pages (1-based)."""
+    count, version, updated_at = _platform_sitemap_state()
+    if shard < 1 or (shard - 1) * SITEMAP_SHARD_SIZE >= max(count, 1):
+        raise HTTPException(404, "Sitemap not found.")
+
+    cache_key = f"sitemap-agents:{shard}"
+    headers   = _xml_headers(request, cache_key, version, updated_at)
+    not_modified = _not_modified(request, headers)
+    if not_modified:
+        return not_modified
+
+    xml = _page_cache_get(cache_key, version)
+    if xml is None:
+        urls = []
+        for row in _platform_shard_rows(shard - 1):
+            lastmod = (row.get("lastmod") or "")[:10]
+            urls.append(
+                f"  <url><loc>https://{row['agent_slug']}.homebridgegroup.co</loc>"
+                + (f"<lastmod>{lastmod}</lastmod>" if lastmod else "")
+                + "<changefreq>daily</changefreq><priority>1.0</priority></url>"
+            )
+        xml = _urlset(urls)
+        _page_cache_put(cache_key, None, version, xml)
+    return _xml_response(xml, request, cache_key, version, headers)
 
 
 @app.get("/robots.txt")
@@ -4797,11 +5092,8 @@ def _record_public_url(item: dict, user_id: int):
         slug = _row["agent_slug"] if _row else None
         if not slug:
             return None
-        content = item.get("content") or {}
-        headline = content.get("headline") or content.get("title") or "post"
-        import re as _re
-        base = _re.sub(r"[^a-z0-9]+", "-", headline.lower().strip()).strip("-")[:60]
-        ps = f"{base}-{item['id']}"
+        from database import post_slug_for_content
+        ps = item.get("postSlug") or post_slug_for_content(item.get("content"), item["id"])
         return f"https://{slug}.homebridgegroup.co/posts/{ps}"
     except Exception:
         return None
@@ -4858,7 +5150,7 @@ async def slug_subdomain_router(request: Request, call_next):
             if post_match:
                 post_slug_val = post_match.group(1)
                 try:
-                    return await public_agent_post_page(subdomain, post_slug_val)
+                    return await public_agent_post_page(subdomain, post_slug_val, request)
                 except HTTPException as _post_exc:
                     from fastapi.responses import PlainTextResponse as _PTpost
                     return _PTpost(str(_post_exc.detail), status_code=_post_exc.status_code)
@@ -4868,7 +5160,7 @@ async def slug_subdomain_router(request: Request, call_next):
             if verify_match:
                 cir_val = verify_match.group(1)
                 try:
-                    return await public_verify_cir_page(cir_val)
+                    return await public_verify_cir_page(cir_val, request)
                 except HTTPException as _verify_exc:
                     from fastapi.responses import PlainTextResponse as _PTverify
                     return _PTverify(str(_verify_exc.detail), status_code=_verify_exc.status_code)
@@ -4882,7 +5174,7 @@ async def slug_subdomain_router(request: Request, call_next):
             # /sitemap.xml — per-agent sitemap
             if path == "/sitemap.xml":
                 try:
-                    return await public_agent_sitemap(subdomain)
+                    return await public_agent_sitemap(subdomain, request)
                 except HTTPException as _sitemap_exc:
                     from fastapi.responses import PlainTextResponse as _PTsitemap
                     return _PTsitemap(str(_sitemap_exc.detail), status_code=_sitemap_exc.status_code)
@@ -4953,6 +5245,7 @@ async def set_agent_slug(request: Request, current_user: dict = Depends(get_curr
 
     c3.execute("UPDATE users SET agent_slug = ? WHERE id = ?",
                (slug, current_user["id"]))
+    bump_public_version(current_user["id"], conn3)
     conn3.commit()
     conn3.close()
 
@@ -5194,6 +5487,7 @@ async def suspend_user(request: Request, current_user: dict = Depends(get_curren
     from database import get_conn as _gc
     conn = _gc()
     conn.execute("UPDATE users SET is_active = 0 WHERE id = ?", (target_id,))
+    bump_public_version(target_id, conn)
     conn.commit()
     conn.close()
     return {"ok": True, "suspended": target_id}
@@ -5211,6 +5505,7 @@ async def reinstate_user(request: Request, current_user: dict = Depends(get_curr
     from database import get_conn as _gc
     conn = _gc()
     conn.execute("UPDATE users SET is_active = 1 WHERE id = ?", (target_id,))
+    bump_public_version(target_id, conn)
     conn.commit()
     conn.close()
     return {"ok": True, "reinstated": target_id}
@@ -5366,6 +5661,7 @@ async def admin_suspend_user(user_id: int,
     from database import get_conn as _gc
     conn = _gc()
     conn.execute("UPDATE users SET is_active = 0 WHERE id = ?", (user_id,))
+    bump_public_version(user_id, conn)
     conn.commit()
     conn.close()
     return {"ok": True, "user_id": user_id, "status": "suspended"}
@@ -5379,6 +5675,7 @@ async def admin_reactivate_user(user_id: int,
     from database import get_conn as _gc
     conn = _gc()
     conn.execute("UPDATE users SET is_active = 1 WHERE id = ?", (user_id,))
+    bump_public_version(user_id, conn)
     conn.commit()
     conn.close()
     return {"ok": True, "user_id": user_id, "status": "active"}
@@ -5482,6 +5779,7 @@ async def admin_reset_niches(user_id: int, current_user: dict = Depends(get_curr
     _require_super_admin(current_user)
 
     from database import get_conn as _gc_rn, get_agent_setup as _gas_rn, schedules_delete_for_user as _sdf
+    from database import _upsert_agent_setup
 
     # Load current setup
     current_setup = _gas_rn(user_id)
@@ -5498,13 +5796,8 @@ async def admin_reset_niches(user_id: int, current_user: dict = Depends(get_curr
     # Save cleaned setup
     conn_rn = _gc_rn()
     try:
-        conn_rn.execute("""
-            INSERT INTO agent_setup (user_id, setup_json, updated_at)
-            VALUES (?, ?, datetime('now'))
-            ON CONFLICT(user_id) DO UPDATE SET
-                setup_json = excluded.setup_json,
-                updated_at = excluded.updated_at
-        """, (user_id, json.dumps(current_setup)))
+        _upsert_agent_setup(conn_rn, user_id, current_setup)
+        bump_public_version(user_id, conn_rn)
         conn_rn.commit()
     finally:
         conn_rn.close()
@@ -5616,7 +5909,7 @@ async def admin_create_user(request: Request,
     going through the public registration flow.
     """
     _require_super_admin(current_user)
-    import bcrypt as _bcrypt
+    from auth import hash_password_async as _hash_pw
     body        = await request.json()
     email       = str(body.get("email","")).strip().lower()
     password    = str(body.get("password","")).strip()
@@ -5639,7 +5932,7 @@ async def admin_create_user(request: Request,
     if role not in valid_roles:
         raise HTTPException(400, f"Invalid role.")
 
-    pw_hash = _bcrypt.hashpw(password.encode(), _bcrypt.gensalt()).decode()
+    pw_hash = await _hash_pw(password)
 
     from database import get_conn as _gc
     conn = _gc()
@@ -5677,6 +5970,50 @@ async def ensure_super_admin():
 
 
 
+@app.get("/admin/scheduler-stats")
+async def admin_scheduler_stats(current_user: dict = Depends(get_current_user)):
+    """Metrics from the last completed scheduler cycle (job count, latency), the distribution drip worker and notification batches."""
+    _require_super_admin(current_user)
+    from content_engine import LLM_MAX_INFLIGHT
+    from distribution_worker import drip_metrics
+    from database import notification_batch_stats
+    with _scheduler_metrics_lock:
+        last_cycle = dict(_scheduler_metrics)
+    return {
+        "workers":          SCHEDULER_WORKERS,
+        "llm_max_inflight": LLM_MAX_INFLIGHT,
+        "last_cycle":       last_cycle,
+        "distribution":     drip_metrics(),
+        "notifications":    notification_batch_stats(),
+    }
+
+
+@app.get("/admin/auth-stats")
+async def admin_auth_stats(current_user: dict = Depends(get_current_user)):
+    """bcrypt pool queue depth, wait times and rejections (see auth.py)."""
+    _require_super_admin(current_user)
+    from auth import bcrypt_pool_stats
+    return {"bcrypt": bcrypt_pool_stats()}
+
+
+@app.get("/admin/http-stats")
+async def admin_http_stats(current_user: dict = Depends(get_current_user)):
+    """Outbound HTTP pool usage per upstream — requests, errors, in-flight, open/idle connections (see http_clients.py)."""
+    _require_super_admin(current_user)
+    from http_clients import pool_stats
+    return pool_stats()
+
+
+# ── Shutdown: close pooled outbound HTTP clients ──
+@app.on_event("shutdown")
+async def close_http_clients():
+    from http_clients import close_all
+    try:
+        await close_all()
+    except Exception as e:
+        print(f"[Shutdown] Closing HTTP clients failed: {e}")
+
+
 @app.get("/admin/stats")
 async def admin_stats(current_user: dict = Depends(get_current_user)):
     """Platform stats for admin dashboard. Super admin sees billing data."""
@@ -5894,6 +6231,7 @@ async def set_user_active(request: Request, current_user: dict = Depends(get_cur
     from database import get_conn as _gc
     conn = _gc()
     conn.execute("UPDATE users SET is_active=? WHERE id=?", (1 if is_active else 0, target_id))
+    bump_public_version(target_id, conn)
     conn.commit()
     conn.close()
     return {"ok": True, "user_id": target_id, "is_active": is_active}
@@ -5920,6 +6258,7 @@ async def set_user_demo(request: Request, current_user: dict = Depends(get_curre
         conn.close()
         raise HTTPException(400, "Cannot mark a super_admin or your own account as a sample.")
     c.execute("UPDATE users SET is_demo = ? WHERE id = ?", (is_demo, target_id))
+    bump_public_version(target_id, conn)
     conn.commit()
     conn.close()
     return {"ok": True, "user_id": target_id, "is_demo": is_demo}
@@ -5963,6 +6302,7 @@ async def delete_user(request: Request, current_user: dict = Depends(get_current
         ("platform_posts",       "user_id"),
         ("assistant_agents",     "assistant_id"),
         ("assistant_agents",     "agent_id"),
+        ("registry_entries",     "user_id"),
     ]:
         try:
             c.execute(f"DELETE FROM {table} WHERE {col}=?", (target_id,))
@@ -6070,9 +6410,10 @@ async def recheck_compliance(request: Request, current_user: dict = Depends(get_
         conn3 = _gc()
         import json as _json3
         conn3.execute(
-            "UPDATE content_library SET compliance = ?, compliance_checked_at = ? WHERE id = ? AND user_id = ?",
-            (_json3.dumps(result_dict), checked_at, item_id, current_user["id"])
+            "UPDATE content_library SET compliance = ?, verdict = ?, compliance_checked_at = ? WHERE id = ? AND user_id = ?",
+            (_json3.dumps(result_dict), _compliance_verdict(result_dict), checked_at, item_id, current_user["id"])
         )
+        bump_public_version(current_user["id"], conn3)
         conn3.commit()
         conn3.close()
     except Exception as _e:
@@ -6095,7 +6436,6 @@ async def generate_image(request: Request, current_user: dict = Depends(get_curr
     Regeneration limit: 3 per library item. Enforced here and displayed in the UI.
     """
     import os as _os
-    import httpx as _httpx
     import base64 as _b64
 
     openai_key = _os.getenv("OPENAI_API_KEY", "")
@@ -6147,7 +6487,7 @@ async def generate_image(request: Request, current_user: dict = Depends(get_curr
 
     # ── Call gpt-image-2 — returns base64, permanent storage ─────────────────
     try:
-        async with _httpx.AsyncClient(timeout=120) as client:
+        async with upstream_client("openai", timeout=120) as client:
             resp = await client.post(
                 "https://api.openai.com/v1/images/generations",
                 headers={"Authorization": f"Bearer {openai_key}", "Content-Type": "application/json"},
@@ -6183,6 +6523,7 @@ async def generate_image(request: Request, current_user: dict = Depends(get_curr
                    WHERE id = ? AND user_id = ?""",
                 (image_url, library_item_id, current_user["id"])
             )
+            bump_public_version(current_user["id"], conn)
             conn.commit()
             conn.close()
         except Exception as _e:
@@ -6253,7 +6594,8 @@ async def regenerate_content(item_id: int, current_user: dict = Depends(get_curr
     situation = _random.choice(_sit_pool)
 
     try:
-        result = generate_content_core(
+        result = await run_blocking(
+            generate_content_core,
             agent_name           = user_row["agent_name"],
             brokerage            = user_row["brokerage"],
             market               = setup.get("market", ""),
@@ -6293,11 +6635,14 @@ async def regenerate_content(item_id: int, current_user: dict = Depends(get_curr
     conn = _gc()
     conn.execute(
         """UPDATE content_library
-           SET content = ?, compliance = ?,
+           SET content = ?, compliance = ?, verdict = ?,
                content_regen_count = COALESCE(content_regen_count, 0) + 1
            WHERE id = ? AND user_id = ?""",
-        (_json.dumps(new_content), _json.dumps(new_compliance), item_id, uid),
+        (_json.dumps(new_content), _json.dumps(new_compliance), _compliance_verdict(new_compliance),
+         item_id, uid),
     )
+    refresh_post_slug(item_id, conn)
+    bump_public_version(uid, conn)
     conn.commit()
     conn.close()
 
@@ -6311,26 +6656,14 @@ async def regenerate_content(item_id: int, current_user: dict = Depends(get_curr
 
 
 # ── Waitlist IP-based rate limiter ───────────────────────────────────────────
-# Prevents bot/spam abuse of the public contact form.
-# In-memory rolling window — resets on server restart, which is acceptable
-# for a walkthrough-request form (not a payment or auth endpoint).
-_waitlist_rate: dict = {}   # { ip: [unix_timestamp, ...] }
+# Prevents bot/spam abuse of the public contact form (rate_limit.py).
 _WAITLIST_MAX    = 3        # max submissions allowed per window
 _WAITLIST_WINDOW = 3600     # rolling window in seconds (1 hour)
+_waitlist_limiter = SlidingWindowLimiter("waitlist", limit=_WAITLIST_MAX, window=_WAITLIST_WINDOW)
 
 def _waitlist_check_rate_limit(ip: str) -> bool:
-    """
-    Returns True (request allowed) or False (rate limited).
-    Prunes stale timestamps on every call — no background cleanup needed.
-    """
-    now          = time.time()
-    window_start = now - _WAITLIST_WINDOW
-    hits         = [t for t in _waitlist_rate.get(ip, []) if t > window_start]
-    if len(hits) >= _WAITLIST_MAX:
-        return False
-    hits.append(now)
-    _waitlist_rate[ip] = hits
-    return True
+    """Returns True (request allowed) or False (rate limited)."""
+    return _waitlist_limiter.allow(ip)
 
 
 @app.post("/waitlist")
@@ -6391,23 +6724,22 @@ async def submit_waitlist(request: Request):
 
     # Send email via SendGrid
     try:
-        import httpx as _httpx
         sendgrid_key  = os.getenv("SENDGRID_API_KEY", "")
         sendgrid_from = os.getenv("SENDGRID_FROM_EMAIL", "support@homebridgegroup.co")
         if sendgrid_key:
             phone_line = f"Phone: {phone}\n" if phone else ""
             email_body = f"""New First Look Request\n\nName: {name}\nEmail: {email}\n{phone_line}Role: {role}\nCompany: {company}\nMessage: {message}\n\nSubmitted via homebridgegroup.co"""
-            await _httpx.AsyncClient().post(
-                "https://api.sendgrid.com/v3/mail/send",
-                headers={"Authorization": f"Bearer {sendgrid_key}", "Content-Type": "application/json"},
-                json={
-                    "personalizations": [{"to": [{"email": "support@homebridgegroup.co"}]}],
-                    "from": {"email": sendgrid_from, "name": "HomeBridge Waitlist"},
-                    "subject": f"First Look Request: {name} — {company or role}",
-                    "content": [{"type": "text/plain", "value": email_body}]
-                },
-                timeout=10
-            )
+            async with upstream_client("sendgrid", timeout=10) as client:
+                await client.post(
+                    "https://api.sendgrid.com/v3/mail/send",
+                    headers={"Authorization": f"Bearer {sendgrid_key}", "Content-Type": "application/json"},
+                    json={
+                        "personalizations": [{"to": [{"email": "support@homebridgegroup.co"}]}],
+                        "from": {"email": sendgrid_from, "name": "HomeBridge Waitlist"},
+                        "subject": f"First Look Request: {name} — {company or role}",
+                        "content": [{"type": "text/plain", "value": email_body}]
+                    },
+                )
     except Exception as e:
         print(f"[Waitlist] SendGrid error: {e}")
 
@@ -6417,7 +6749,7 @@ async def submit_waitlist(request: Request):
 # CONTACT FORM — Session 24
 # POST /contact  — public, saves to DB + sends notification to Kevin
 # GET  /admin/contacts — admin only, list all submissions
-# Rate-limited: reuses _waitlist_rate limiter (3 per hour per IP)
+# Rate-limited: reuses _waitlist_limiter (3 per hour per IP)
 # ─────────────────────────────────────────────────────────────────────────────
 
 class ContactRequest(BaseModel):
@@ -6437,21 +6769,13 @@ class ContactRequest(BaseModel):
 # One check per email: enforced by compliance_checker_leads table.
 # =============================================================================
 
-_comp_check_rate: dict = {}   # { ip: [unix_timestamp, ...] }
 _COMP_CHECK_MAX    = 3
 _COMP_CHECK_WINDOW = 3600     # 1 hour rolling window
+_comp_check_limiter = SlidingWindowLimiter("compliance_check", limit=_COMP_CHECK_MAX, window=_COMP_CHECK_WINDOW)
 
 def _comp_check_rate_limit(ip: str) -> bool:
     """Returns True (allowed) or False (rate limited)."""
-    import time as _t
-    now          = _t.time()
-    window_start = now - _COMP_CHECK_WINDOW
-    hits = [t for t in _comp_check_rate.get(ip, []) if t > window_start]
-    if len(hits) >= _COMP_CHECK_MAX:
-        return False
-    hits.append(now)
-    _comp_check_rate[ip] = hits
-    return True
+    return _comp_check_limiter.allow(ip)
 
 
 def _geolocate_ip_state(ip: str) -> str:
@@ -6534,34 +6858,11 @@ async def public_compliance_check(request: Request):
 
     base_email = _normalize_email_base(email)
 
-    # ── DB: ensure table exists with full schema, migrate if needed ───────────
+    # ── DB: compliance_checker_leads is created by database migration 006 ────
     from database import get_conn as _gc_pub
     try:
         conn = _gc_pub()
         c    = conn.cursor()
-        # Base table — always ensure it exists
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS compliance_checker_leads (
-                id           INTEGER PRIMARY KEY AUTOINCREMENT,
-                email        TEXT NOT NULL UNIQUE,
-                post_text    TEXT NOT NULL,
-                results_json TEXT,
-                ip_address   TEXT,
-                created_at   TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        conn.commit()
-        # Additive migrations — safe to run every request, SQLite silently errors on existing columns
-        for _col_sql in [
-            "ALTER TABLE compliance_checker_leads ADD COLUMN name TEXT",
-            "ALTER TABLE compliance_checker_leads ADD COLUMN state TEXT",
-            "ALTER TABLE compliance_checker_leads ADD COLUMN base_email TEXT",
-        ]:
-            try:
-                c.execute(_col_sql)
-                conn.commit()
-            except Exception:
-                pass  # Column already exists
 
         # Check email uniqueness (exact match)
         c.execute("SELECT id FROM compliance_checker_leads WHERE email = ?", (email,))
@@ -6589,7 +6890,7 @@ async def public_compliance_check(request: Request):
 
     # ── Run the 8-rule compliance check ──────────────────────────────────────
     try:
-        check_result = run_public_compliance_check(post_text)
+        check_result = await run_blocking(run_public_compliance_check, post_text)
     except HTTPException:
         raise
     except Exception as _ce:
@@ -6661,19 +6962,6 @@ async def admin_compliance_leads(
     conn   = _gc_leads()
     c      = conn.cursor()
 
-    # Ensure table exists (defensive — may not exist if no checks done yet)
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS compliance_checker_leads (
-            id           INTEGER PRIMARY KEY AUTOINCREMENT,
-            email        TEXT NOT NULL UNIQUE,
-            post_text    TEXT NOT NULL,
-            results_json TEXT,
-            ip_address   TEXT,
-            created_at   TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    conn.commit()
-
     # Total count
     c.execute("SELECT COUNT(*) as n FROM compliance_checker_leads")
     total = c.fetchone()["n"]
@@ -6852,7 +7140,6 @@ async def submit_contact(body: ContactRequest, request: Request):
 
     # Send notification email to Kevin via SendGrid
     try:
-        import httpx as _httpx_c
         sendgrid_key  = os.getenv("SENDGRID_API_KEY", "")
         sendgrid_from = os.getenv("SENDGRID_FROM_EMAIL", "support@homebridgegroup.co")
         notify_email  = "kevin@kevinlundy.net"
@@ -6899,20 +7186,20 @@ async def submit_contact(body: ContactRequest, request: Request):
   </div>
 </div>"""
 
-            await _httpx_c.AsyncClient().post(
-                "https://api.sendgrid.com/v3/mail/send",
-                headers={
-                    "Authorization": f"Bearer {sendgrid_key}",
-                    "Content-Type":  "application/json",
-                },
-                json={
-                    "personalizations": [{"to": [{"email": notify_email, "name": "Kevin Lundy"}]}],
-                    "from":    {"email": sendgrid_from, "name": "HomeBridge"},
-                    "subject": subject,
-                    "content": [{"type": "text/html", "value": html_body}],
-                },
-                timeout=10,
-            )
+            async with upstream_client("sendgrid", timeout=10) as client:
+                await client.post(
+                    "https://api.sendgrid.com/v3/mail/send",
+                    headers={
+                        "Authorization": f"Bearer {sendgrid_key}",
+                        "Content-Type":  "application/json",
+                    },
+                    json={
+                        "personalizations": [{"to": [{"email": notify_email, "name": "Kevin Lundy"}]}],
+                        "from":    {"email": sendgrid_from, "name": "HomeBridge"},
+                        "subject": subject,
+                        "content": [{"type": "text/html", "value": html_body}],
+                    },
+                )
             print(f"[Contact] Notification sent for {name} ({email}) type={contact_type}")
     except Exception as e:
         print(f"[Contact] SendGrid notification failed: {e}")
@@ -8187,8 +8474,7 @@ async def approval_resend(token: str = ""):
     No login required — the original token proves the user is who they say.
     """
     from database import lookup_approval_token_record, create_approval_token
-    from social import send_approval_email, send_approval_sms
-    import asyncio as _asyncio_rs
+    from notifications import enqueue_approval_email, enqueue_approval_sms
 
     if not token:
         return {"ok": False, "error": "No token."}
@@ -8218,22 +8504,24 @@ async def approval_resend(token: str = ""):
     api_url     = os.getenv("BACKEND_URL", "https://api.homebridgegroup.co")
     approve_url = f"{api_url}/approve/{new_token}"
 
+    # Queued to the notification dispatcher (delivered within seconds, retried
+    # on failure). *_sent means accepted for delivery.
     sent_email = False
     sent_sms   = False
 
     if to_email:
         try:
-            _asyncio_rs.run(send_approval_email(to_email, agent_name, headline, approve_url))
+            enqueue_approval_email(to_email, agent_name, headline, approve_url)
             sent_email = True
         except Exception as e:
-            print(f"[Resend] Email failed: {e}")
+            print(f"[Resend] Email enqueue failed: {e}")
 
     if phone:
         try:
-            _asyncio_rs.run(send_approval_sms(phone, agent_name, headline, approve_url))
+            enqueue_approval_sms(phone, agent_name, headline, approve_url)
             sent_sms = True
         except Exception as e:
-            print(f"[Resend] SMS failed: {e}")
+            print(f"[Resend] SMS enqueue failed: {e}")
 
     return {"ok": sent_email or sent_sms, "email_sent": sent_email, "sms_sent": sent_sms}
 
@@ -8404,7 +8692,7 @@ async def partner_public_enroll(body: PublicPartnerEnrollRequest, request: Reque
     Their is_licensed=0 flag suppresses content engine access in renderViewSwitcher.
     """
     import re as _re
-    from auth import create_user as _create_user, create_token as _create_token, _auth_check_rate_limit as _acrl, _get_client_ip as _gcip
+    from auth import create_user as _create_user, create_token as _create_token, _auth_check_rate_limit as _acrl, _get_client_ip as _gcip, hash_password_async as _hash_pw
 
     # ── IP rate limit — Session 53 ────────────────────────────────────────────
     if not _acrl(_gcip(request)):
@@ -8441,12 +8729,13 @@ async def partner_public_enroll(body: PublicPartnerEnrollRequest, request: Reque
     is_agent = (body.partner_type or "").lower() == "agent"
 
     user = _create_user(
-        email      = email,
-        password   = pw,
-        agent_name = name,
-        brokerage  = "",
-        role       = "agent",
-        broker_id  = None,
+        email         = email,
+        password      = pw,
+        agent_name    = name,
+        brokerage     = "",
+        role          = "agent",
+        broker_id     = None,
+        password_hash = await _hash_pw(pw),
     )
     if not user:
         raise HTTPException(409, "An account with that email already exists. Please log in instead.")
@@ -8498,7 +8787,6 @@ async def partner_public_enroll(body: PublicPartnerEnrollRequest, request: Reque
     _sendgrid_from = os.getenv("SENDGRID_FROM_EMAIL", "noreply@homebridgegroup.co")
     if _sendgrid_key:
         try:
-            import httpx as _httpx
             _welcome_html = f"""
 <div style="font-family:-apple-system,BlinkMacSystemFont,'Segoe UI',sans-serif;max-width:520px;margin:0 auto;padding:32px 24px;">
   <div style="font-size:18px;font-weight:700;color:#0f0f0d;margin-bottom:4px;">Home<span style="color:#1749c9;">Bridge</span></div>
@@ -8551,20 +8839,20 @@ async def partner_public_enroll(body: PublicPartnerEnrollRequest, request: Reque
   <p style="color:#b0afa6;font-size:11px;">HomeBridge Partner Program · homebridgegroup.co</p>
 </div>
 """
-            _httpx.post(
-                "https://api.sendgrid.com/v3/mail/send",
-                headers={
-                    "Authorization": f"Bearer {_sendgrid_key}",
-                    "Content-Type":  "application/json",
-                },
-                json={
-                    "personalizations": [{"to": [{"email": email}]}],
-                    "from":    {"email": _sendgrid_from, "name": "HomeBridge"},
-                    "subject": f"Welcome to the HomeBridge Partner Program — your code is {referral_code}",
-                    "content": [{"type": "text/html", "value": _welcome_html}],
-                },
-                timeout=10,
-            )
+            async with upstream_client("sendgrid", timeout=10) as client:
+                await client.post(
+                    "https://api.sendgrid.com/v3/mail/send",
+                    headers={
+                        "Authorization": f"Bearer {_sendgrid_key}",
+                        "Content-Type":  "application/json",
+                    },
+                    json={
+                        "personalizations": [{"to": [{"email": email}]}],
+                        "from":    {"email": _sendgrid_from, "name": "HomeBridge"},
+                        "subject": f"Welcome to the HomeBridge Partner Program — your code is {referral_code}",
+                        "content": [{"type": "text/html", "value": _welcome_html}],
+                    },
+                )
             print(f"[PublicEnroll] Welcome email sent to {email}")
         except Exception as _mail_err:
             # Email failure must never block enrollment — code is shown on page
@@ -8590,21 +8878,20 @@ async def partner_public_enroll(body: PublicPartnerEnrollRequest, request: Reque
 
     if _sendgrid_key and _owner_email:
         try:
-            import httpx as _hx2
-            _hx2.post(
-                "https://api.sendgrid.com/v3/mail/send",
-                headers={
-                    "Authorization": f"Bearer {_sendgrid_key}",
-                    "Content-Type":  "application/json",
-                },
-                json={
-                    "personalizations": [{"to": [{"email": _owner_email}]}],
-                    "from":    {"email": _sendgrid_from, "name": "HomeBridge"},
-                    "subject": f"New Partner: {name} ({body.partner_type or 'other'})",
-                    "content": [{"type": "text/html", "value": f"<p><strong>{name}</strong> ({email}) just enrolled as a Partner ({body.partner_type or 'other'}).</p><p>Referral code: <strong>{referral_code}</strong></p>"}],
-                },
-                timeout=10,
-            )
+            async with upstream_client("sendgrid", timeout=10) as client:
+                await client.post(
+                    "https://api.sendgrid.com/v3/mail/send",
+                    headers={
+                        "Authorization": f"Bearer {_sendgrid_key}",
+                        "Content-Type":  "application/json",
+                    },
+                    json={
+                        "personalizations": [{"to": [{"email": _owner_email}]}],
+                        "from":    {"email": _sendgrid_from, "name": "HomeBridge"},
+                        "subject": f"New Partner: {name} ({body.partner_type or 'other'})",
+                        "content": [{"type": "text/html", "value": f"<p><strong>{name}</strong> ({email}) just enrolled as a Partner ({body.partner_type or 'other'}).</p><p>Referral code: <strong>{referral_code}</strong></p>"}],
+                    },
+                )
         except Exception:
             pass
 
@@ -8995,8 +9282,6 @@ async def generate_flyer(req: FlyerRequest, current_user: dict = Depends(get_cur
 # Agents see "Video Identity", "Generate Video", "Your video is ready."
 # ═══════════════════════════════════════════════════════════════════════════════
 
-import httpx as _httpx
-
 # ── Profile photo upload ──────────────────────────────────────────────────────
 
 @app.post("/profile/photo")
@@ -9251,7 +9536,7 @@ async def video_render(req: VideoRenderRequest, current_user: dict = Depends(get
         }
 
         try:
-            async with _httpx.AsyncClient(timeout=30.0) as client:
+            async with upstream_client("heygen", timeout=30.0) as client:
                 create_resp = await client.post(
                     "https://api.heygen.com/v3/avatars",
                     headers={
@@ -9293,7 +9578,7 @@ async def video_render(req: VideoRenderRequest, current_user: dict = Depends(get
             for _poll_attempt in range(12):   # 12 × 5s = 60s max
                 await _asyncio_vid.sleep(5)
                 try:
-                    async with _httpx.AsyncClient(timeout=15.0) as client:
+                    async with upstream_client("heygen", timeout=15.0) as client:
                         poll_resp = await client.get(
                             f"https://api.heygen.com/v3/avatars/{new_avatar_id}",
                             headers={"X-Api-Key": HEYGEN_API_KEY},
@@ -9351,7 +9636,7 @@ async def video_render(req: VideoRenderRequest, current_user: dict = Depends(get
         # ── LMNT path: synthesize script → temp audio → signed URL → HeyGen ──
         import asyncio as _asyncio_voice
         try:
-            async with _httpx.AsyncClient(timeout=60.0) as client:
+            async with upstream_client("lmnt", timeout=60.0) as client:
                 lmnt_resp = await client.post(
                     "https://api.lmnt.com/v1/ai/speech/bytes",
                     headers={
@@ -9416,7 +9701,7 @@ async def video_render(req: VideoRenderRequest, current_user: dict = Depends(get
     }
 
     try:
-        async with _httpx.AsyncClient(timeout=30.0) as client:
+        async with upstream_client("heygen", timeout=30.0) as client:
             resp = await client.post(
                 "https://api.heygen.com/v2/video/generate",
                 headers={
@@ -9584,7 +9869,8 @@ async def jordan_message(req: JordanMessageRequest, current_user: dict = Depends
 
     # ── Call Anthropic API ────────────────────────────────────────────────────
     try:
-        response = anthropic_client.messages.create(
+        response = await run_blocking(
+            _llm_create, anthropic_client,
             model      = "claude-sonnet-4-6",
             max_tokens = 300,
             system     = system_prompt,
@@ -9611,22 +9897,11 @@ async def jordan_message(req: JordanMessageRequest, current_user: dict = Depends
 # No auth required — agent may not have a token yet during onboarding.
 # Rate limited by IP: 30 calls per hour per IP (6 questions x 5 retries max).
 
-_reflection_rate: Dict[str, list] = {}
-_reflection_lock = threading.Lock()
+_reflection_limiter = SlidingWindowLimiter("reflection", limit=30, window=3600)
 
 def _reflection_rate_limit(ip: str) -> bool:
     """Returns True if the request is allowed, False if rate limited."""
-    now = time.time()
-    window = 3600  # 1 hour
-    max_calls = 30
-    with _reflection_lock:
-        calls = _reflection_rate.get(ip, [])
-        calls = [t for t in calls if now - t < window]
-        if len(calls) >= max_calls:
-            return False
-        calls.append(now)
-        _reflection_rate[ip] = calls
-        return True
+    return _reflection_limiter.allow(ip)
 
 
 class JordanReflectionRequest(BaseModel):
@@ -9691,7 +9966,8 @@ async def jordan_onboarding_reflection(req: JordanReflectionRequest, request: Re
     fallback_msg = fallbacks[(q_num - 1) % len(fallbacks)]
 
     try:
-        response = anthropic_client.messages.create(
+        response = await run_blocking(
+            _llm_create, anthropic_client,
             model      = "claude-sonnet-4-6",
             max_tokens = 120,
             system     = system_prompt,
@@ -9746,7 +10022,7 @@ async def video_status(job_id: int, current_user: dict = Depends(get_current_use
         return {"job_id": job_id, "status": "pending", "video_url": None, "error": None}
 
     try:
-        async with _httpx.AsyncClient(timeout=15.0) as client:
+        async with upstream_client("heygen", timeout=15.0) as client:
             resp = await client.get(
                 f"https://api.heygen.com/v1/video_status.get?video_id={heygen_video_id}",
                 headers={"X-Api-Key": HEYGEN_API_KEY},
@@ -10046,8 +10322,7 @@ async def voice_setup(request: Request, current_user: dict = Depends(get_current
     #    Header: lmnt-version: 1.1 required on all voice operations.
     agent_name = current_user.get("agent_name", f"agent_{uid}")
     try:
-        import httpx as _httpx_voice
-        async with _httpx_voice.AsyncClient(timeout=120.0) as client:
+        async with upstream_client("lmnt", timeout=120.0) as client:
             lmnt_resp = await client.post(
                 "https://api.lmnt.com/v1/ai/voice",
                 headers={
@@ -10121,8 +10396,7 @@ async def voice_setup_delete(current_user: dict = Depends(get_current_user)):
 
     # 1. Delete from LMNT — best effort, do not block on failure
     try:
-        import httpx as _httpx_voice_del
-        async with _httpx_voice_del.AsyncClient(timeout=30.0) as client:
+        async with upstream_client("lmnt", timeout=30.0) as client:
             del_resp = await client.delete(
                 f"https://api.lmnt.com/v1/ai/voice/{voice_id}",
                 headers={"X-API-Key": LMNT_API_KEY},
@@ -12,10 +12,12 @@ from fastapi import APIRouter, HTTPException, Depends, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, EmailStr
 
+from database import get_conn, bump_public_version
+from rate_limit import SlidingWindowLimiter
+
 router = APIRouter(prefix="/auth", tags=["auth"])
 security = HTTPBearer()
 
-DB_NAME = os.getenv("DB_PATH", "/data/homebridge.db")
 JWT_SECRET = os.getenv("JWT_SECRET")
 if not JWT_SECRET or JWT_SECRET == "homebridge-secret-change-in-production":
     raise RuntimeError(
@@ -28,6 +30,7 @@ JWT_EXPIRY_DAYS = 10   # Session 52: reduced from 30; revocation mechanism added
 # ── SendGrid config (graceful no-op if not configured) ──
 SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY", "")
 SENDGRID_FROM    = os.getenv("SENDGRID_FROM_EMAIL", "noreply@homebridgegroup.co")
+SENDGRID_API_URL = os.getenv("SENDGRID_API_URL", "https://api.sendgrid.com/v3/mail/send")
 FRONTEND_URL     = os.getenv("FRONTEND_URL", "https://app.homebridgegroup.co")
 SENDGRID_ENABLED = bool(SENDGRID_API_KEY)
 
@@ -39,7 +42,7 @@ def send_email(to_email: str, subject: str, html_body: str) -> bool:
     try:
         import httpx
         res = httpx.post(
-            "https://api.sendgrid.com/v3/mail/send",
+            SENDGRID_API_URL,
             headers={"Authorization": f"Bearer {SENDGRID_API_KEY}", "Content-Type": "application/json"},
             json={
                 "personalizations": [{"to": [{"email": to_email}]}],
@@ -111,8 +114,7 @@ def make_office_code(user_id: int) -> str:
 
 def get_broker_by_code(office_code: str):
     """Find a broker by their office invite code."""
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
+    conn = get_conn()
     c = conn.cursor()
     c.execute("SELECT * FROM users WHERE role = 'broker' AND is_active = 1")
     rows = c.fetchall()
@@ -124,7 +126,7 @@ def get_broker_by_code(office_code: str):
     return None
 
 def init_users_table():
-    conn = sqlite3.connect(DB_NAME)
+    conn = get_conn()
     c = conn.cursor()
     c.execute("""
         CREATE TABLE IF NOT EXISTS users (
@@ -151,8 +153,7 @@ def init_users_table():
     conn.close()
 
 def get_user_by_email(email: str):
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
+    conn = get_conn()
     c = conn.cursor()
     c.execute("SELECT * FROM users WHERE email = ?", (email.lower().strip(),))
     row = c.fetchone()
@@ -162,8 +163,7 @@ def get_user_by_email(email: str):
     return _normalize_user(dict(row))
 
 def get_user_by_id(user_id: int):
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
+    conn = get_conn()
     c = conn.cursor()
     c.execute("SELECT * FROM users WHERE id = ?", (user_id,))
     row = c.fetchone()
@@ -172,11 +172,262 @@ def get_user_by_id(user_id: int):
         return None
     return _normalize_user(dict(row))
 
+
+# ── Authenticated-user cache ──────────────────────────────────────────────────
+# get_current_user runs on every API call. Rows (normalized user + token_version)
+# are kept in a small LRU for AUTH_USER_CACHE_TTL_SECONDS. Every UPDATE/DELETE of
+# an auth-relevant users column is logged by a trigger (database migration 16);
+# each process polls that log at most every AUTH_CACHE_SYNC_SECONDS and evicts
+# the listed ids, so suspensions, password/role/plan changes and token_version
+# bumps reach all uvicorn workers within one sync interval.
+AUTH_USER_CACHE_TTL_SECONDS = float(os.getenv("AUTH_USER_CACHE_TTL_SECONDS", "60"))
+AUTH_USER_CACHE_MAX         = int(os.getenv("AUTH_USER_CACHE_MAX", "5000"))
+AUTH_CACHE_SYNC_SECONDS     = float(os.getenv("AUTH_CACHE_SYNC_SECONDS", "1"))
+
+import threading as _threading
+import time as _time
+from collections import OrderedDict as _OrderedDict
+
+_user_cache: "_OrderedDict[int, tuple]" = _OrderedDict()   # id -> (loaded_at, user, token_version)
+_user_cache_lock  = _threading.Lock()
+_user_cache_sync  = {"last_id": None, "synced_at": 0.0, "pruned_at": 0.0}
+# Eviction generations, so a miss that raced an eviction doesn't cache the row
+# it read before the change. n counts evictions; _user_cache_evicted keeps the
+# generation of each recently evicted id; floor is the newest generation whose
+# per-id history was trimmed (or wiped by a clear), so anything older is unknown.
+_user_cache_gen: dict = {"n": 0, "floor": 0}
+_user_cache_evicted: "_OrderedDict[int, int]" = _OrderedDict()
+
+
+def _evict_locked(user_id: int) -> None:
+    """Drop user_id and record the eviction. Caller holds _user_cache_lock."""
+    _user_cache.pop(user_id, None)
+    _user_cache_gen["n"] += 1
+    _user_cache_evicted[user_id] = _user_cache_gen["n"]
+    _user_cache_evicted.move_to_end(user_id)
+    while len(_user_cache_evicted) > AUTH_USER_CACHE_MAX:
+        _, gen = _user_cache_evicted.popitem(last=False)
+        _user_cache_gen["floor"] = gen
+
+
+def invalidate_cached_user(user_id: int) -> None:
+    """Drop one user from this process's cache (other workers follow via the trigger log)."""
+    with _user_cache_lock:
+        _evict_locked(user_id)
+
+
+def _sync_user_cache() -> None:
+    from database import user_cache_invalidations_since, user_cache_invalidation_head
+    now = _time.monotonic()
+    with _user_cache_lock:
+        if now - _user_cache_sync["synced_at"] < AUTH_CACHE_SYNC_SECONDS:
+            return
+        _user_cache_sync["synced_at"] = now
+        last_id = _user_cache_sync["last_id"]
+    try:
+        if last_id is None:
+            # First sync: nothing cached yet, just find the head of the log.
+            head, rows = user_cache_invalidation_head(), []
+        else:
+            prune = None
+            if now - _user_cache_sync["pruned_at"] > 600:
+                _user_cache_sync["pruned_at"] = now
+                prune = (datetime.utcnow() - timedelta(hours=1)).strftime("%Y-%m-%d %H:%M:%S")
+            rows = user_cache_invalidations_since(last_id, prune)
+            head = rows[-1][0] if rows else last_id
+    except Exception as e:
+        # Can't see other workers' changes — stop trusting anything cached.
+        print(f"[Auth] user cache sync failed, clearing: {e}")
+        with _user_cache_lock:
+            _user_cache.clear()
+            _user_cache_evicted.clear()
+            _user_cache_gen["n"] += 1
+            _user_cache_gen["floor"] = _user_cache_gen["n"]
+        return
+    with _user_cache_lock:
+        for _, uid in rows:
+            _evict_locked(uid)
+        _user_cache_sync["last_id"] = head
+
+
+def _cached_user(user_id: int):
+    """(user, token_version) for user_id, from the cache when fresh."""
+    _sync_user_cache()
+    now = _time.monotonic()
+    with _user_cache_lock:
+        hit = _user_cache.get(user_id)
+        if hit and now - hit[0] < AUTH_USER_CACHE_TTL_SECONDS:
+            _user_cache.move_to_end(user_id)
+            return dict(hit[1]), hit[2]
+        read_gen = _user_cache_gen["n"]
+
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute("SELECT * FROM users WHERE id = ?", (user_id,))
+    row = c.fetchone()
+    conn.close()
+    if not row:
+        invalidate_cached_user(user_id)
+        return None, None
+    row  = dict(row)
+    user = _normalize_user(row)
+    ver  = row.get("token_version") if row.get("token_version") is not None else 1
+    with _user_cache_lock:
+        # Evicted while we were reading: the row may predate the change, so
+        # serve it this once but don't cache it.
+        if (_user_cache_evicted.get(user_id, 0) <= read_gen
+                and _user_cache_gen["floor"] <= read_gen):
+            _user_cache[user_id] = (now, user, ver)
+            _user_cache.move_to_end(user_id)
+            while len(_user_cache) > AUTH_USER_CACHE_MAX:
+                _user_cache.popitem(last=False)
+    return dict(user), ver
+
+# ── bcrypt work pool ─────────────────────────────────────────────────────────
+# bcrypt is deliberately slow (~250ms at cost 12). Running it inline let a 9am
+# login burst occupy every request thread. All hashing and verification now
+# goes through a small dedicated pool: BCRYPT_WORKERS hashes run at once, up to
+# BCRYPT_MAX_QUEUE more wait, and anything beyond that gets a 503 with
+# Retry-After instead of piling up. bcrypt releases the GIL, so threads suffice.
+# BCRYPT_ROUNDS is the target cost; older hashes are upgraded on next login.
+BCRYPT_ROUNDS    = int(os.getenv("BCRYPT_ROUNDS", "12"))
+BCRYPT_WORKERS   = int(os.getenv("BCRYPT_WORKERS", "2"))
+BCRYPT_MAX_QUEUE = int(os.getenv("BCRYPT_MAX_QUEUE", "32"))
+
+import asyncio as _asyncio
+from concurrent.futures import ThreadPoolExecutor as _ThreadPoolExecutor
+
+_bcrypt_pool  = _ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+_bcrypt_slots = _threading.BoundedSemaphore(BCRYPT_WORKERS + BCRYPT_MAX_QUEUE)
+_bcrypt_lock  = _threading.Lock()
+_bcrypt_stats = {
+    "submitted": 0, "completed": 0, "rejected": 0, "rehashed": 0,
+    "in_flight": 0, "running": 0, "peak_in_flight": 0,
+    "wait_ms_total": 0.0, "wait_ms_max": 0.0,
+}
+
+
+def _bcrypt_submit(fn, *args):
+    """Queue fn on the bcrypt pool. Raises 503 when the queue is full."""
+    if not _bcrypt_slots.acquire(blocking=False):
+        with _bcrypt_lock:
+            _bcrypt_stats["rejected"] += 1
+        raise HTTPException(
+            status_code=503,
+            detail="Sign-in is busy right now. Please try again in a few seconds.",
+            headers={"Retry-After": "2"},
+        )
+    queued_at = _time.monotonic()
+    with _bcrypt_lock:
+        _bcrypt_stats["submitted"] += 1
+        _bcrypt_stats["in_flight"] += 1
+        _bcrypt_stats["peak_in_flight"] = max(_bcrypt_stats["peak_in_flight"], _bcrypt_stats["in_flight"])
+
+    def _run():
+        waited = (_time.monotonic() - queued_at) * 1000
+        with _bcrypt_lock:
+            _bcrypt_stats["running"]       += 1
+            _bcrypt_stats["wait_ms_total"] += waited
+            _bcrypt_stats["wait_ms_max"]    = max(_bcrypt_stats["wait_ms_max"], waited)
+        try:
+            return fn(*args)
+        finally:
+            with _bcrypt_lock:
+                _bcrypt_stats["running"]   -= 1
+                _bcrypt_stats["in_flight"] -= 1
+                _bcrypt_stats["completed"] += 1
+            _bcrypt_slots.release()
+
+    try:
+        return _bcrypt_pool.submit(_run)
+    except RuntimeError:
+        # Pool shut down (interpreter exit) — undo the accounting.
+        with _bcrypt_lock:
+            _bcrypt_stats["in_flight"] -= 1
+        _bcrypt_slots.release()
+        raise
+
+
+def _hashpw(password: str) -> str:
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(BCRYPT_ROUNDS)).decode()
+
+
+def _checkpw(password: str, password_hash: str) -> bool:
+    try:
+        return bcrypt.checkpw(password.encode(), (password_hash or "").encode())
+    except ValueError:
+        return False   # malformed / empty stored hash
+
+
+def hash_password(password: str) -> str:
+    """Blocking hash via the pool — for sync callers already off the event loop."""
+    return _bcrypt_submit(_hashpw, password).result()
+
+
+async def hash_password_async(password: str) -> str:
+    return await _asyncio.wrap_future(_bcrypt_submit(_hashpw, password))
+
+
+def check_password(password: str, password_hash: str) -> bool:
+    """Blocking verify via the pool — for sync callers already off the event loop."""
+    return _bcrypt_submit(_checkpw, password, password_hash).result()
+
+
+def _hash_needs_upgrade(password_hash: str) -> bool:
+    """True when a $2b$NN$ hash was made with a cost other than BCRYPT_ROUNDS."""
+    try:
+        return int(password_hash.split("$")[2]) != BCRYPT_ROUNDS
+    except (AttributeError, IndexError, ValueError):
+        return False
+
+
+def _rehash_in_background(user_id: int, password: str, old_hash: str) -> None:
+    """
+    Re-hash at the current cost after a successful login. Fire-and-forget on
+    the pool; skipped when the pool is saturated (the next login retries).
+    Only replaces the hash it verified, so a concurrent password change wins.
+    """
+    def _upgrade():
+        new_hash = _hashpw(password)
+        conn = get_conn()
+        cur  = conn.execute(
+            "UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?",
+            (new_hash, user_id, old_hash),
+        )
+        conn.commit()
+        conn.close()
+        if cur.rowcount:
+            invalidate_cached_user(user_id)
+            with _bcrypt_lock:
+                _bcrypt_stats["rehashed"] += 1
+
+    def _log_failure(fut):
+        if fut.exception():
+            print(f"[Auth] bcrypt rehash failed for user {user_id}: {fut.exception()}")
+
+    try:
+        _bcrypt_submit(_upgrade).add_done_callback(_log_failure)
+    except HTTPException:
+        pass
+
+
+def bcrypt_pool_stats() -> dict:
+    """Snapshot of the bcrypt pool for /admin/auth-stats."""
+    with _bcrypt_lock:
+        stats = dict(_bcrypt_stats)
+    stats["queued"]       = stats["in_flight"] - stats["running"]
+    stats["wait_ms_avg"]  = round(stats["wait_ms_total"] / stats["completed"], 1) if stats["completed"] else 0.0
+    stats["wait_ms_total"] = round(stats["wait_ms_total"], 1)
+    stats["wait_ms_max"]   = round(stats["wait_ms_max"], 1)
+    stats.update({"workers": BCRYPT_WORKERS, "max_queue": BCRYPT_MAX_QUEUE, "rounds": BCRYPT_ROUNDS})
+    return stats
+
+
 def create_user(email: str, password: str, agent_name: str, brokerage: str,
-               role: str = "agent", broker_id: int = None):
-    hashed = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
+               role: str = "agent", broker_id: int = None, password_hash: str = None):
+    """password_hash: pre-computed hash from hash_password_async (async callers)."""
+    hashed = password_hash or hash_password(password)
+    conn = get_conn()
     c = conn.cursor()
     try:
         c.execute(
@@ -198,24 +449,14 @@ def create_user(email: str, password: str, agent_name: str, brokerage: str,
 # ─────────────────────────────────────────────
 
 # ── AUTH RATE LIMITER — Session 53 ───────────────────────────────────────────
-# In-memory per-IP rate limiter for auth endpoints.
-# Mirrors the waitlist rate limiter pattern in app.py.
-# Resets on server restart — acceptable for auth (token TTL handles persistence).
-_auth_rate: dict = {}      # { ip: [unix_timestamp, ...] }
+# Per-IP limit for login and public signup, shared across workers (rate_limit.py).
 _AUTH_MAX    = 20          # max auth attempts per window per IP
 _AUTH_WINDOW = 900         # 15-minute rolling window
+_auth_limiter = SlidingWindowLimiter("auth", limit=_AUTH_MAX, window=_AUTH_WINDOW)
 
 def _auth_check_rate_limit(ip: str) -> bool:
-    """Returns True (allowed) or False (rate limited). Prunes stale hits on each call."""
-    import time as _t
-    now          = _t.time()
-    window_start = now - _AUTH_WINDOW
-    hits         = [t for t in _auth_rate.get(ip, []) if t > window_start]
-    if len(hits) >= _AUTH_MAX:
-        return False
-    hits.append(now)
-    _auth_rate[ip] = hits
-    return True
+    """Returns True (allowed) or False (rate limited)."""
+    return _auth_limiter.allow(ip)
 
 
 def _get_client_ip(request) -> str:
@@ -247,7 +488,7 @@ def decode_token(token: str) -> dict:
 
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     payload = decode_token(credentials.credentials)
-    user = get_user_by_id(int(payload["sub"]))
+    user, db_ver = _cached_user(int(payload["sub"]))
     if not user:
         raise HTTPException(status_code=401, detail="User not found.")
     if not user["is_active"]:
@@ -255,24 +496,13 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
     # ── JWT version check — Session 53 ───────────────────────────────────────
     # If the token's version is older than the DB version, the user has changed
     # their password or been suspended since this token was issued. Force re-login.
+    # db_ver comes from the same (cached) users row.
     token_ver = payload.get("ver", 1)
-    try:
-        conn = sqlite3.connect(DB_NAME)
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
-        c.execute("SELECT token_version FROM users WHERE id = ?", (user["id"],))
-        row = c.fetchone()
-        conn.close()
-        db_ver = row["token_version"] if row and row["token_version"] is not None else 1
-        if token_ver < db_ver:
-            raise HTTPException(
-                status_code=401,
-                detail="Session expired. Please log in again."
-            )
-    except HTTPException:
-        raise
-    except Exception:
-        pass  # DB check failed — non-blocking, let request through
+    if token_ver < db_ver:
+        raise HTTPException(
+            status_code=401,
+            detail="Session expired. Please log in again."
+        )
     return user
 
 
@@ -329,7 +559,7 @@ def register(body: RegisterRequest, request: Request = None):
     # always present here. sms_consent (Checkbox 2) is independent and optional:
     # when opted in, also stamp the timestamp and client IP for the audit trail.
     try:
-        conn = sqlite3.connect(DB_NAME)
+        conn = get_conn()
         if body.sms_consent:
             sms_ip = _get_client_ip(request)
             conn.execute(
@@ -453,7 +683,7 @@ def register_partner(body: dict):
     # Record ToS/Privacy consent timestamp — Session 53
     if consent_at:
         try:
-            conn = sqlite3.connect(DB_NAME)
+            conn = get_conn()
             conn.execute("UPDATE users SET consent_at = ? WHERE id = ?", (consent_at, user["id"]))
             conn.commit()
             conn.close()
@@ -462,7 +692,7 @@ def register_partner(body: dict):
 
     # Set is_licensed=0 — partner-only users don't generate CIR-verified content
     try:
-        conn = sqlite3.connect(DB_NAME)
+        conn = get_conn()
         conn.execute("UPDATE users SET is_licensed = 0 WHERE id = ?", (user["id"],))
         conn.commit()
         conn.close()
@@ -539,8 +769,7 @@ def login(body: LoginRequest, request: Request = None):
     # not include these newer columns on older schema versions).
     import time as _t
     try:
-        _lc = sqlite3.connect(DB_NAME)
-        _lc.row_factory = sqlite3.Row
+        _lc = get_conn()
         _lr = _lc.cursor()
         _lr.execute(
             "SELECT login_fail_count, login_locked_until, token_version FROM users WHERE id = ?",
@@ -570,14 +799,14 @@ def login(body: LoginRequest, request: Request = None):
             pass  # Malformed timestamp — clear it and proceed
 
     # ── Password check ────────────────────────────────────────────────────────
-    if not bcrypt.checkpw(body.password.encode(), user["password_hash"].encode()):
+    if not check_password(body.password, user["password_hash"]):
         # Increment fail count — lock after 5 failures
         new_fail_count  = fail_count + 1
         new_locked_until = None
         if new_fail_count >= 5:
             new_locked_until = (datetime.utcnow() + timedelta(minutes=30)).isoformat()
         try:
-            _fc = sqlite3.connect(DB_NAME)
+            _fc = get_conn()
             _fc.execute(
                 "UPDATE users SET login_fail_count = ?, login_locked_until = ? WHERE id = ?",
                 (new_fail_count, new_locked_until, user["id"])
@@ -596,7 +825,7 @@ def login(body: LoginRequest, request: Request = None):
 
     # ── Successful login — clear lockout state ────────────────────────────────
     try:
-        _sc = sqlite3.connect(DB_NAME)
+        _sc = get_conn()
         _sc.execute(
             "UPDATE users SET login_fail_count = 0, login_locked_until = NULL WHERE id = ?",
             (user["id"],)
@@ -605,6 +834,8 @@ def login(body: LoginRequest, request: Request = None):
         _sc.close()
     except Exception:
         pass
+    if _hash_needs_upgrade(user["password_hash"]):
+        _rehash_in_background(user["id"], body.password, user["password_hash"])
 
     token = create_token(user["id"], user["email"], user.get("role", "agent"), token_ver)
     from database import get_agent_setup
@@ -683,9 +914,10 @@ def reset_password_endpoint(body: dict):
     row = validate_reset_token(token)
     if not row:
         raise HTTPException(400, "This reset link is invalid or has expired. Please request a new one.")
-    hashed = bcrypt.hashpw(new_password.encode(), bcrypt.gensalt()).decode()
+    hashed = hash_password(new_password)
     update_password(row["user_id"], hashed)
     consume_reset_token(token)
+    invalidate_cached_user(row["user_id"])
     return {"ok": True, "message": "Password updated. You can now sign in with your new password."}
 
 
@@ -729,8 +961,7 @@ def broker_get_agents(current_user=Depends(get_current_user)):
     """Return all agents linked to this broker."""
     if current_user.get("role") not in ("broker", "admin"):
         raise HTTPException(status_code=403, detail="Broker accounts only.")
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
+    conn = get_conn()
     c = conn.cursor()
     c.execute("""
         SELECT id, email, agent_name, brokerage, is_active, created_at, role
@@ -772,7 +1003,7 @@ def update_profile(body: ProfileUpdateRequest, current_user=Depends(get_current_
     if not body.agent_name or not body.email:
         raise HTTPException(status_code=400, detail="Name and email are required.")
 
-    conn = sqlite3.connect(DB_NAME)
+    conn = get_conn()
     c    = conn.cursor()
 
     # Add phone column if it doesn't exist yet
@@ -791,8 +1022,10 @@ def update_profile(body: ProfileUpdateRequest, current_user=Depends(get_current_
     c.execute("""
         UPDATE users SET agent_name=?, brokerage=?, email=?, phone=? WHERE id=?
     """, (body.agent_name.strip(), body.brokerage or "", body.email.lower().strip(), body.phone or "", current_user["id"]))
+    bump_public_version(current_user["id"], conn)
     conn.commit()
     conn.close()
+    invalidate_cached_user(current_user["id"])
 
     updated = get_user_by_id(current_user["id"])
     return {
@@ -809,13 +1042,13 @@ def update_profile(body: ProfileUpdateRequest, current_user=Depends(get_current_
 
 @router.post("/change-password")
 def change_password(body: PasswordChangeRequest, current_user=Depends(get_current_user)):
-    if not bcrypt.checkpw(body.current_password.encode(), current_user["password_hash"].encode()):
+    if not check_password(body.current_password, current_user["password_hash"]):
         raise HTTPException(status_code=401, detail="Current password is incorrect.")
     if len(body.new_password) < 8:
         raise HTTPException(status_code=400, detail="New password must be at least 8 characters.")
 
-    new_hash = bcrypt.hashpw(body.new_password.encode(), bcrypt.gensalt()).decode()
-    conn = sqlite3.connect(DB_NAME)
+    new_hash = hash_password(body.new_password)
+    conn = get_conn()
     c    = conn.cursor()
     # Increment token_version — invalidates all existing sessions on other devices
     c.execute("""
@@ -826,4 +1059,5 @@ def change_password(body: PasswordChangeRequest, current_user=Depends(get_curren
     """, (new_hash, current_user["id"]))
     conn.commit()
     conn.close()
+    invalidate_cached_user(current_user["id"])
     return {"success": True, "message": "Password updated. Other devices will be signed out."}
@@ -1,11 +1,18 @@
 import os
 import json
+import asyncio
+import functools
+import threading
 from datetime import datetime
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, List, Dict, Any
 
 from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel, Field
 
+from rate_limit import TokenBucketLimiter
+
 try:
     from anthropic import Anthropic
 except ImportError:
@@ -79,9 +86,17 @@ class ComplianceBadge(BaseModel):
     notes: List[str] = Field(default_factory=list)
     disclosureChecks: List[str] = Field(default_factory=list)
 
+    # Pass 1 — matched phrase spans for UI highlighting
+    # [{"ruleId", "term", "start", "end", "severity"}] — offsets into the checked text
+    flaggedSpans: List[Dict[str, Any]] = Field(default_factory=list)
+
     # Pass 2 — semantic flags from Claude review
     semanticFlags: List[Dict[str, Any]] = Field(default_factory=list)
     semanticAssessment: str = Field(default="")
+    # True when Pass 2 reused a cached review of identical content under the
+    # same rules; semanticReviewedAt is when that review actually ran (UTC ISO)
+    semanticCacheHit: bool = Field(default=False)
+    semanticReviewedAt: str = Field(default="")
 
     # Rule provenance — version stamp and verification dates
     # rules_version: the quarter in which the active rule set was last fully verified
@@ -118,6 +133,36 @@ class ContentRequest(BaseModel):
     modulation:      Optional[str] = Field("standard")  # "standard" | "warmer" | "sharper" | "quieter"
 
 
+# Global cap on concurrent Claude calls made through generate_content_core and
+# the Pass 2 semantic review. The scheduler fans generation out across a worker
+# pool; this keeps the total in flight under our API concurrency/rate budget no
+# matter how many workers (or request threads) are active.
+LLM_MAX_INFLIGHT = int(os.getenv("LLM_MAX_INFLIGHT", "6"))
+_llm_inflight    = threading.BoundedSemaphore(LLM_MAX_INFLIGHT)
+
+# The Anthropic client and the compliance passes are synchronous. Async
+# endpoints must never call them on the event loop — a 10-30 s generation
+# would freeze every other request on the worker, public pages included.
+# They hand the work to _llm_executor via run_blocking(). Pass 2 gets its own
+# pool so a job already holding an _llm_executor thread can fan out to it
+# without the two ever waiting on each other.
+LLM_EXECUTOR_WORKERS = int(os.getenv("LLM_EXECUTOR_WORKERS", "16"))
+_llm_executor        = ThreadPoolExecutor(max_workers=LLM_EXECUTOR_WORKERS, thread_name_prefix="llm")
+_compliance_executor = ThreadPoolExecutor(max_workers=LLM_EXECUTOR_WORKERS, thread_name_prefix="compliance")
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run a blocking callable on the LLM thread pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_llm_executor, functools.partial(fn, *args, **kwargs))
+
+
+def _llm_create(client, **kwargs):
+    """client.messages.create() under the global in-flight cap."""
+    with _llm_inflight:
+        return client.messages.create(**kwargs)
+
+
 def _get_anthropic_client():
     if Anthropic is None:
         raise RuntimeError("Anthropic Python client is not installed.")
@@ -2339,8 +2384,112 @@ def _get_rules_for_profile(profile_name: str) -> List[Dict]:
 # PASS 1 — Rule-Based Phrase Matching
 # Runs synchronously; no API call; catches explicit phrase violations only.
 # Context-dependent language is deferred to Pass 2 (semantic).
+#
+# Terms are compiled into one Aho–Corasick automaton per rule set (profile +
+# custom rules), so a check is a single pass over the text regardless of how
+# many terms are active. Matches are word-boundary aware: "no men" no longer
+# fires inside "no mention", and "scif" not inside "scifi". A plural /
+# past-tense ending is tolerated on the right ("kickbacks", "pocket listings")
+# so boundary checking never costs recall the old substring test had.
 # ─────────────────────────────────────────────────────────────────────────────
 
+_PHRASE_SUFFIXES = ("", "s", "es", "d", "ed")
+
+
+class _PhraseMatcher:
+    """Aho–Corasick automaton over compliance terms. Immutable once built."""
+
+    def __init__(self, terms_by_rule: List[tuple]):
+        # terms_by_rule: [(rule_id, term), ...] — terms must be lowercase
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out:  List[List[tuple]] = [[]]
+        for rule_id, term in terms_by_rule:
+            node = 0
+            for ch in term:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append((rule_id, term))
+
+        # Breadth-first failure links; each node inherits its fail node's outputs
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    @staticmethod
+    def _bounded(text: str, start: int, end: int, term: str) -> bool:
+        if term[0].isalnum() and start > 0 and text[start - 1].isalnum():
+            return False
+        if term[-1].isalnum():
+            tail = end
+            while tail < len(text) and text[tail].isalnum():
+                tail += 1
+            if text[end:tail] not in _PHRASE_SUFFIXES:
+                return False
+        return True
+
+    def find_all(self, text: str) -> List[Dict[str, Any]]:
+        """Return every boundary-respecting hit as {ruleId, term, start, end}, in text order."""
+        hits = []
+        node = 0
+        goto, fail, out = self._goto, self._fail, self._out
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for rule_id, term in out[node]:
+                start = i - len(term) + 1
+                if self._bounded(text, start, i + 1, term):
+                    hits.append({"ruleId": rule_id, "term": term, "start": start, "end": i + 1})
+        hits.sort(key=lambda h: (h["start"], -h["end"]))
+        return hits
+
+
+_phrase_matchers: Dict[tuple, _PhraseMatcher] = {}
+
+
+def _get_phrase_matcher(rule_ids: tuple) -> _PhraseMatcher:
+    """Return the compiled matcher for an ordered tuple of rule ids (built once, then reused)."""
+    matcher = _phrase_matchers.get(rule_ids)
+    if matcher is None:
+        pairs = [(rid, t.lower()) for rid in rule_ids
+                 for t in COMPLIANCE_RULES.get(rid, {}).get("terms", []) if t]
+        matcher = _PhraseMatcher(pairs)
+        _phrase_matchers[rule_ids] = matcher
+    return matcher
+
+
+def _rules_for_check(profile_name: str, custom_rule_ids: List[str] = None) -> List[Dict]:
+    """Profile rules plus any custom rules, deduplicated, in profile order."""
+    rules = _get_rules_for_profile(profile_name)
+    if custom_rule_ids:
+        rules = rules + [COMPLIANCE_RULES[rid] for rid in custom_rule_ids if rid in COMPLIANCE_RULES]
+    seen_ids: set = set()
+    deduped_rules = []
+    for r in rules:
+        if r["id"] not in seen_ids:
+            deduped_rules.append(r)
+            seen_ids.add(r["id"])
+    return deduped_rules
+
+
+# Compile the standard profiles up front so the first request doesn't pay for it
+for _profile_name in COMPLIANCE_PROFILES:
+    _get_phrase_matcher(tuple(r["id"] for r in _rules_for_check(_profile_name)))
+
 def _run_compliance_check(
     content: str,
     agent_name: str,
@@ -2368,23 +2517,23 @@ def _run_compliance_check(
     else:
         profile_name = _get_compliance_profile(niche)
 
-    rules = _get_rules_for_profile(profile_name)
-    if custom_rule_ids:
-        for rid in custom_rule_ids:
-            if rid in COMPLIANCE_RULES:
-                rules.append(COMPLIANCE_RULES[rid])
-
-    # ── Deduplicate rules ─────────────────────────────────────────────────────
-    seen_ids: set = set()
-    deduped_rules = []
-    for r in rules:
-        if r["id"] not in seen_ids:
-            deduped_rules.append(r)
-            seen_ids.add(r["id"])
+    deduped_rules = _rules_for_check(profile_name, custom_rule_ids)
+
+    # ── Single pass over the text for every active term ──────────────────────
+    # Offsets index content_lower, which matches content for all ASCII text.
+    hits = _get_phrase_matcher(tuple(r["id"] for r in deduped_rules)).find_all(content_lower)
+    hits_by_rule: Dict[str, List[str]] = {}
+    for h in hits:
+        terms = hits_by_rule.setdefault(h["ruleId"], [])
+        if h["term"] not in terms:
+            terms.append(h["term"])
+    flagged_spans = [
+        dict(h, severity=COMPLIANCE_RULES[h["ruleId"]]["severity"]) for h in hits
+    ]
 
     # ── Apply each rule ───────────────────────────────────────────────────────
     for rule in deduped_rules:
-        triggered = [t for t in rule.get("terms", []) if t in content_lower]
+        triggered = hits_by_rule.get(rule["id"], [])
 
         # Personalise state_commission label with agent state
         rule_authority = rule.get("authority", rule["id"])
@@ -2551,6 +2700,7 @@ def _run_compliance_check(
         stateCompliance=state_status,
         mlsCompliance=mls_status,
         disclosureChecks=disclosure_checks,
+        flaggedSpans=flagged_spans,
         semanticFlags=[],
         semanticAssessment="",
     )
@@ -2656,6 +2806,29 @@ If no concerns exist after checking all protected classes and proxy language, re
 # Profiles that require semantic review (Fair Housing in scope)
 _SEMANTIC_REVIEW_PROFILES = {"residential", "commercial", "investment", "mortgage"}
 
+# Pass 2 result cache — identical text re-checked under the same profile,
+# state, niche and rule set (version + verification dates + prompt) gets the
+# stored review instead of a new Claude call. Stored in SQLite so it survives
+# restarts and is shared by every worker. Hits are stamped on the badge.
+SEMANTIC_CACHE_ENABLED  = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_TTL_DAYS = int(os.getenv("SEMANTIC_CACHE_TTL_DAYS", "30"))
+
+
+def _semantic_cache_key(content: str, profile_name: str, state: str, niche: str,
+                        rules_version: str, verified_dates: Dict[str, str]) -> str:
+    """sha256 over whitespace-normalised content plus everything that shapes the review."""
+    import hashlib
+    basis = json.dumps({
+        "content":  " ".join(content.split()),
+        "profile":  profile_name,
+        "state":    (state or "").strip().upper(),
+        "niche":    (niche or "").strip(),
+        "rules":    rules_version,
+        "verified": verified_dates,
+        "prompt":   hashlib.sha256(_SEMANTIC_REVIEW_PROMPT.encode("utf-8")).hexdigest()[:16],
+    }, sort_keys=True)
+    return hashlib.sha256(basis.encode("utf-8")).hexdigest()
+
 
 def _run_semantic_compliance_check(
     content: str,
@@ -2670,16 +2843,36 @@ def _run_semantic_compliance_check(
 
     Cost: one additional Claude API call per generation for applicable profiles.
     This is intentional — phrase matching cannot catch the 'ordinary reader' standard.
+    Repeat checks of identical content under the same rules are served from the
+    semantic review cache; the result then carries cache_hit=True and the
+    original reviewed_at.
     """
     if profile_name not in _SEMANTIC_REVIEW_PROFILES:
         return None
 
+    content = content[:4000]   # Clip to avoid token waste on very long content
+    rules_version, verified_dates = _get_rules_version_and_dates(state)
+
+    cache_key = None
+    if SEMANTIC_CACHE_ENABLED:
+        cache_key = _semantic_cache_key(content, profile_name, state, niche,
+                                        rules_version, verified_dates)
+        try:
+            from database import semantic_cache_get
+            row = semantic_cache_get(cache_key, SEMANTIC_CACHE_TTL_DAYS)
+            if row:
+                result = json.loads(row["result_json"])
+                result["cache_hit"]   = True
+                result["reviewed_at"] = row["created_at"]
+                return result
+        except Exception as e:
+            print(f"[Compliance] Semantic cache read failed: {e}")
+
     try:
         client = _get_anthropic_client()
     except RuntimeError:
         return None  # Never let compliance pass failures block content delivery
 
-    _, verified_dates = _get_rules_version_and_dates(state)
     federal_verified = verified_dates.get("federal", "unknown")
     verification_context = (
         f"Rules verified against primary sources as of: {federal_verified}. "
@@ -2689,7 +2882,7 @@ def _run_semantic_compliance_check(
     )
 
     prompt = _SEMANTIC_REVIEW_PROMPT.format(
-        content=content[:4000],   # Clip to avoid token waste on very long content
+        content=content,
         state=state or "Not specified",
         niche=niche or "Residential real estate",
     )
@@ -2697,11 +2890,12 @@ def _run_semantic_compliance_check(
     prompt = prompt + f"\n\nVERIFICATION CONTEXT:\n{verification_context}"
 
     try:
-        response = client.messages.create(
-            model="claude-sonnet-4-6",
-            max_tokens=800,
-            messages=[{"role": "user", "content": prompt}],
-        )
+        with _llm_inflight:
+            response = client.messages.create(
+                model="claude-sonnet-4-6",
+                max_tokens=800,
+                messages=[{"role": "user", "content": prompt}],
+            )
         raw = "".join(
             b.text for b in (response.content or [])
             if getattr(b, "type", "") == "text"
@@ -2714,6 +2908,14 @@ def _run_semantic_compliance_check(
         result = json.loads(raw.strip())
         # Validate expected shape
         if "flags" in result and "overall" in result:
+            if cache_key:
+                try:
+                    from database import semantic_cache_put
+                    semantic_cache_put(cache_key, rules_version, profile_name, json.dumps(result))
+                except Exception as e:
+                    print(f"[Compliance] Semantic cache write failed: {e}")
+            result["cache_hit"]   = False
+            result["reviewed_at"] = datetime.utcnow().isoformat()
             return result
         return None
     except Exception:
@@ -2848,11 +3050,15 @@ def _build_final_badge(
     semantic_flags: List[Dict[str, Any]] = []
     semantic_assessment: str = ""
     semantic_overall: str = "pass"
+    semantic_cache_hit: bool = False
+    semantic_reviewed_at: str = ""
 
     if semantic_result:
         semantic_flags    = semantic_result.get("flags", [])
         semantic_assessment = semantic_result.get("ordinary_reader_assessment", "")
         semantic_overall  = semantic_result.get("overall", "pass")
+        semantic_cache_hit   = bool(semantic_result.get("cache_hit"))
+        semantic_reviewed_at = semantic_result.get("reviewed_at", "")
 
     # Upgrade fair housing status if semantic found fair housing issues
     fair_housing_final = p1_badge.fairHousing
@@ -2894,6 +3100,11 @@ def _build_final_badge(
         reason = sf.get("reason", "")
         text   = sf.get("triggered_text", "")
         updated_disclosure.append(f"{prefix} | {rule} | {reason} (text: '{text[:80]}')")
+    if semantic_cache_hit:
+        updated_disclosure.append(
+            f"ℹ info | Semantic Review | Reused the review of identical content run "
+            f"{semantic_reviewed_at[:16].replace('T', ' ')} UTC under rules {rules_version}."
+        )
 
     # Updated notes
     updated_notes = list(p1_badge.notes)
@@ -2918,13 +3129,80 @@ def _build_final_badge(
         stateCompliance=p1_badge.stateCompliance,
         mlsCompliance=p1_badge.mlsCompliance,
         disclosureChecks=updated_disclosure,
+        flaggedSpans=p1_badge.flaggedSpans,
         semanticFlags=semantic_flags,
         semanticAssessment=semantic_assessment,
+        semanticCacheHit=semantic_cache_hit,
+        semanticReviewedAt=semantic_reviewed_at,
         rules_version=rules_version,
         rules_verified_dates=verified_dates,
     )
 
 
+# ─────────────────────────────────────────────────────────────────────────────
+# PASS 1 + PASS 2 TOGETHER
+# The compliance profile depends only on niche / content_mode, so Pass 2 (a
+# Claude call) is started on _compliance_executor before Pass 1 runs, and
+# response parsing overlaps it too. Both helpers are synchronous — async
+# callers wrap them in run_blocking().
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _submit_semantic_check(text: str, niche: str, content_mode: str, state: str):
+    profile_name = "b2b_saas" if content_mode == "b2b" else _get_compliance_profile(niche)
+    return _compliance_executor.submit(
+        _run_semantic_compliance_check, text, profile_name=profile_name, state=state, niche=niche,
+    )
+
+
+def _semantic_result(future) -> Optional[Dict[str, Any]]:
+    try:
+        return future.result()
+    except Exception as e:
+        print(f"[Compliance] Pass 2 failed: {e}")
+        return None  # Semantic pass failure is silent — Pass 1 still stands
+
+
+def _run_compliance_passes(
+    text: str, agent_name: str, brokerage: str, mls_names: List[str] = None,
+    niche: str = "", content_mode: str = "agent", state: str = "",
+) -> ComplianceBadge:
+    """Pass 1 and Pass 2 concurrently, merged into the final badge."""
+    p2 = _submit_semantic_check(text, niche, content_mode, state)
+    p1_badge, profile_name = _run_compliance_check(
+        text, agent_name, brokerage, mls_names or [],
+        niche=niche, content_mode=content_mode, state=state,
+    )
+    return _build_final_badge(
+        p1_badge, profile_name, _semantic_result(p2), state=state,
+        agent_name=agent_name, brokerage=brokerage,
+    )
+
+
+def _check_and_parse(
+    raw_text: str, agent_name: str, brokerage: str, mls_names: List[str] = None,
+    niche: str = "", content_mode: str = "agent", state: str = "",
+):
+    """
+    Generation tail: Pass 2 in flight while Pass 1 and _parse_claude_output run.
+    Returns (ContentResponse, ComplianceBadge). Parse errors propagate.
+    """
+    p2 = _submit_semantic_check(raw_text, niche, content_mode, state)
+    p1_badge, profile_name = _run_compliance_check(
+        raw_text, agent_name, brokerage, mls_names or [],
+        niche=niche, content_mode=content_mode, state=state,
+    )
+    try:
+        result = _parse_claude_output(raw_text, p1_badge)
+    finally:
+        semantic = _semantic_result(p2)
+    compliance = _build_final_badge(
+        p1_badge, profile_name, semantic, state=state,
+        agent_name=agent_name, brokerage=brokerage,
+    )
+    result.compliance = compliance
+    return result, compliance
+
+
 def _parse_claude_output(raw_text, compliance):
     import re
 
@@ -3128,7 +3406,8 @@ def generate_from_member_answer(answer_record, profile=None, user_id=None, conte
     )
 
     client   = _get_anthropic_client()
-    response = client.messages.create(
+    response = _llm_create(
+        client,
         model="claude-sonnet-4-6",
         max_tokens=1500,
         messages=[{"role": "user", "content": prompt}],
@@ -3139,18 +3418,11 @@ def generate_from_member_answer(answer_record, profile=None, user_id=None, conte
         raise ValueError("Claude returned empty content.")
 
     # Full compliance pass on everything — spec §6 point 6.
-    p1_badge, profile_name = _run_compliance_check(
+    content_response, _ = _check_and_parse(
         raw_text, agent_name, brokerage, mls_names,
         niche=niche, content_mode="agent", state=state,
     )
-    semantic = _run_semantic_compliance_check(
-        raw_text, profile_name=profile_name, state=state, niche=niche,
-    )
-    compliance = _build_final_badge(
-        p1_badge, profile_name, semantic, state=state,
-        agent_name=agent_name, brokerage=brokerage,
-    )
-    return _parse_claude_output(raw_text, compliance)
+    return content_response
 
 
 NICHE_SITUATIONS = {
@@ -3684,24 +3956,18 @@ def _demo_generated_response(payload):
 # Serves the frontend demo intercept, which rewrites /content/generate-content ->
 # /content/demo-generate with no auth header (app.js:1448-1449). Returns the same
 # canned ContentResponse the real route's is_demo branch already returns — no JWT
-# decode, no database read/write, no LLM call. In-memory per-IP rate limit mirrors
-# the public compliance checker pattern (_comp_check_rate_limit in app.py).
-_demo_gen_rate: dict = {}          # { ip: [unix_timestamp, ...] }
+# decode, no LLM call. Per-IP token bucket (rate_limit.py): demo users click
+# through several generations in a row, so allow a burst of _DEMO_GEN_MAX and
+# refill at _DEMO_GEN_MAX per _DEMO_GEN_WINDOW.
 _DEMO_GEN_MAX    = 30
-_DEMO_GEN_WINDOW = 600             # 10-minute rolling window
+_DEMO_GEN_WINDOW = 600             # 10 minutes
+_demo_gen_limiter = TokenBucketLimiter("demo_generate", rate=_DEMO_GEN_MAX / _DEMO_GEN_WINDOW,
+                                       burst=_DEMO_GEN_MAX)
 
 
 def _demo_gen_rate_limit(ip: str) -> bool:
-    """Returns True (allowed) or False (rate limited). Per-IP rolling window."""
-    import time as _t
-    now          = _t.time()
-    window_start = now - _DEMO_GEN_WINDOW
-    hits = [t for t in _demo_gen_rate.get(ip, []) if t > window_start]
-    if len(hits) >= _DEMO_GEN_MAX:
-        return False
-    hits.append(now)
-    _demo_gen_rate[ip] = hits
-    return True
+    """Returns True (allowed) or False (rate limited)."""
+    return _demo_gen_limiter.allow(ip)
 
 
 @router.post("/demo-generate", response_model=ContentResponse)
@@ -3734,10 +4000,8 @@ async def generate_content(payload: ContentRequest, request: Request) -> Content
         auth_header = request.headers.get("Authorization", "")
         token = auth_header.replace("Bearer ", "").strip() if auth_header else ""
         if token and token != "demo-token":
-            import sqlite3 as _sq
-            db_path = _os.getenv("DB_PATH", "/data/homebridge.db")
-            _conn = _sq.connect(db_path)
-            _conn.row_factory = _sq.Row
+            from database import get_conn as _get_conn
+            _conn = _get_conn()
             _c = _conn.cursor()
             try:
                 import jwt as _jwt
@@ -3812,15 +4076,20 @@ async def generate_content(payload: ContentRequest, request: Request) -> Content
 
     content_mode    = (payload.content_mode    or "agent").lower()
     generation_mode = (payload.generation_mode or "").lower()
-    if content_mode == "b2b":
-        prompt = _build_b2b_content_prompt(payload, user_id=_uid)
-    elif generation_mode == "freeform":
-        prompt = _build_freeform_content_prompt(payload, user_id=_uid)
-    else:
-        prompt = _build_content_prompt(payload, user_id=_uid)
+
+    def _build_prompt():
+        if content_mode == "b2b":
+            return _build_b2b_content_prompt(payload, user_id=_uid)
+        if generation_mode == "freeform":
+            return _build_freeform_content_prompt(payload, user_id=_uid)
+        return _build_content_prompt(payload, user_id=_uid)
+
+    # Prompt building reads voice exemplars from the DB — keep it off the loop too
+    prompt = await run_blocking(_build_prompt)
 
     try:
-        response = client.messages.create(
+        response = await run_blocking(
+            _llm_create, client,
             model="claude-sonnet-4-6",
             max_tokens=1800,
             messages=[{"role": "user", "content": prompt}],
@@ -3844,23 +4113,12 @@ async def generate_content(payload: ContentRequest, request: Request) -> Content
     state      = profile.state      or ""
     niche_for_check = ", ".join(payload.identity.primaryCategories) if payload.identity.primaryCategories else ""
 
-    # ── Pass 1: rule-based ────────────────────────────────────────────────────
-    p1_badge, profile_name = _run_compliance_check(
-        raw_text, agent_name, brokerage, mls_names,
-        niche=niche_for_check, content_mode=content_mode,
-        state=state,
-    )
-    # ── Pass 2: semantic ──────────────────────────────────────────────────────
-    semantic = _run_semantic_compliance_check(
-        raw_text, profile_name=profile_name, state=state, niche=niche_for_check
-    )
-    # ── Merge ──────────────────────────────────────────────────────────────────
-    compliance = _build_final_badge(
-        p1_badge, profile_name, semantic, state=state,
-        agent_name=agent_name, brokerage=brokerage,
-    )
+    # ── Pass 1 + Pass 2 (concurrent) + parse ─────────────────────────────────
     try:
-        result = _parse_claude_output(raw_text, compliance)
+        result, _ = await run_blocking(
+            _check_and_parse, raw_text, agent_name, brokerage, mls_names,
+            niche=niche_for_check, content_mode=content_mode, state=state,
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error structuring content response: {str(e)}")
 
@@ -3918,7 +4176,8 @@ def generate_content_core(
     client = _get_anthropic_client()
     mode   = (content_mode or "agent").lower()
     prompt = _build_b2b_content_prompt(payload, user_id=user_id) if mode == "b2b" else _build_content_prompt(payload, user_id=user_id)
-    response = client.messages.create(
+    response = _llm_create(
+        client,
         model="claude-sonnet-4-6", max_tokens=1800,
         messages=[{"role": "user", "content": prompt}],
     )
@@ -3927,21 +4186,11 @@ def generate_content_core(
     if not raw_text:
         raise ValueError("Claude returned empty content")
 
-    # Pass 1
-    p1_badge, profile_name = _run_compliance_check(
+    # Pass 1 + Pass 2 (concurrent) + parse
+    content_response, compliance = _check_and_parse(
         raw_text, agent_name, brokerage, mls_names or [],
         niche=niche, content_mode=mode, state=state,
     )
-    # Pass 2
-    semantic = _run_semantic_compliance_check(
-        raw_text, profile_name=profile_name, state=state, niche=niche
-    )
-    # Merge
-    compliance = _build_final_badge(
-        p1_badge, profile_name, semantic, state=state,
-        agent_name=agent_name, brokerage=brokerage,
-    )
-    content_response = _parse_claude_output(raw_text, compliance)
     return {"content": content_response.dict(), "compliance": compliance.dict()}
 
 
@@ -4089,7 +4338,8 @@ HARD RULES:
 - Return ONLY the JSON object"""
 
     try:
-        response = client.messages.create(
+        response = await run_blocking(
+            _llm_create, client,
             model    = "claude-sonnet-4-6",
             max_tokens = 4000,
             tools    = [{"type": "web_search_20250305", "name": "web_search"}],
@@ -4114,44 +4364,16 @@ HARD RULES:
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error parsing Claude response: {str(e)}")
 
-    # Run compliance checks — Pass 1 (phrase matching) and Pass 2 (Claude semantic)
-    # run concurrently in a thread pool since both are sync functions and
-    # Pass 2 is a full Claude API call that previously added ~10s sequentially.
-    import asyncio as _asyncio
-    from concurrent.futures import ThreadPoolExecutor as _TPE
-
+    # Pass 1 + Pass 2 (concurrent) + parse, off the event loop
     mls_names = profile.mlsNames or []
     state     = profile.state or ""
 
-    loop = _asyncio.get_event_loop()
-    with _TPE(max_workers=2) as pool:
-        p1_future = loop.run_in_executor(
-            pool,
-            lambda: _run_compliance_check(
-                raw_text, agent_name, brokerage, mls_names,
-                niche=niche, content_mode="agent", state=state,
-            )
-        )
-        # Pass 2 needs profile_name from Pass 1 — but profile_name is derived
-        # purely from agent_name/brokerage, not from Pass 1 results.
-        # Compute it cheaply here so Pass 2 can run in parallel.
-        _profile_name_early = f"{agent_name} | {brokerage}" if brokerage else agent_name
-        p2_future = loop.run_in_executor(
-            pool,
-            lambda: _run_semantic_compliance_check(
-                raw_text, profile_name=_profile_name_early, state=state, niche=niche
-            )
-        )
-        (p1_badge, profile_name), semantic = await _asyncio.gather(p1_future, p2_future)
-
-    # Merge
-    compliance = _build_final_badge(
-        p1_badge, profile_name, semantic, state=state,
-        agent_name=agent_name, brokerage=brokerage,
-    )
-
     try:
-        return _parse_claude_output(raw_text, compliance)
+        result, _ = await run_blocking(
+            _check_and_parse, raw_text, agent_name, brokerage, mls_names,
+            niche=niche, content_mode="agent", state=state,
+        )
+        return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error structuring response: {str(e)}")
 
@@ -4236,7 +4458,8 @@ IMPORTANT:
 - Return ONLY the JSON object"""
 
     try:
-        response = client.messages.create(
+        response = await run_blocking(
+            _llm_create, client,
             model      = "claude-sonnet-4-6",
             max_tokens = 1500,
             messages   = [{
@@ -4469,7 +4692,8 @@ async def generate_video_script(payload: VideoScriptRequest):
     )
 
     try:
-        response = client.messages.create(
+        response = await run_blocking(
+            _llm_create, client,
             model="claude-sonnet-4-6",
             max_tokens=1200,
             messages=[{"role": "user", "content": prompt}],
@@ -4483,18 +4707,11 @@ async def generate_video_script(payload: VideoScriptRequest):
 
     # Run compliance on the script — same two-pass system as posts
     try:
-        p1_badge, profile_name = _run_compliance_check(
-            script_text, agent_name, brokerage,
+        compliance = await run_blocking(
+            _run_compliance_passes, script_text, agent_name, brokerage,
             profile.mlsNames or [], niche=niche,
             content_mode="agent", state=state,
         )
-        semantic = _run_semantic_compliance_check(
-            script_text, profile_name=profile_name, state=state, niche=niche
-        )
-        compliance = _build_final_badge(
-            p1_badge, profile_name, semantic, state=state,
-            agent_name=agent_name, brokerage=brokerage,
-        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Compliance check failed: {str(e)}")
 
@@ -4565,7 +4782,8 @@ Exactly this structure:
 Each topic should be one sentence, 15-25 words. Specific. Actionable. Grounded in {niche} in {market_display}."""
 
     try:
-        response = client.messages.create(
+        response = await run_blocking(
+            _llm_create, client,
             model="claude-sonnet-4-6",
             max_tokens=400,
             messages=[{"role": "user", "content": prompt}],
@@ -4781,6 +4999,15 @@ async def verify_state(payload: VerifyStateRequest, request: Request):
 
     _write_meta(meta)
 
+    # Cached Pass 2 reviews are keyed on version + verification dates, so they
+    # already miss; a version bump also frees the space they occupy.
+    if version_bumped:
+        try:
+            from database import semantic_cache_purge
+            semantic_cache_purge(keep_rules_version=new_version)
+        except Exception as e:
+            print(f"[Compliance] Semantic cache purge failed: {e}")
+
     state_label = STATE_RULES.get(state_key, {}).get("label", f"{state_key} Real Estate Commission")
 
     return {
@@ -5336,7 +5563,8 @@ async def generate_hb_marketing_content(payload: HBMarketingRequest, request: Re
     )
 
     try:
-        response = client.messages.create(
+        response = await run_blocking(
+            _llm_create, client,
             model      = "claude-sonnet-4-6",
             max_tokens = 2000,
             messages   = [{"role": "user", "content": prompt}],
@@ -5368,7 +5596,8 @@ async def generate_hb_marketing_content(payload: HBMarketingRequest, request: Re
     # as a licensed agent / company. Use b2b profile (no residential FHA triggers).
     content_text = parsed.get("post", raw_text)
     try:
-        p1_badge, profile_name = _run_compliance_check(
+        compliance = await run_blocking(
+            _run_compliance_passes,
             content_text,
             agent_name   = "HomeBridge Group",
             brokerage    = "HomeBridge Group",
@@ -5377,18 +5606,6 @@ async def generate_hb_marketing_content(payload: HBMarketingRequest, request: Re
             content_mode = "b2b",
             state        = payload.target_state or "",
         )
-        semantic = _run_semantic_compliance_check(
-            content_text,
-            profile_name = profile_name,
-            state        = payload.target_state or "",
-            niche        = payload.category,
-        )
-        compliance = _build_final_badge(
-            p1_badge, profile_name, semantic,
-            state      = payload.target_state or "",
-            agent_name = "HomeBridge Group",
-            brokerage  = "HomeBridge Group",
-        )
         compliance_dict = compliance.dict()
     except Exception:
         compliance_dict = {
@@ -5529,7 +5746,8 @@ def run_public_compliance_check(post_text: str) -> dict:
     )
 
     try:
-        response = client.messages.create(
+        response = _llm_create(
+            client,
             model      = "claude-sonnet-4-6",
             max_tokens = 1200,
             messages   = [{"role": "user", "content": prompt}],
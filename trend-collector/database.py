@@ -1,7 +1,10 @@
 import sqlite3
 import json
 import os
-from datetime import datetime
+import threading
+import re
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from typing import Dict, Any, Optional
 
 # ─────────────────────────────────────────────
@@ -10,10 +13,158 @@ from typing import Dict, Any, Optional
 DB_NAME = os.getenv("DB_PATH", "/data/homebridge.db")
 
 
+# ─────────────────────────────────────────────
+# CONNECTION POOL
+# Every helper follows the same shape: conn = get_conn() ... conn.close().
+# get_conn() hands out a pooled connection whose close() returns it to the
+# idle pool instead of tearing it down, so existing call sites keep working
+# unchanged while a request reuses a handful of warm connections instead of
+# opening 3-6 new ones. PRAGMAs are applied once, when a connection is first
+# created. Connections are created with check_same_thread=False so the pool
+# can be shared by uvicorn's threadpool and the background workers; a single
+# connection is only ever checked out to one caller at a time.
+#
+# WAL lets readers proceed while a writer commits (no more "database is
+# locked" from rollback-journal mode); busy_timeout makes a second writer wait
+# instead of failing immediately.
+# ─────────────────────────────────────────────
+DB_POOL_SIZE        = int(os.getenv("DB_POOL_SIZE", "16"))        # max idle connections kept warm
+DB_BUSY_TIMEOUT_MS  = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_CACHE_SIZE_KB    = int(os.getenv("DB_CACHE_SIZE_KB", "16384"))  # page cache per connection
+DB_MMAP_SIZE        = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+_CONN_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}",
+    f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}",
+    f"PRAGMA mmap_size={DB_MMAP_SIZE}",
+    "PRAGMA temp_store=MEMORY",
+)
+
+
+class _PooledConnection(sqlite3.Connection):
+    """sqlite3.Connection whose close() hands the connection back to the pool."""
+
+    _checked_out = False
+
+    def close(self):
+        if not self._checked_out:
+            return  # already returned — a second close() must not double-pool it
+        self._checked_out = False
+        _pool.release(self)
+
+    def _close_for_real(self):
+        sqlite3.Connection.close(self)
+
+
+class _ConnectionPool:
+    """LIFO pool of pre-configured connections. Never blocks: when no idle
+    connection is available a new one is opened, and connections returned
+    beyond max_idle are closed for real."""
+
+    def __init__(self, max_idle: int):
+        self.max_idle = max_idle
+        self._idle    = []
+        self._lock    = threading.Lock()
+        self._path    = None
+        self.created  = 0
+
+    def _open(self) -> _PooledConnection:
+        conn = sqlite3.connect(
+            DB_NAME,
+            timeout=DB_BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            factory=_PooledConnection,
+        )
+        for pragma in _CONN_PRAGMAS:
+            try:
+                conn.execute(pragma)
+            except sqlite3.DatabaseError as e:
+                print(f"[DB] {pragma} failed: {e}")
+        self.created += 1
+        return conn
+
+    def acquire(self) -> _PooledConnection:
+        conn = None
+        with self._lock:
+            # DB_PATH can be repointed (tests, one-off scripts) — drop stale
+            # connections that belong to a different file.
+            if self._path != DB_NAME:
+                stale, self._idle, self._path = self._idle, [], DB_NAME
+            else:
+                stale = []
+            if self._idle:
+                conn = self._idle.pop()
+        for s in stale:
+            s._close_for_real()
+        if conn is None:
+            conn = self._open()
+        conn.row_factory = sqlite3.Row
+        conn._checked_out = True
+        return conn
+
+    def release(self, conn: _PooledConnection) -> None:
+        try:
+            if conn.in_transaction:
+                conn.rollback()  # same outcome as closing without commit
+        except sqlite3.Error:
+            conn._close_for_real()
+            return
+        with self._lock:
+            if len(self._idle) < self.max_idle and self._path == DB_NAME:
+                self._idle.append(conn)
+                return
+        conn._close_for_real()
+
+    def close_all(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn._close_for_real()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"idle": len(self._idle), "max_idle": self.max_idle, "created": self.created}
+
+
+_pool = _ConnectionPool(DB_POOL_SIZE)
+
+
 def get_conn():
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Check out a pooled connection (row_factory = sqlite3.Row). Call close()
+    when done — it returns the connection to the pool; uncommitted work is
+    rolled back exactly as a real close would."""
+    return _pool.acquire()
+
+
+@contextmanager
+def db_conn():
+    """
+    Context-manager form of get_conn():
+
+        with db_conn() as conn:
+            conn.execute(...)
+
+    Commits on normal exit, rolls back on exception, and always returns the
+    connection to the pool.
+    """
+    conn = get_conn()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def checkpoint_wal() -> None:
+    """Fold the WAL back into the main database file. Called before the R2
+    backup copies homebridge.db so the uploaded file is self-contained."""
+    with db_conn() as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
 
 
 # ─────────────────────────────────────────────
@@ -61,7 +212,7 @@ def _compliance_verdict(comp_raw) -> str:
         return "pending"
 
 
-def _calc_lightweight_identity(c, uid: int, compliance_rate, published_count: int) -> int:
+def _calc_lightweight_identity(setup_json, compliance_rate, published_count: int) -> int:
     """
     Compute a lightweight identity score (0-100) for broker/team dashboards.
     Uses agent_setup JSON + published count + compliance rate.
@@ -71,10 +222,8 @@ def _calc_lightweight_identity(c, uid: int, compliance_rate, published_count: in
     """
     score = 0
     try:
-        c.execute("SELECT setup_json FROM agent_setup WHERE user_id=?", (uid,))
-        sr = c.fetchone()
-        if sr:
-            setup = json.loads(sr["setup_json"] or "{}")
+        if setup_json:
+            setup = json.loads(setup_json or "{}")
             if setup.get("shortBio", "").strip():   score += 15
             if setup.get("market", "").strip():      score += 10
             niches = setup.get("primaryNiches", [])
@@ -90,11 +239,11 @@ def _calc_lightweight_identity(c, uid: int, compliance_rate, published_count: in
 
 
 # ─────────────────────────────────────────────
-# INIT — creates all tables on startup
+# MIGRATION STEPS — registered in MIGRATIONS below
 # ─────────────────────────────────────────────
-def init_db():
-    conn = get_conn()
-    c = conn.cursor()
+def _m001_baseline_schema(c):
+    """Every table and column that existed before versioned migrations. On an
+    existing deployment this only inspects table_info and adds nothing."""
 
     # Users
     c.execute("""
@@ -112,7 +261,7 @@ def init_db():
         )
     """)
     # Non-destructive migrations for existing deployments
-    for col, defn in [
+    _add_columns(c, "users", [
         ("role",                   "TEXT DEFAULT 'agent'"),
         ("broker_id",              "INTEGER DEFAULT NULL"),
         ("phone",                  "TEXT DEFAULT ''"),
@@ -239,11 +388,7 @@ def init_db():
         #   NULL for the permanent demo persona (Brooke never expires).
         ("is_demo",                  "INTEGER DEFAULT 0"),
         ("ghost_expires_at",         "TEXT DEFAULT NULL"),
-    ]:
-        try:
-            c.execute(f"ALTER TABLE users ADD COLUMN {col} {defn}")
-        except Exception:
-            pass  # Column already exists
+    ])
 
     # Trends
     c.execute("""
@@ -293,26 +438,17 @@ def init_db():
         )
     """)
     # Non-destructive: add day_of_week to existing schedules table
-    try:
-        c.execute("ALTER TABLE schedules ADD COLUMN day_of_week TEXT DEFAULT NULL")
-    except Exception:
-        pass
+    _add_columns(c, "schedules", [("day_of_week", "TEXT DEFAULT NULL")])
     # Non-destructive: add context to existing schedules table (Session 62)
     # Values: 'agent' | 'hb_marketing'
     # Defaults to 'agent' so all existing agent schedules are correctly typed.
     # Separates HB Marketing schedules from agent schedules for the same user_id.
-    try:
-        c.execute("ALTER TABLE schedules ADD COLUMN context TEXT NOT NULL DEFAULT 'agent'")
-    except Exception:
-        pass
+    _add_columns(c, "schedules", [("context", "TEXT NOT NULL DEFAULT 'agent'")])
 
     # Non-destructive: add drip_time to existing schedules table (The Scheduler, Stage A).
     # Drip distribution time-of-day, independent of generation time_of_day. When NULL,
     # the drip path falls back to time_of_day. Generation logic is unaffected.
-    try:
-        c.execute("ALTER TABLE schedules ADD COLUMN drip_time TEXT DEFAULT NULL")
-    except Exception:
-        pass
+    _add_columns(c, "schedules", [("drip_time", "TEXT DEFAULT NULL")])
 
     # Distribution queue - approved content scheduled to drip to a platform on a
     # member-chosen day/time (The Scheduler, Stage A). One row per (item, platform),
@@ -409,28 +545,16 @@ def init_db():
         )
     """)
     # Non-destructive: Signal Exclusivity — track when a signal was consumed (Session 12)
-    try:
-        c.execute("ALTER TABLE local_signals ADD COLUMN used_at TEXT DEFAULT NULL")
-    except Exception:
-        pass  # Column already exists
+    _add_columns(c, "local_signals", [("used_at", "TEXT DEFAULT NULL")])
     # Non-destructive: Signal recency — stores the article/story publish date (Session 20)
     # Used to reject stale signals (>90 days) at collection time and display date on signal card
-    try:
-        c.execute("ALTER TABLE local_signals ADD COLUMN published_date TEXT DEFAULT NULL")
-    except Exception:
-        pass  # Column already exists
+    _add_columns(c, "local_signals", [("published_date", "TEXT DEFAULT NULL")])
     # Non-destructive: Signal source type — distinguishes RSS-sourced signals from Claude web search (Session 32)
     # Values: 'rss' | 'claude'  — defaults to 'claude' so all existing rows are correctly typed
-    try:
-        c.execute("ALTER TABLE local_signals ADD COLUMN source_type TEXT DEFAULT 'claude'")
-    except Exception:
-        pass  # Column already exists
+    _add_columns(c, "local_signals", [("source_type", "TEXT DEFAULT 'claude'")])
     # Non-destructive: Signal audience context — separates agent-facing (consumer) from hb_marketing signals (Session 58)
     # Values: 'agent' | 'hb_marketing'  — defaults to 'agent' so all existing rows are correctly typed
-    try:
-        c.execute("ALTER TABLE local_signals ADD COLUMN context TEXT DEFAULT 'agent'")
-    except Exception:
-        pass  # Column already exists
+    _add_columns(c, "local_signals", [("context", "TEXT DEFAULT 'agent'")])
 
     # Agent setup — stores identity/profile data server-side
     c.execute("""
@@ -514,10 +638,7 @@ def init_db():
         )
     """)
     # Non-destructive: add page_token to platform_connections (Plan B Facebook page picker)
-    try:
-        c.execute("ALTER TABLE platform_connections ADD COLUMN page_token TEXT DEFAULT ''")
-    except Exception:
-        pass  # Column already exists
+    _add_columns(c, "platform_connections", [("page_token", "TEXT DEFAULT ''")])
 
     # admin_settings — key/value store for manually-entered dashboard metrics
     # (pages indexed, monthly revenue) that have no automated source yet. A6.
@@ -737,7 +858,7 @@ def init_db():
     #   status. Earns 25% on direct referrals (no tier threshold) AND 5% override
     #   on referrals generated by partners they personally recruited. Never
     #   self-assigned — only set via admin panel. See partner_set_insider().
-    for col, defn in [
+    _add_columns(c, "partners", [
         ("stripe_connect_id",     "TEXT DEFAULT NULL"),
         ("active_referral_count", "INTEGER DEFAULT 0"),
         ("tier_evaluated_at",     "TEXT DEFAULT NULL"),
@@ -747,11 +868,7 @@ def init_db():
         ("suspended_by",          "INTEGER DEFAULT NULL"),
         ("suspension_reason",     "TEXT DEFAULT NULL"),
         ("is_insider_partner",    "INTEGER DEFAULT 0"),
-    ]:
-        try:
-            c.execute(f"ALTER TABLE partners ADD COLUMN {col} {defn}")
-        except Exception:
-            pass  # Column already exists
+    ])
 
     # Non-destructive referral_attributions migrations — Session 24
     # first_payment_at: when the referred user's first Stripe payment cleared
@@ -763,15 +880,11 @@ def init_db():
     #   When set, the payout calculator generates a second payout line: 5% of
     #   this subscriber's MRR goes to the Insider Partner at quarter-end.
     #   One subscriber can generate at most two payout lines. Total never > 30%.
-    for col, defn in [
+    _add_columns(c, "referral_attributions", [
         ("first_payment_at",   "TEXT DEFAULT NULL"),
         ("is_active",          "INTEGER DEFAULT 0"),
         ("override_partner_id","INTEGER DEFAULT NULL"),
-    ]:
-        try:
-            c.execute(f"ALTER TABLE referral_attributions ADD COLUMN {col} {defn}")
-        except Exception:
-            pass  # Column already exists
+    ])
 
     # COMPLIANCE RECORDS — Session 34
     # Permanent audit trail written at the moment a post is approved and a
@@ -807,26 +920,14 @@ def init_db():
     except Exception:
         pass
     # Non-destructive migration — add context column if not present
-    try:
-        c.execute("ALTER TABLE compliance_records ADD COLUMN context TEXT DEFAULT 'agent'")
-        print("[DB] compliance_records: context column added")
-    except Exception:
-        pass  # column already exists
+    _add_columns(c, "compliance_records", [("context", "TEXT DEFAULT 'agent'")])
     # Human-origin provenance flag — DQ-1 (FOUNDATION_DAILY_QUESTION_SPEC_v2 §7/§8)
     # origin_type: 'engine_draft' (default for existing flows) | 'member_answer_voice'
     #   | 'member_answer_text' | 'studio_authored'. Set ONLY by the answer pipeline —
     #   no backfill, no manual setting. The flag's value is that it cannot be faked.
     # answer_ref: nullable FK to member_answers — links a record to its source answer.
-    try:
-        c.execute("ALTER TABLE compliance_records ADD COLUMN origin_type TEXT DEFAULT 'engine_draft'")
-        print("[DB] compliance_records: origin_type column added")
-    except Exception:
-        pass  # column already exists
-    try:
-        c.execute("ALTER TABLE compliance_records ADD COLUMN answer_ref INTEGER DEFAULT NULL")
-        print("[DB] compliance_records: answer_ref column added")
-    except Exception:
-        pass  # column already exists
+    _add_columns(c, "compliance_records", [("origin_type", "TEXT DEFAULT 'engine_draft'")])
+    _add_columns(c, "compliance_records", [("answer_ref", "INTEGER DEFAULT NULL")])
 
     # VIDEO JOBS — Session 49
     # Tracks every avatar video render request submitted to the video API.
@@ -966,46 +1067,13 @@ def init_db():
     except Exception:
         pass
 
-    conn.commit()
-    conn.close()
-
 
-# ─────────────────────────────────────────────
-# MIGRATIONS
-# ─────────────────────────────────────────────
-def migrate_add_niche_column():
-    """Legacy migration — safe to call even if column exists."""
-    conn = get_conn()
-    c = conn.cursor()
-    c.execute("PRAGMA table_info(trends)")
-    columns = [col[1] for col in c.fetchall()]
-    if "niche" not in columns:
-        c.execute("ALTER TABLE trends ADD COLUMN niche TEXT")
-    conn.commit()
-    conn.close()
-
-
-def migrate_context_column():
-    """
-    Adds context column to content_library.
-    context = 'agent' (personal real estate content)
-              'hb_marketing' (HomeBridge platform content)
-    Default is 'agent' for all existing records.
+def _m002_content_library_columns(c):
     """
-    conn = get_conn()
-    c    = conn.cursor()
-    try:
-        c.execute("ALTER TABLE content_library ADD COLUMN context TEXT DEFAULT 'agent'")
-        conn.commit()
-        print("[DB] context column added to content_library")
-    except Exception:
-        pass  # Already exists
-    conn.close()
-
-
-def migrate_content_library_columns():
-    """
-    Adds missing columns to content_library:
+    Columns added to trends/content_library after the original CREATE TABLE:
+    - trends.niche (legacy)
+    - context: 'agent' (personal real estate content) | 'hb_marketing'
+      (HomeBridge platform content). Default 'agent' for all existing records.
     - cir_id: CIR verification record ID
     - image_url: generated image URL
     - compliance_checked_at: timestamp of last compliance re-check
@@ -1013,11 +1081,10 @@ def migrate_content_library_columns():
     - draft_content: the originally-generated content, stored at generation time
       so the agent's edit is implicitly (draft_content vs content). Phase 5 / G2
       prerequisite (VOICE_AUTHENTICITY_BUILD_SPEC §6.4, COMPLETE_PLATFORM_BUILD_SPEC G2).
-    Safe to run multiple times — skips columns that already exist.
     """
-    conn = get_conn()
-    c    = conn.cursor()
-    columns = [
+    _add_columns(c, "trends", [("niche", "TEXT")])
+    _add_columns(c, "content_library", [
+        ("context",               "TEXT DEFAULT 'agent'"),
         ("cir_id",                "TEXT"),
         ("image_url",             "TEXT"),
         ("compliance_checked_at", "TEXT"),
@@ -1033,18 +1100,16 @@ def migrate_content_library_columns():
         ("origin_type",           "TEXT DEFAULT 'engine_draft'"),
         ("answer_ref",            "INTEGER DEFAULT NULL"),
         ("length",                "TEXT DEFAULT 'medium'"),
-    ]
-    for col, coltype in columns:
-        try:
-            c.execute(f"ALTER TABLE content_library ADD COLUMN {col} {coltype}")
-            conn.commit()
-            print(f"[DB] Added column {col} to content_library")
-        except Exception:
-            pass  # Already exists
-    conn.close()
+    ])
 
 
 def seed_question_bank():
+    """Standalone entry point for _seed_question_bank (migration 4)."""
+    with db_conn() as conn:
+        return _seed_question_bank(conn.cursor())
+
+
+def _seed_question_bank(c):
     """
     Seeds question_bank with the Foundation 10 and 60 evergreen questions
     (FOUNDATION_DAILY_QUESTION_SPEC_v2 §3, §4, §8).
@@ -1155,8 +1220,6 @@ def seed_question_bank():
     ]:
         evergreen.append((t, "story"))
 
-    conn = get_conn()
-    c    = conn.cursor()
     inserted = 0
     for text_template, category, source in (
         [(t, cat, "foundation") for (t, cat) in foundation]
@@ -1171,8 +1234,6 @@ def seed_question_bank():
             (text_template, category, source),
         )
         inserted += 1
-    conn.commit()
-    conn.close()
     if inserted:
         print(f"[DB] question_bank seeded: {inserted} new questions "
               f"({len(foundation)} foundation + {len(evergreen)} evergreen defined)")
@@ -1197,60 +1258,394 @@ def tag_existing_as_marketing(user_id: int):
     return affected
 
 
-def migrate_roles_to_new_system():
+def _m006_compliance_checker_leads(c):
+    """Lead table for the public /public/compliance-check tool. Previously
+    created (and ALTERed) inside the request handler on every call."""
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS compliance_checker_leads (
+            id           INTEGER PRIMARY KEY AUTOINCREMENT,
+            email        TEXT NOT NULL UNIQUE,
+            post_text    TEXT NOT NULL,
+            results_json TEXT,
+            ip_address   TEXT,
+            created_at   TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    _add_columns(c, "compliance_checker_leads", [
+        ("name",       "TEXT"),
+        ("state",      "TEXT"),
+        ("base_email", "TEXT"),
+    ])
+
+
+def _m007_hot_path_indexes(c):
+    """
+    Indexes designed from the hot read paths (see tests/test_query_plans.py):
+      content_library(user_id, status, approved_at) — public authority page,
+        feed, sitemap, post pages, voice exemplars, broker/identity stats
+      content_library(user_id, saved_at)            — library_get_all, get_agent_guidance
+      content_library(cir_id)                       — /verify fallback lookup
+      local_signals(user_id, source_url)            — signals_dedupe_check (URL)
+      local_signals(user_id, substr(headline,1,80)) — signals_dedupe_check (headline)
+      local_signals(user_id, collected_at)          — signals_get_latest, collector
+        freshness check, rss-status
+      schedules(next_run) active                    — schedules_get_due
+      distribution_queue(scheduled_for) queued      — distribution_get_due
+      users(agent_slug)                             — every public subdomain hit
+      compliance_records(cir_id)                    — /verify, backfill NOT IN
+    Partial indexes keep the worker-poll indexes tiny: only rows that can
+    actually be due are indexed.
+    """
+    for sql in (
+        "CREATE INDEX IF NOT EXISTS idx_content_library_user_status_approved "
+        "ON content_library(user_id, status, approved_at DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_content_library_user_saved "
+        "ON content_library(user_id, saved_at DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_content_library_cir "
+        "ON content_library(cir_id) WHERE cir_id IS NOT NULL",
+        "CREATE INDEX IF NOT EXISTS idx_local_signals_user_url "
+        "ON local_signals(user_id, source_url)",
+        "CREATE INDEX IF NOT EXISTS idx_local_signals_user_headline "
+        "ON local_signals(user_id, substr(headline, 1, 80))",
+        "CREATE INDEX IF NOT EXISTS idx_local_signals_user_collected "
+        "ON local_signals(user_id, collected_at DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_schedules_due "
+        "ON schedules(next_run) WHERE active = 1",
+        "CREATE INDEX IF NOT EXISTS idx_distribution_queue_due "
+        "ON distribution_queue(scheduled_for) WHERE status = 'queued'",
+        "CREATE INDEX IF NOT EXISTS idx_users_agent_slug "
+        "ON users(agent_slug) WHERE agent_slug IS NOT NULL",
+        "CREATE INDEX IF NOT EXISTS idx_compliance_records_cir "
+        "ON compliance_records(cir_id)",
+    ):
+        c.execute(sql)
+    c.execute("ANALYZE")
+
+
+def _m008_rss_feed_cache(c):
     """
-    One-time migration: converts legacy staff_licensed and staff_marketing
-    roles to the unified 'admin' role introduced in the new role architecture.
-    staff_licensed  → admin (is_licensed=1, staff_type=NULL)
-    staff_marketing → admin (is_licensed=0, staff_type=NULL)
-    Safe to call on every startup — only updates rows that still have old roles.
+    On-disk layer of the signal collector's Tier 0 feed cache. One row per
+    feed URL holding the last good rss2json payload, so a restart mid-cycle
+    does not re-download every feed.
     """
-    conn = get_conn()
-    c    = conn.cursor()
-    try:
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS rss_feed_cache (
+            feed_url     TEXT PRIMARY KEY,
+            payload_json TEXT NOT NULL,
+            fetched_at   TIMESTAMP NOT NULL
+        )
+    """)
+
+
+def _m009_rss_feed_cache_validators(c):
+    """HTTP validators for conditional re-fetch of cached feeds."""
+    _add_columns(c, "rss_feed_cache", [
+        ("etag",          "TEXT"),
+        ("last_modified", "TEXT"),
+    ])
+
+
+def _m010_semantic_review_cache(c):
+    """Pass 2 (semantic compliance) result cache — see SEMANTIC REVIEW CACHE."""
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS semantic_review_cache (
+            cache_key     TEXT PRIMARY KEY,
+            rules_version TEXT NOT NULL,
+            profile       TEXT,
+            result_json   TEXT NOT NULL,
+            created_at    TIMESTAMP NOT NULL,
+            last_hit_at   TIMESTAMP NOT NULL,
+            hits          INTEGER DEFAULT 0
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_semantic_review_cache_lru "
+              "ON semantic_review_cache(last_hit_at)")
+
+
+def _m011_public_page_versions(c):
+    """
+    users.public_version — bumped by bump_public_version() whenever anything
+    shown on an agent's public pages changes; keys the rendered-page cache.
+    rendered_page_cache — on-disk layer of that cache (see PUBLIC PAGES).
+    """
+    _add_columns(c, "users", [
+        ("public_version",    "INTEGER DEFAULT 0"),
+        ("public_updated_at", "TIMESTAMP"),
+    ])
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS rendered_page_cache (
+            cache_key  TEXT PRIMARY KEY,
+            user_id    INTEGER,
+            version    TEXT NOT NULL,
+            body       TEXT NOT NULL,
+            created_at TIMESTAMP NOT NULL
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_rendered_page_cache_user "
+              "ON rendered_page_cache(user_id)")
+
+
+def _m012_content_post_slug(c):
+    """
+    content_library.post_slug — the stored /posts/{slug} path segment, so post
+    pages resolve by key instead of re-deriving every slug. Backfilled in
+    id-ordered chunks to keep the startup transaction short per batch.
+    """
+    _add_columns(c, "content_library", [("post_slug", "TEXT")])
+    c.execute("CREATE INDEX IF NOT EXISTS idx_content_library_user_post_slug "
+              "ON content_library(user_id, post_slug)")
+    last_id, filled = 0, 0
+    while True:
         c.execute("""
-            UPDATE users
-            SET role = 'admin', staff_type = NULL
-            WHERE role IN ('staff_licensed', 'staff_marketing')
-        """)
-        affected = c.rowcount
-        conn.commit()
-        if affected:
-            print(f"[DB] Role migration: {affected} user(s) moved to 'admin' role")
-    except Exception as e:
-        print(f"[DB] Role migration error: {e}")
-    finally:
-        conn.close()
+            SELECT id, content FROM content_library
+            WHERE id > ? AND post_slug IS NULL
+            ORDER BY id LIMIT 500
+        """, (last_id,))
+        rows = c.fetchall()
+        if not rows:
+            break
+        c.executemany(
+            "UPDATE content_library SET post_slug = ? WHERE id = ?",
+            [(post_slug_for_content(r["content"], r["id"]), r["id"]) for r in rows],
+        )
+        last_id = rows[-1]["id"]
+        filled += len(rows)
+    if filled:
+        print(f"[DB] post_slug backfilled for {filled} library items")
 
 
-def migrate_approval_tokens():
+def _m013_registry_entries(c):
     """
-    Non-destructive migration — creates approval_tokens table if it doesn't exist.
-    Safe to call on every startup. Table is also created in init_db().
+    registry_entries — one row per agent listed on /registry, kept current by
+    registry_refresh_user() so the page is a single ordered SELECT. Backfilled
+    from every agent that currently qualifies.
     """
-    conn = get_conn()
-    c    = conn.cursor()
-    try:
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS registry_entries (
+            user_id     INTEGER PRIMARY KEY,
+            slug        TEXT NOT NULL,
+            name        TEXT NOT NULL DEFAULT '',
+            market      TEXT NOT NULL DEFAULT '',
+            niches_json TEXT NOT NULL DEFAULT '[]',
+            cpr_count   INTEGER NOT NULL DEFAULT 0,
+            updated_at  TIMESTAMP NOT NULL
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_registry_entries_order "
+              "ON registry_entries(cpr_count DESC, name COLLATE NOCASE)")
+    c.execute("SELECT DISTINCT user_id FROM compliance_records")
+    for r in c.fetchall():
+        registry_refresh_user(r["user_id"], c)
+
+
+def _m014_content_verdict(c):
+    """
+    content_library.verdict — _compliance_verdict() of the item's compliance
+    blob ('pass' | 'warn' | 'fail' | 'pending'), stored on every compliance
+    write so dashboards aggregate in SQL. Backfilled in id-ordered chunks.
+    Also indexes the roster columns the broker/team aggregate filters on.
+    """
+    _add_columns(c, "content_library", [("verdict", "TEXT")])
+    c.execute("CREATE INDEX IF NOT EXISTS idx_users_broker ON users(broker_id) WHERE broker_id IS NOT NULL")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_users_team ON users(team_id) WHERE team_id IS NOT NULL")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_schedules_user ON schedules(user_id, active)")
+    last_id, filled = 0, 0
+    while True:
         c.execute("""
-            CREATE TABLE IF NOT EXISTS approval_tokens (
-                id              INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id         INTEGER NOT NULL,
-                library_item_id INTEGER NOT NULL,
-                token           TEXT    NOT NULL UNIQUE,
-                action          TEXT    NOT NULL DEFAULT 'approve',
-                expires_at      TEXT    NOT NULL,
-                used            INTEGER DEFAULT 0,
-                created_at      TEXT    DEFAULT (datetime('now')),
-                FOREIGN KEY (user_id)         REFERENCES users(id),
-                FOREIGN KEY (library_item_id) REFERENCES content_library(id)
-            )
-        """)
-        conn.commit()
-        print("[DB] approval_tokens table ready.")
-    except Exception as e:
-        print(f"[DB] migrate_approval_tokens: {e}")
-    finally:
-        conn.close()
+            SELECT id, compliance FROM content_library
+            WHERE id > ? AND verdict IS NULL
+            ORDER BY id LIMIT 500
+        """, (last_id,))
+        rows = c.fetchall()
+        if not rows:
+            break
+        c.executemany("UPDATE content_library SET verdict = ? WHERE id = ?",
+                      [(_compliance_verdict(r["compliance"]), r["id"]) for r in rows])
+        last_id = rows[-1]["id"]
+        filled += len(rows)
+    if filled:
+        print(f"[DB] verdict backfilled for {filled} library items")
+
+
+def _m015_agent_setup_hot_columns(c):
+    """
+    Projects the agent_setup fields read by collectors, the registry and
+    dashboards out of setup_json into plain columns, written alongside the
+    blob by _upsert_agent_setup(). primary_niches / service_areas hold JSON
+    arrays. Backfilled from every existing row, then registry_entries is
+    (re)built from them for every agent with a CPR on file.
+    """
+    _add_columns(c, "agent_setup", [
+        ("market",         "TEXT DEFAULT ''"),
+        ("state",          "TEXT DEFAULT ''"),
+        ("brokerage",      "TEXT DEFAULT ''"),
+        ("primary_niches", "TEXT DEFAULT '[]'"),
+        ("service_areas",  "TEXT DEFAULT '[]'"),
+    ])
+    c.execute("CREATE INDEX IF NOT EXISTS idx_agent_setup_market "
+              "ON agent_setup(market COLLATE NOCASE)")
+    c.execute("SELECT user_id, setup_json FROM agent_setup")
+    rows = c.fetchall()
+    for r in rows:
+        try:
+            setup = json.loads(r["setup_json"] or "{}")
+        except Exception:
+            setup = {}
+        c.execute("""
+            UPDATE agent_setup
+            SET market = ?, state = ?, brokerage = ?, primary_niches = ?, service_areas = ?
+            WHERE user_id = ?
+        """, (*_setup_hot_columns(setup), r["user_id"]))
+    c.execute("SELECT DISTINCT user_id FROM compliance_records")
+    for r in c.fetchall():
+        registry_refresh_user(r["user_id"], c)
+
+
+# users columns that auth.get_current_user caches or checks; any UPDATE touching
+# one of them (from any process, any code path) signals the cache.
+_USER_CACHE_COLUMNS = (
+    "email", "password_hash", "agent_name", "brokerage", "phone", "notification_email",
+    "is_active", "role", "broker_id", "is_demo", "plan", "token_version",
+)
+
+
+def _m016_user_cache_invalidations(c):
+    """
+    user_cache_invalidations — append-only log of user ids whose cached auth
+    row is stale, written by triggers so every worker process can evict them
+    (see auth._sync_user_cache). Pruned by user_cache_invalidations_since().
+    """
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS user_cache_invalidations (
+            id         INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id    INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_users_cache_update
+        AFTER UPDATE OF {", ".join(_USER_CACHE_COLUMNS)} ON users
+        BEGIN
+            INSERT INTO user_cache_invalidations (user_id) VALUES (NEW.id);
+        END
+    """)
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_users_cache_delete
+        AFTER DELETE ON users
+        BEGIN
+            INSERT INTO user_cache_invalidations (user_id) VALUES (OLD.id);
+        END
+    """)
+
+
+def _m017_rate_limit_state(c):
+    """
+    rate_limit_state — shared per-key limiter state for rate_limit.py so IP
+    limits hold across uvicorn workers. s0..s2 are algorithm-defined (window
+    start / counts for sliding windows, tokens / last refill for buckets).
+    updated_at is epoch seconds; rows idle past the limiter's horizon are pruned.
+    """
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS rate_limit_state (
+            bucket     TEXT NOT NULL,
+            key        TEXT NOT NULL,
+            s0         REAL,
+            s1         REAL,
+            s2         REAL,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (bucket, key)
+        ) WITHOUT ROWID
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_rate_limit_state_updated ON rate_limit_state(bucket, updated_at)")
+
+
+def _m018_notification_outbox(c):
+    """
+    notification_outbox — approval emails/SMS waiting for the notification
+    dispatcher (notifications.py). status: queued | sending | sent | failed.
+    payload is the JSON argument dict for the channel's sender; failed sends
+    return to 'queued' with next_attempt_at pushed out by backoff.
+    """
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS notification_outbox (
+            id              INTEGER PRIMARY KEY AUTOINCREMENT,
+            channel         TEXT NOT NULL,
+            recipient       TEXT NOT NULL,
+            payload         TEXT NOT NULL DEFAULT '{}',
+            status          TEXT NOT NULL DEFAULT 'queued',
+            attempts        INTEGER DEFAULT 0,
+            next_attempt_at TEXT NOT NULL,
+            claimed_at      TEXT,
+            sent_at         TEXT,
+            last_error      TEXT DEFAULT '',
+            created_at      TEXT DEFAULT (datetime('now'))
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_notification_outbox_due "
+              "ON notification_outbox(next_attempt_at) WHERE status = 'queued'")
+
+
+def _m019_notification_batches(c):
+    """
+    notification_batches — one row per outbound provider request made by the
+    notification dispatcher (a SendGrid call carries up to 1000 personalizations).
+    Outbox rows point at the batch that last carried them (batch_id) and are
+    claimed in bulk by claim_token.
+    """
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS notification_batches (
+            id          INTEGER PRIMARY KEY AUTOINCREMENT,
+            channel     TEXT NOT NULL,
+            template    TEXT NOT NULL DEFAULT '',
+            size        INTEGER NOT NULL DEFAULT 0,
+            status      TEXT NOT NULL DEFAULT 'sending',
+            error       TEXT DEFAULT '',
+            elapsed_ms  INTEGER,
+            started_at  TEXT DEFAULT (datetime('now')),
+            finished_at TEXT
+        )
+    """)
+    _add_columns(c, "notification_outbox", [
+        ("batch_id",    "INTEGER"),
+        ("claim_token", "TEXT"),
+    ])
+    c.execute("CREATE INDEX IF NOT EXISTS idx_notification_outbox_claim "
+              "ON notification_outbox(claim_token) WHERE claim_token IS NOT NULL")
+
+
+def _m020_content_verdict_pending_index(c):
+    """
+    Partial index over content_library rows still missing a verdict, so
+    backfill_content_verdicts() walks only the unfilled ids at startup.
+    """
+    c.execute("CREATE INDEX IF NOT EXISTS idx_content_library_verdict_pending "
+              "ON content_library(id) WHERE verdict IS NULL")
+
+
+def _m021_distribution_post_ref(c):
+    """
+    distribution_queue.post_ref — the platform's id (or URL) for a published
+    row, written by the drip worker as soon as the post is live and before the
+    claim is cleared. The stale-claim sweep finishes such rows as 'posted'
+    instead of requeueing them, so a failed bookkeeping write can't repost.
+    """
+    _add_columns(c, "distribution_queue", [("post_ref", "TEXT")])
+
+
+def _m003_unify_staff_roles(c):
+    """
+    Converts legacy staff_licensed and staff_marketing roles to the unified
+    'admin' role introduced in the new role architecture.
+    staff_licensed  → admin (is_licensed=1, staff_type=NULL)
+    staff_marketing → admin (is_licensed=0, staff_type=NULL)
+    """
+    c.execute("""
+        UPDATE users
+        SET role = 'admin', staff_type = NULL
+        WHERE role IN ('staff_licensed', 'staff_marketing')
+    """)
+    if c.rowcount:
+        print(f"[DB] Role migration: {c.rowcount} user(s) moved to 'admin' role")
 
 
 def log_audit_event(actor_id: int, action: str,
@@ -1392,18 +1787,51 @@ def save_agent_setup(user_id: int, setup: dict):
             )
 
     conn = get_conn()
-    c = conn.cursor()
-    c.execute("""
-        INSERT INTO agent_setup (user_id, setup_json, updated_at)
-        VALUES (?, ?, ?)
-        ON CONFLICT(user_id) DO UPDATE SET
-            setup_json = excluded.setup_json,
-            updated_at = excluded.updated_at
-    """, (user_id, json.dumps(setup), datetime.utcnow().isoformat()))
+    _upsert_agent_setup(conn, user_id, setup)
+    bump_public_version(user_id, conn)
     conn.commit()
     conn.close()
 
 
+def _setup_hot_columns(setup: dict) -> tuple:
+    """(market, state, brokerage, primary_niches, service_areas) column values."""
+    if not isinstance(setup, dict):
+        setup = {}
+    def _text(v):
+        return v.strip() if isinstance(v, str) else ""
+    def _list(v):
+        return json.dumps(v if isinstance(v, list) else [])
+    return (
+        _text(setup.get("market")),
+        _text(setup.get("state")),
+        _text(setup.get("brokerage")),
+        _list(setup.get("primaryNiches")),
+        _list(setup.get("serviceAreas")),
+    )
+
+
+def _upsert_agent_setup(conn, user_id: int, setup: dict, updated_at: str = None) -> None:
+    """
+    The one write path for agent_setup: stores the blob and its projected hot
+    columns together so they can never drift. conn may be a connection or a
+    cursor; the caller commits.
+    """
+    conn.execute("""
+        INSERT INTO agent_setup (user_id, setup_json, updated_at,
+                                 market, state, brokerage, primary_niches, service_areas)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET
+            setup_json     = excluded.setup_json,
+            updated_at     = excluded.updated_at,
+            market         = excluded.market,
+            state          = excluded.state,
+            brokerage      = excluded.brokerage,
+            primary_niches = excluded.primary_niches,
+            service_areas  = excluded.service_areas
+    """, (user_id, json.dumps(setup), updated_at or datetime.utcnow().isoformat(),
+          *_setup_hot_columns(setup)))
+
+
 def get_agent_setup(user_id: int) -> dict:
     """Get agent setup/identity data from DB."""
     conn = get_conn()
@@ -1446,12 +1874,11 @@ def get_user_results(user_id: int) -> dict:
         except Exception:
             pass
 
-    c.execute("SELECT compliance FROM content_library WHERE user_id = ? AND status IN ('approved','published')", (user_id,))
-    passing = 0
-    comp_rows = c.fetchall()
-    for row in comp_rows:
-        if _compliance_verdict(row["compliance"]) == "pass":
-            passing += 1
+    c.execute("""
+        SELECT COUNT(*) as cnt FROM content_library
+        WHERE user_id = ? AND status IN ('approved','published') AND verdict = 'pass'
+    """, (user_id,))
+    passing = c.fetchone()["cnt"]
     compliance_rate = round((passing / total_approved) * 100) if total_approved > 0 else None
 
     c.execute("SELECT COUNT(*) as cnt FROM schedules WHERE user_id = ? AND active = 1", (user_id,))
@@ -1495,6 +1922,157 @@ def get_user_results(user_id: int) -> dict:
     }
 
 
+# ─────────────────────────────────────────────
+# USER CACHE INVALIDATION — read side of migration 16's triggers
+# ─────────────────────────────────────────────
+
+def user_cache_invalidations_since(last_id: int, prune_before: str = None) -> list:
+    """
+    (id, user_id) invalidation rows newer than last_id, oldest first. When
+    prune_before (ISO timestamp) is given, older rows are deleted first.
+    """
+    conn = get_conn()
+    c    = conn.cursor()
+    if prune_before:
+        c.execute("DELETE FROM user_cache_invalidations WHERE created_at < ?", (prune_before,))
+        conn.commit()
+    c.execute("SELECT id, user_id FROM user_cache_invalidations WHERE id > ? ORDER BY id",
+              (last_id,))
+    rows = [(r["id"], r["user_id"]) for r in c.fetchall()]
+    conn.close()
+    return rows
+
+
+def user_cache_invalidation_head() -> int:
+    conn = get_conn()
+    row  = conn.execute("SELECT COALESCE(MAX(id), 0) AS n FROM user_cache_invalidations").fetchone()
+    conn.close()
+    return row["n"]
+
+
+# ─────────────────────────────────────────────
+# PUBLIC PAGES — content version + rendered-page cache
+# users.public_version is the single invalidation signal for everything a
+# crawler can see about an agent (authority page, post pages, sitemap, feed).
+# Every write that changes public content calls bump_public_version(); caches
+# key on the version, so a bump from any worker invalidates them all.
+# ─────────────────────────────────────────────
+
+def bump_public_version(user_id: int, conn=None):
+    """Invalidate an agent's cached public pages. Pass conn to join its transaction."""
+    own  = conn is None
+    conn = conn or get_conn()
+    conn.execute("""
+        UPDATE users SET public_version = COALESCE(public_version, 0) + 1,
+                         public_updated_at = ?
+        WHERE id = ?
+    """, (datetime.utcnow().isoformat(), user_id))
+    registry_refresh_user(user_id, conn)
+    if own:
+        conn.commit()
+        conn.close()
+
+
+def registry_refresh_user(user_id: int, conn) -> None:
+    """
+    Recompute one agent's registry_entries row inside conn's transaction
+    (conn may be a connection or cursor). Qualifying = active, live slug, not a
+    demo/ghost, and at least one permanent CPR on file; anyone else is removed.
+    Called from bump_public_version(), which every approval, setup save, slug,
+    profile and activation change already goes through.
+    """
+    user = conn.execute("""
+        SELECT agent_name, agent_slug, is_active, is_demo, ghost_expires_at
+        FROM users WHERE id = ?
+    """, (user_id,)).fetchone()
+    cpr = conn.execute("SELECT COUNT(*) AS n FROM compliance_records WHERE user_id = ?",
+                       (user_id,)).fetchone()["n"] if user else 0
+    if (not user or not user["is_active"] or not user["agent_slug"]
+            or user["is_demo"] or user["ghost_expires_at"] is not None or not cpr):
+        conn.execute("DELETE FROM registry_entries WHERE user_id = ?", (user_id,))
+        return
+
+    try:
+        row = conn.execute("SELECT market, primary_niches FROM agent_setup WHERE user_id = ?",
+                           (user_id,)).fetchone()
+        market, niches_json = (row["market"] or "", row["primary_niches"] or "[]") if row else ("", "[]")
+    except sqlite3.OperationalError:
+        # Migration 13 populates the registry before migration 15 adds the
+        # projected columns; read the blob in that window.
+        row = conn.execute("SELECT setup_json FROM agent_setup WHERE user_id = ?",
+                           (user_id,)).fetchone()
+        try:
+            setup = json.loads(row["setup_json"] or "{}") if row else {}
+        except Exception:
+            setup = {}
+        market, _state, _brokerage, niches_json, _areas = _setup_hot_columns(setup)
+    conn.execute("""
+        INSERT INTO registry_entries (user_id, slug, name, market, niches_json, cpr_count, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET
+            slug        = excluded.slug,
+            name        = excluded.name,
+            market      = excluded.market,
+            niches_json = excluded.niches_json,
+            cpr_count   = excluded.cpr_count,
+            updated_at  = excluded.updated_at
+    """, (user_id, user["agent_slug"], user["agent_name"] or "", market, niches_json,
+          cpr, datetime.utcnow().isoformat()))
+
+
+def registry_list() -> list:
+    """Registry rows ordered by CPR count descending, then name."""
+    conn = get_conn()
+    c    = conn.cursor()
+    c.execute("""
+        SELECT slug, name, market, niches_json, cpr_count
+        FROM registry_entries
+        ORDER BY cpr_count DESC, name COLLATE NOCASE
+    """)
+    rows = c.fetchall()
+    conn.close()
+    out = []
+    for r in rows:
+        try:
+            niches = json.loads(r["niches_json"] or "[]")
+        except Exception:
+            niches = []
+        out.append({
+            "name":   r["name"],
+            "slug":   r["slug"],
+            "cpr":    r["cpr_count"],
+            "market": r["market"],
+            "niches": niches,
+        })
+    return out
+
+
+def page_cache_get(cache_key: str, version: str) -> Optional[str]:
+    """Return the cached body for cache_key if it was rendered at this version."""
+    conn = get_conn()
+    c    = conn.cursor()
+    c.execute("SELECT body FROM rendered_page_cache WHERE cache_key = ? AND version = ?",
+              (cache_key, version))
+    row = c.fetchone()
+    conn.close()
+    return row["body"] if row else None
+
+
+def page_cache_put(cache_key: str, user_id: int, version: str, body: str):
+    conn = get_conn()
+    conn.execute("""
+        INSERT INTO rendered_page_cache (cache_key, user_id, version, body, created_at)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(cache_key) DO UPDATE SET
+            user_id    = excluded.user_id,
+            version    = excluded.version,
+            body       = excluded.body,
+            created_at = excluded.created_at
+    """, (cache_key, user_id, version, body, datetime.utcnow().isoformat()))
+    conn.commit()
+    conn.close()
+
+
 # ─────────────────────────────────────────────
 # TRENDS
 # ─────────────────────────────────────────────
@@ -1604,6 +2182,7 @@ def record_compliance_approval(
             context if context in ("agent", "hb_marketing") else "agent",
             origin_type, answer_ref,
         ))
+        bump_public_version(user_id, conn)
         conn.commit()
         conn.close()
         print(f"[CIR] Compliance record written — {cir_id} for user {user_id}")
@@ -1752,16 +2331,18 @@ def get_compliance_records_for_broker(
 
 
 def backfill_compliance_records() -> int:
+    """Standalone entry point for _backfill_compliance_records (migration 5)."""
+    with db_conn() as conn:
+        return _backfill_compliance_records(conn.cursor())
+
+
+def _backfill_compliance_records(c) -> int:
     """
     One-time backfill — copies approved/published posts that already have a
     CIR ID from content_library into compliance_records.
     Safe to call multiple times — skips any cir_id already present.
     Returns the number of records written.
-    Called automatically at startup from app.py after init_db().
     """
-    conn = get_conn()
-    c    = conn.cursor()
-
     # Find all approved/published items with a cir_id not yet in compliance_records
     c.execute("""
         SELECT cl.id, cl.user_id, cl.cir_id, cl.niche, cl.content, cl.compliance,
@@ -1807,13 +2388,228 @@ def backfill_compliance_records() -> int:
             print(f"[Backfill] Skipping item {r['id']}: {e}")
             continue
 
-    conn.commit()
-    conn.close()
     if written:
         print(f"[Backfill] compliance_records: {written} historical record(s) written.")
     else:
-        print("[Backfill] compliance_records: already up to date, nothing to write.")
-    return written
+        print("[Backfill] compliance_records: already up to date, nothing to write.")
+    return written
+
+
+def backfill_content_verdicts(batch_size: int = 500) -> int:
+    """
+    Fill content_library.verdict for rows that predate the column. Works in
+    id-ordered chunks, committing each one, so it never holds the write lock
+    for long and an interrupted run resumes where it stopped (it only ever
+    selects verdict IS NULL rows). Returns the number of rows filled.
+    """
+    filled, last_id = 0, 0
+    while True:
+        conn = get_conn()
+        c    = conn.cursor()
+        c.execute("""
+            SELECT id, compliance FROM content_library
+            WHERE verdict IS NULL AND id > ?
+            ORDER BY id LIMIT ?
+        """, (last_id, batch_size))
+        rows = c.fetchall()
+        if rows:
+            c.executemany("UPDATE content_library SET verdict = ? WHERE id = ?",
+                          [(_compliance_verdict(r["compliance"]), r["id"]) for r in rows])
+            conn.commit()
+        conn.close()
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+        filled += len(rows)
+        if filled % (batch_size * 20) == 0:
+            print(f"[DB] verdict backfill: {filled} rows so far (through id {last_id})")
+    return filled
+
+
+# ─────────────────────────────────────────────
+# SEMANTIC REVIEW CACHE — Pass 2 results keyed by content hash
+# The key (built in content_engine) already folds in profile, state, niche,
+# rules version and verification dates, so a stale row can never be hit —
+# purging is only about space.
+# ─────────────────────────────────────────────
+
+SEMANTIC_CACHE_MAX_ROWS = int(os.getenv("SEMANTIC_CACHE_MAX_ROWS", "20000"))
+
+
+def semantic_cache_get(cache_key: str, max_age_days: int):
+    """Return {'result_json', 'created_at', 'rules_version'} if fresh, else None. Counts the hit."""
+    cutoff = (datetime.utcnow() - timedelta(days=max_age_days)).isoformat()
+    conn = get_conn()
+    c    = conn.cursor()
+    c.execute("""
+        SELECT result_json, created_at, rules_version FROM semantic_review_cache
+        WHERE cache_key = ? AND created_at >= ?
+    """, (cache_key, cutoff))
+    row = c.fetchone()
+    if row:
+        c.execute("""
+            UPDATE semantic_review_cache
+            SET hits = hits + 1, last_hit_at = ?
+            WHERE cache_key = ?
+        """, (datetime.utcnow().isoformat(), cache_key))
+        conn.commit()
+    conn.close()
+    return dict(row) if row else None
+
+
+def semantic_cache_put(cache_key: str, rules_version: str, profile: str, result_json: str):
+    """Store a Pass 2 result; trims the table to SEMANTIC_CACHE_MAX_ROWS (least recently used first)."""
+    now  = datetime.utcnow().isoformat()
+    conn = get_conn()
+    c    = conn.cursor()
+    c.execute("""
+        INSERT OR REPLACE INTO semantic_review_cache
+            (cache_key, rules_version, profile, result_json, created_at, last_hit_at, hits)
+        VALUES (?, ?, ?, ?, ?, ?, 0)
+    """, (cache_key, rules_version, profile, result_json, now, now))
+    c.execute("SELECT COUNT(*) AS n FROM semantic_review_cache")
+    overflow = c.fetchone()["n"] - SEMANTIC_CACHE_MAX_ROWS
+    if overflow > 0:
+        c.execute("""
+            DELETE FROM semantic_review_cache WHERE cache_key IN (
+                SELECT cache_key FROM semantic_review_cache
+                ORDER BY last_hit_at ASC LIMIT ?
+            )
+        """, (overflow,))
+    conn.commit()
+    conn.close()
+
+
+def semantic_cache_purge(keep_rules_version: str = None, max_age_days: int = None) -> int:
+    """Delete rows from other rules versions and/or older than max_age_days. Returns rows removed."""
+    conn = get_conn()
+    c    = conn.cursor()
+    removed = 0
+    if keep_rules_version:
+        c.execute("DELETE FROM semantic_review_cache WHERE rules_version != ?", (keep_rules_version,))
+        removed += c.rowcount
+    if max_age_days:
+        cutoff = (datetime.utcnow() - timedelta(days=max_age_days)).isoformat()
+        c.execute("DELETE FROM semantic_review_cache WHERE created_at < ?", (cutoff,))
+        removed += c.rowcount
+    conn.commit()
+    conn.close()
+    return removed
+
+
+# ─────────────────────────────────────────────
+# SCHEMA MIGRATIONS
+# Ordered registry. schema_version records every step that has run, so
+# startup only executes the steps that are pending — all of them inside one
+# BEGIN IMMEDIATE transaction (a second uvicorn worker booting at the same
+# time waits on the lock, then finds nothing left to do). Append new steps
+# with the next version number; never renumber or edit a shipped step.
+# ─────────────────────────────────────────────
+def _table_columns(c, table: str) -> set:
+    c.execute(f"PRAGMA table_info({table})")
+    return {row[1] for row in c.fetchall()}
+
+
+def _add_columns(c, table: str, columns: list) -> None:
+    """ALTER TABLE ADD COLUMN for each (name, definition) not already present."""
+    existing = _table_columns(c, table)
+    for col, defn in columns:
+        if col not in existing:
+            c.execute(f"ALTER TABLE {table} ADD COLUMN {col} {defn}")
+            existing.add(col)
+
+
+MIGRATIONS = [
+    (1, "baseline_schema",              _m001_baseline_schema),
+    (2, "content_library_columns",      _m002_content_library_columns),
+    (3, "unify_staff_roles",            _m003_unify_staff_roles),
+    (4, "seed_question_bank",           _seed_question_bank),
+    (5, "backfill_compliance_records",  _backfill_compliance_records),
+    (6, "compliance_checker_leads",     _m006_compliance_checker_leads),
+    (7, "hot_path_indexes",             _m007_hot_path_indexes),
+    (8, "rss_feed_cache",               _m008_rss_feed_cache),
+    (9, "rss_feed_cache_validators",    _m009_rss_feed_cache_validators),
+    (10, "semantic_review_cache",       _m010_semantic_review_cache),
+    (11, "public_page_versions",        _m011_public_page_versions),
+    (12, "content_post_slug",           _m012_content_post_slug),
+    (13, "registry_entries",            _m013_registry_entries),
+    (14, "content_verdict",             _m014_content_verdict),
+    (15, "agent_setup_hot_columns",     _m015_agent_setup_hot_columns),
+    (16, "user_cache_invalidations",    _m016_user_cache_invalidations),
+    (17, "rate_limit_state",            _m017_rate_limit_state),
+    (18, "notification_outbox",         _m018_notification_outbox),
+    (19, "notification_batches",        _m019_notification_batches),
+    (20, "content_verdict_pending_index", _m020_content_verdict_pending_index),
+    (21, "distribution_post_ref",       _m021_distribution_post_ref),
+]
+
+
+def get_schema_version() -> int:
+    conn = get_conn()
+    try:
+        row = conn.execute("SELECT MAX(version) AS v FROM schema_version").fetchone()
+        return (row["v"] or 0) if row else 0
+    except sqlite3.OperationalError:
+        return 0  # schema_version not created yet
+    finally:
+        conn.close()
+
+
+def run_migrations() -> list:
+    """
+    Apply every pending migration in one transaction, logging the time each
+    step takes. Returns the list of versions applied (empty when current).
+    Any failure rolls the whole batch back and re-raises — the app must not
+    start against a half-migrated schema.
+    """
+    import time as _t
+    started = _t.perf_counter()
+    conn = get_conn()
+    c    = conn.cursor()
+    applied = []
+    try:
+        c.execute("BEGIN IMMEDIATE")
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version    INTEGER PRIMARY KEY,
+                name       TEXT    NOT NULL,
+                applied_at TEXT    DEFAULT (datetime('now')),
+                duration_ms REAL   DEFAULT 0
+            )
+        """)
+        c.execute("SELECT version FROM schema_version")
+        done = {row["version"] for row in c.fetchall()}
+        for version, name, step in MIGRATIONS:
+            if version in done:
+                continue
+            t0 = _t.perf_counter()
+            step(c)
+            ms = (_t.perf_counter() - t0) * 1000
+            c.execute(
+                "INSERT INTO schema_version (version, name, duration_ms) VALUES (?, ?, ?)",
+                (version, name, round(ms, 1)),
+            )
+            applied.append(version)
+            print(f"[DB] migration {version:03d} {name}: {ms:.1f} ms")
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"[DB] migrations rolled back: {e}")
+        raise
+    finally:
+        conn.close()
+    total_ms = (_t.perf_counter() - started) * 1000
+    if applied:
+        print(f"[DB] schema at version {MIGRATIONS[-1][0]} — applied {len(applied)} migration(s) in {total_ms:.1f} ms")
+    else:
+        print(f"[DB] schema current (version {MIGRATIONS[-1][0]}) — checked in {total_ms:.1f} ms")
+    return applied
+
+
+def init_db():
+    """Bring the schema up to date. Kept as the public entry point used by
+    app.startup_event and setup_admin.py."""
+    return run_migrations()
 
 
 # ─────────────────────────────────────────────
@@ -1954,11 +2750,7 @@ def _seed_persona(fields, posts, is_ghost=False, ghost_expires_at=None):
         "primaryNiches": fields["niches"], "brandVoice": fields.get("brand_voice", ""),
         "shortBio": fields.get("short_bio", ""), "authoritySlug": fields["slug"],
     }
-    c.execute(
-        """INSERT INTO agent_setup (user_id, setup_json, updated_at) VALUES (?, ?, datetime('now'))
-           ON CONFLICT(user_id) DO UPDATE SET setup_json=excluded.setup_json, updated_at=datetime('now')""",
-        (uid, json.dumps(setup)),
-    )
+    _upsert_agent_setup(c, uid, setup)
     c.execute("DELETE FROM content_library  WHERE user_id=?", (uid,))
     c.execute("DELETE FROM compliance_records WHERE user_id=?", (uid,))
     c.execute("DELETE FROM schedules         WHERE user_id=?", (uid,))
@@ -1979,11 +2771,11 @@ def _seed_persona(fields, posts, is_ghost=False, ghost_expires_at=None):
             copied = json.dumps(p.get("platforms", []))
         c.execute(
             """INSERT INTO content_library
-               (user_id, niche, status, content, draft_content, compliance, copied_platforms,
+               (user_id, niche, status, content, draft_content, compliance, verdict, copied_platforms,
                 source, saved_at, approved_at, published_at, cir_id, context, origin_type)
-               VALUES (?, ?, ?, ?, ?, ?, ?, 'demo_seed', ?, ?, ?, ?, 'agent', 'engine_draft')""",
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'demo_seed', ?, ?, ?, ?, 'agent', 'engine_draft')""",
             (uid, p["niche"], status, json.dumps(content), json.dumps(content), json.dumps(compliance),
-             copied, ts, approved_at, published_at, cir_id),
+             _compliance_verdict(compliance), copied, ts, approved_at, published_at, cir_id),
         )
         lib_id = c.lastrowid
         if cir_id:
@@ -2176,6 +2968,60 @@ def member_answers_for_user(user_id: int) -> list:
 # ─────────────────────────────────────────────
 # CONTENT LIBRARY
 # ─────────────────────────────────────────────
+def make_post_slug(headline: str, post_id: int) -> str:
+    """Public post URL segment: headline words (max 60 chars) + the item id."""
+    base = re.sub(r"[^a-z0-9]+", "-", (headline or "post").lower().strip()).strip("-")[:60]
+    return f"{base}-{post_id}"
+
+
+def post_slug_for_content(content, post_id: int) -> str:
+    """make_post_slug() from a library item's content (dict or JSON string)."""
+    if isinstance(content, str):
+        try:
+            content = json.loads(content or "{}")
+        except Exception:
+            content = {}
+    if not isinstance(content, dict):
+        content = {}
+    return make_post_slug(content.get("headline") or content.get("title") or "", post_id)
+
+
+def refresh_post_slug(item_id: int, conn) -> None:
+    """Re-derive post_slug from the item's current content, inside conn's transaction."""
+    row = conn.execute("SELECT content FROM content_library WHERE id = ?", (item_id,)).fetchone()
+    if row:
+        conn.execute("UPDATE content_library SET post_slug = ? WHERE id = ?",
+                     (post_slug_for_content(row["content"], item_id), item_id))
+
+
+def library_get_public_post(user_id: int, post_slug: str) -> Optional[dict]:
+    """
+    Resolve a /posts/{post_slug} URL to a public (approved/published/archived)
+    item with one primary-key lookup on the trailing id. The caller compares
+    the returned item's post_slug with the requested one to detect stale
+    headline segments.
+    """
+    m = re.search(r"(\d+)$", post_slug or "")
+    if not m:
+        return None
+    conn = get_conn()
+    c    = conn.cursor()
+    c.execute("""
+        SELECT id, niche, content, cir_id, approved_at, status, post_slug
+        FROM content_library
+        WHERE id = ? AND user_id = ? AND status IN ('approved','published','archived')
+    """, (int(m.group(1)), user_id))
+    row = c.fetchone()
+    if row and not row["post_slug"]:
+        refresh_post_slug(row["id"], conn)
+        conn.commit()
+        c.execute("SELECT id, niche, content, cir_id, approved_at, status, post_slug "
+                  "FROM content_library WHERE id = ?", (row["id"],))
+        row = c.fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+
 def library_save(user_id: int, niche: str, content: dict,
                  compliance: dict, source: str = "manual",
                  context: str = "agent",
@@ -2204,22 +3050,25 @@ def library_save(user_id: int, niche: str, content: dict,
     content_json = json.dumps(content)
     c.execute("""
         INSERT INTO content_library
-            (user_id, niche, status, content, draft_content, compliance, source, saved_at, context,
-             origin_type, answer_ref, length)
-        VALUES (?, ?, 'pending', ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            (user_id, niche, status, content, draft_content, compliance, verdict, source, saved_at,
+             context, origin_type, answer_ref, length)
+        VALUES (?, ?, 'pending', ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
     """, (
         user_id, niche,
         content_json,
         content_json,
         json.dumps(compliance),
+        _compliance_verdict(compliance),
         source,
         datetime.utcnow().isoformat(),
         context,
         origin_type, answer_ref,
         length if length else "medium",
     ))
-    conn.commit()
     item_id = c.lastrowid
+    c.execute("UPDATE content_library SET post_slug = ? WHERE id = ?",
+              (post_slug_for_content(content, item_id), item_id))
+    conn.commit()
     conn.close()
     return library_get_item(item_id)
 
@@ -2320,6 +3169,9 @@ def library_update(item_id: int, user_id: int, updates: dict) -> Optional[dict]:
     if not fields:
         conn.close()
         return library_get_item(item_id)
+    if "compliance" in updates:
+        fields.append("verdict = ?")
+        values.append(_compliance_verdict(updates["compliance"]))
 
     # CIR generation — write on first approval
     # Only create a CIR ID if this update sets status to 'approved'
@@ -2358,6 +3210,10 @@ def library_update(item_id: int, user_id: int, updates: dict) -> Optional[dict]:
         f"UPDATE content_library SET {', '.join(fields)} WHERE id = ? AND user_id = ?",
         values
     )
+    if c.rowcount:
+        if "content" in updates or "status" in updates:
+            refresh_post_slug(item_id, conn)
+        bump_public_version(user_id, conn)
     conn.commit()
     conn.close()
 
@@ -2388,6 +3244,8 @@ def library_delete(item_id: int, user_id: int) -> bool:
         (item_id, user_id)
     )
     affected = c.rowcount
+    if affected:
+        bump_public_version(user_id, conn)
     conn.commit()
     conn.close()
     return affected > 0
@@ -2430,6 +3288,7 @@ def _row_to_item(row) -> dict:
         "content_regen_count": content_regen_count,
         "editedAt":            row["edited_at"]            if "edited_at"            in row.keys() else None,
         "complianceCheckedAt": row["compliance_checked_at"] if "compliance_checked_at" in row.keys() else None,
+        "postSlug":            row["post_slug"]            if "post_slug"            in row.keys() else None,
     }
 
 
@@ -2690,20 +3549,30 @@ def distribution_enqueue(user_id: int, library_item_id: int, platform: str,
     return _distribution_row(row) if row else None
 
 
-def distribution_get_due(now_iso: str = None, limit: int = 100) -> list:
+def distribution_get_due(now_iso: str = None, limit: int = 100, platform: str = None,
+                         skip_paused: bool = False) -> list:
     """
     Return queued rows whose scheduled_for is due (<= now), soonest first. Non-
-    mutating: the worker filters these by pause state, then claims each survivor
-    with distribution_claim_due before posting.
+    mutating: the worker claims each row with distribution_claim_due before
+    posting. platform narrows to one platform (the drip worker fills each
+    platform's slots separately); skip_paused drops members whose
+    distribution_pause is set for the row's context, so paused backlogs can't
+    crowd live rows out of the LIMIT.
     """
     conn = get_conn()
     c = conn.cursor()
     now_iso = now_iso or datetime.utcnow().isoformat()
-    c.execute(
-        "SELECT * FROM distribution_queue WHERE status = 'queued' "
-        "AND scheduled_for <= ? ORDER BY scheduled_for ASC LIMIT ?",
-        (now_iso, limit),
-    )
+    sql    = "SELECT * FROM distribution_queue q WHERE status = 'queued' AND scheduled_for <= ?"
+    params = [now_iso]
+    if platform:
+        sql += " AND platform = ?"
+        params.append(platform)
+    if skip_paused:
+        sql += (" AND NOT EXISTS (SELECT 1 FROM distribution_pause p "
+                "WHERE p.user_id = q.user_id AND p.context = q.context AND p.paused = 1)")
+    sql += " ORDER BY scheduled_for ASC LIMIT ?"
+    params.append(limit)
+    c.execute(sql, params)
     rows = c.fetchall()
     conn.close()
     return [_distribution_row(r) for r in rows]
@@ -2729,6 +3598,34 @@ def distribution_claim_due(queue_id: int) -> bool:
     return won
 
 
+def distribution_record_post(queue_id: int, post_ref: str) -> None:
+    """
+    Note that a claimed row is live on the platform (post_ref = platform id or
+    URL) before it is marked posted. distribution_requeue_stale never requeues
+    a row carrying a post_ref.
+    """
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute("UPDATE distribution_queue SET post_ref = ? WHERE id = ?", (post_ref, queue_id))
+    conn.commit()
+    conn.close()
+
+
+def distribution_release_claim(queue_id: int) -> bool:
+    """Hand a claimed, not-yet-attempted row back to 'queued'. Returns True if it moved."""
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute(
+        "UPDATE distribution_queue SET status = 'queued', claimed_at = NULL "
+        "WHERE id = ? AND status = 'claimed' AND post_ref IS NULL",
+        (queue_id,),
+    )
+    moved = c.rowcount == 1
+    conn.commit()
+    conn.close()
+    return moved
+
+
 def distribution_mark_posted(queue_id: int, posted_at: str = None) -> None:
     """Mark a claimed row as successfully posted."""
     conn = get_conn()
@@ -2741,22 +3638,69 @@ def distribution_mark_posted(queue_id: int, posted_at: str = None) -> None:
     conn.close()
 
 
-def distribution_mark_failed(queue_id: int, error: str, give_up: bool = False) -> None:
+def distribution_mark_failed(queue_id: int, error: str, give_up: bool = False,
+                             retry_at: str = None) -> None:
     """
     Record a posting failure: increment attempts and store the error. By default
     the row returns to 'queued' so a later loop can retry; give_up=True marks it
     terminally 'failed' (the worker decides when the attempt cap is reached).
+    retry_at (future ISO-UTC) pushes scheduled_for out for backoff.
     """
     new_status = "failed" if give_up else "queued"
     conn = get_conn()
     c = conn.cursor()
     c.execute(
         "UPDATE distribution_queue SET status = ?, attempts = attempts + 1, "
-        "claimed_at = NULL, last_error = ? WHERE id = ?",
-        (new_status, str(error)[:500], queue_id),
+        "claimed_at = NULL, last_error = ?, scheduled_for = COALESCE(?, scheduled_for) "
+        "WHERE id = ?",
+        (new_status, str(error)[:500], retry_at, queue_id),
+    )
+    conn.commit()
+    conn.close()
+
+
+def distribution_defer(queue_id: int, scheduled_for: str) -> bool:
+    """
+    Push a still-queued row to a later scheduled_for without counting an attempt
+    (the drip worker's per-connection throttle). Returns True if the row moved.
+    """
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute(
+        "UPDATE distribution_queue SET scheduled_for = ? WHERE id = ? AND status = 'queued'",
+        (scheduled_for, queue_id),
+    )
+    moved = c.rowcount == 1
+    conn.commit()
+    conn.close()
+    return moved
+
+
+def distribution_requeue_stale(older_than_minutes: int = 30) -> int:
+    """
+    Return rows stuck in 'claimed' (the worker process died mid-post) to
+    'queued'. Only rows claimed longer ago than any post can take, so a live
+    worker's in-flight row is never handed to another. A stuck row that
+    already has a post_ref went live, so it is finished as 'posted' instead.
+    Returns rows requeued.
+    """
+    cutoff = (datetime.utcnow() - timedelta(minutes=older_than_minutes)).isoformat()
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute(
+        "UPDATE distribution_queue SET status = 'posted', posted_at = COALESCE(posted_at, ?) "
+        "WHERE status = 'claimed' AND claimed_at < ? AND post_ref IS NOT NULL",
+        (datetime.utcnow().isoformat(), cutoff),
+    )
+    c.execute(
+        "UPDATE distribution_queue SET status = 'queued', claimed_at = NULL "
+        "WHERE status = 'claimed' AND claimed_at < ? AND post_ref IS NULL",
+        (cutoff,),
     )
+    n = c.rowcount
     conn.commit()
     conn.close()
+    return n
 
 
 def distribution_cancel_item(user_id: int, queue_id: int) -> bool:
@@ -2846,6 +3790,178 @@ def distribution_global_pause_set(paused: bool) -> None:
     admin_setting_set("distribution_global_pause", "1" if paused else "0")
 
 
+# =====================================================================
+# NOTIFICATION OUTBOX - drained by notifications.py
+# Scheduler threads and request handlers enqueue; the dispatcher claims due
+# rows with the same atomic conditional UPDATE as distribution_claim_due.
+# =====================================================================
+
+def notification_enqueue(channel: str, recipient: str, payload: dict) -> int:
+    """Queue one email/SMS for immediate delivery. Returns the outbox id."""
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute(
+        "INSERT INTO notification_outbox (channel, recipient, payload, next_attempt_at) "
+        "VALUES (?, ?, ?, ?)",
+        (channel, recipient, json.dumps(payload or {}), datetime.utcnow().isoformat()),
+    )
+    new_id = c.lastrowid
+    conn.commit()
+    conn.close()
+    return new_id
+
+
+def notification_get_due(limit: int = 50) -> list:
+    """Queued outbox rows whose next_attempt_at has passed, oldest first."""
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute(
+        "SELECT * FROM notification_outbox WHERE status = 'queued' AND next_attempt_at <= ? "
+        "ORDER BY next_attempt_at ASC LIMIT ?",
+        (datetime.utcnow().isoformat(), limit),
+    )
+    rows = []
+    for r in c.fetchall():
+        d = dict(r)
+        try:
+            d["payload"] = json.loads(d.get("payload") or "{}")
+        except Exception:
+            d["payload"] = {}
+        rows.append(d)
+    conn.close()
+    return rows
+
+
+def notification_claim_many(outbox_ids: list) -> list:
+    """
+    Claim queued rows for sending ('queued' -> 'sending') with one UPDATE for
+    the whole fetch, tagged by a fresh claim_token. Returns the ids THIS caller
+    won (rows another process claimed first are left out).
+    """
+    if not outbox_ids:
+        return []
+    import uuid
+    token = uuid.uuid4().hex
+    marks = ",".join("?" * len(outbox_ids))
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute(
+        f"UPDATE notification_outbox SET status = 'sending', claimed_at = ?, claim_token = ? "
+        f"WHERE status = 'queued' AND id IN ({marks})",
+        [datetime.utcnow().isoformat(), token, *outbox_ids],
+    )
+    conn.commit()
+    c.execute("SELECT id FROM notification_outbox WHERE claim_token = ?", (token,))
+    won = [r["id"] for r in c.fetchall()]
+    conn.close()
+    return won
+
+
+def notification_mark_sent_many(outbox_ids: list) -> None:
+    if not outbox_ids:
+        return
+    marks = ",".join("?" * len(outbox_ids))
+    conn = get_conn()
+    conn.execute(
+        f"UPDATE notification_outbox SET status = 'sent', sent_at = ?, last_error = '' WHERE id IN ({marks})",
+        [datetime.utcnow().isoformat(), *outbox_ids],
+    )
+    conn.commit()
+    conn.close()
+
+
+def notification_batch_start(channel: str, template: str, outbox_ids: list) -> int:
+    """Open a notification_batches row for one provider request and tag its outbox rows."""
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute(
+        "INSERT INTO notification_batches (channel, template, size) VALUES (?, ?, ?)",
+        (channel, template, len(outbox_ids)),
+    )
+    batch_id = c.lastrowid
+    if outbox_ids:
+        marks = ",".join("?" * len(outbox_ids))
+        c.execute(f"UPDATE notification_outbox SET batch_id = ? WHERE id IN ({marks})",
+                  [batch_id, *outbox_ids])
+    conn.commit()
+    conn.close()
+    return batch_id
+
+
+def notification_batch_finish(batch_id: int, status: str, elapsed_ms: int, error: str = "") -> None:
+    conn = get_conn()
+    conn.execute(
+        "UPDATE notification_batches SET status = ?, error = ?, elapsed_ms = ?, finished_at = ? "
+        "WHERE id = ?",
+        (status, str(error or "")[:500], elapsed_ms, datetime.utcnow().isoformat(), batch_id),
+    )
+    conn.commit()
+    conn.close()
+
+
+def notification_batch_stats(hours: int = 24) -> dict:
+    """Delivery accounting for /admin/scheduler-stats: provider requests vs. messages carried."""
+    since = (datetime.utcnow() - timedelta(hours=hours)).strftime("%Y-%m-%d %H:%M:%S")
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute("""
+        SELECT channel, status, COUNT(*) AS requests, COALESCE(SUM(size), 0) AS messages,
+               MAX(size) AS largest, CAST(AVG(elapsed_ms) AS INTEGER) AS avg_ms
+        FROM notification_batches WHERE started_at >= ?
+        GROUP BY channel, status
+    """, (since,))
+    rows = [dict(r) for r in c.fetchall()]
+    c.execute("SELECT status, COUNT(*) AS n FROM notification_outbox GROUP BY status")
+    outbox = {r["status"]: r["n"] for r in c.fetchall()}
+    conn.close()
+    return {"window_hours": hours, "batches": rows, "outbox": outbox}
+
+
+def notification_mark_failed(outbox_id: int, error: str, give_up: bool = False,
+                             retry_at: str = None) -> None:
+    """Count a failed attempt: back to 'queued' at retry_at, or terminally 'failed'."""
+    conn = get_conn()
+    conn.execute(
+        "UPDATE notification_outbox SET status = ?, attempts = attempts + 1, claimed_at = NULL, "
+        "last_error = ?, next_attempt_at = COALESCE(?, next_attempt_at) WHERE id = ?",
+        ("failed" if give_up else "queued", str(error)[:500], retry_at, outbox_id),
+    )
+    conn.commit()
+    conn.close()
+
+
+def notification_requeue_stale(older_than_minutes: int = 10) -> int:
+    """Return rows stuck in 'sending' (dispatcher died mid-send) to 'queued'."""
+    cutoff = (datetime.utcnow() - timedelta(minutes=older_than_minutes)).isoformat()
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute(
+        "UPDATE notification_outbox SET status = 'queued', claimed_at = NULL "
+        "WHERE status = 'sending' AND claimed_at < ?",
+        (cutoff,),
+    )
+    n = c.rowcount
+    conn.commit()
+    conn.close()
+    return n
+
+
+def notification_prune(keep_days: int = 30) -> int:
+    """Delete sent/failed outbox rows older than keep_days."""
+    cutoff = (datetime.utcnow() - timedelta(days=keep_days)).strftime("%Y-%m-%d %H:%M:%S")
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute(
+        "DELETE FROM notification_outbox WHERE status IN ('sent','failed') AND created_at < ?",
+        (cutoff,),
+    )
+    n = c.rowcount
+    c.execute("DELETE FROM notification_batches WHERE started_at < ?", (cutoff,))
+    conn.commit()
+    conn.close()
+    return n
+
+
 # =====================================================================
 # BATCH-NOTIFY STATE - The Scheduler (Stage B)
 # Scheduling state for the ONE consolidated "ready for your review" notification
@@ -3030,7 +4146,6 @@ def create_approval_token(user_id: int, library_item_id: int, action: str = "app
     """
     import secrets as _sec
     from datetime import datetime as _dt, timedelta as _td
-    migrate_approval_tokens()
     # 12 bytes = 16-char URL-safe token = 96 bits entropy
     # Sufficient for a 7-day one-time token. Keeps SMS URLs under 160 chars (1 segment).
     token      = _sec.token_urlsafe(12)
@@ -3056,7 +4171,6 @@ def validate_approval_token(token: str) -> Optional[dict]:
     Returns None if token is invalid, expired, or already used.
     """
     from datetime import datetime as _dt
-    migrate_approval_tokens()
     conn = get_conn()
     c    = conn.cursor()
     c.execute("""
@@ -3082,7 +4196,6 @@ def validate_approval_token(token: str) -> Optional[dict]:
 
 def consume_approval_token(token: str):
     """Mark a token as used so it cannot be replayed."""
-    migrate_approval_tokens()
     conn = get_conn()
     conn.execute("UPDATE approval_tokens SET used=1 WHERE token=?", (token,))
     conn.commit()
@@ -3095,7 +4208,6 @@ def lookup_approval_token_record(token: str) -> Optional[dict]:
     Used by the resend flow to recover item_id and user_id from an expired token.
     Returns None only if the token string doesn't exist at all (i.e. was forged).
     """
-    migrate_approval_tokens()
     conn = get_conn()
     c    = conn.cursor()
     c.execute("""
@@ -3348,7 +4460,7 @@ def generate_compliance_pdf(
     total = len(rows)
     passing = review_count = fail_count = 0
     for r in rows:
-        v = _compliance_verdict(r["compliance"])
+        v = r["verdict"] or "pending"
         if v == "pass":   passing += 1
         elif v == "warn": review_count += 1
         else:             fail_count += 1
@@ -3465,7 +4577,7 @@ def generate_compliance_pdf(
                 return ""
 
         for r in rows:
-            verdict = _compliance_verdict(r["compliance"])
+            verdict = r["verdict"] or "pending"
             if verdict == "pass":
                 status_style = styles["cell_pass"]
                 status_label = "Reviewed"
@@ -3549,154 +4661,107 @@ def generate_compliance_pdf(
 # ─────────────────────────────────────────────
 # BROKER OFFICE STATS
 # ─────────────────────────────────────────────
-def get_broker_office_stats(broker_id: int) -> list:
+def _roster_stats(scope_col: str, scope_id: int) -> list:
     """
-    Returns per-agent stats for every active agent linked to this broker.
-    Used by the broker dashboard overview table.
-    Fields returned match what renderBrokerOffice() expects in app.js.
+    Per-agent dashboard rows for every active agent whose users.{scope_col}
+    matches — one grouped query regardless of roster size. Content counts and
+    the pass count come from a content_library aggregate (verdict column),
+    setup_json rides along for the identity score, and the schedule flag is
+    an indexed EXISTS.
     """
-    import json
-    from datetime import datetime, timedelta
+    assert scope_col in ("broker_id", "team_id")
     conn = get_conn()
     c    = conn.cursor()
-    c.execute("""
-        SELECT id, email, agent_name, brokerage, created_at
-        FROM users WHERE broker_id=? AND role='agent' AND is_active=1
-        ORDER BY agent_name ASC
-    """, (broker_id,))
-    agents = c.fetchall()
+    c.execute(f"""
+        SELECT u.id, u.email, u.agent_name, u.brokerage, u.created_at,
+               COALESCE(cl.total, 0)     AS total,
+               COALESCE(cl.approved, 0)  AS approved,
+               COALESCE(cl.published, 0) AS published,
+               COALESCE(cl.pending, 0)   AS pending,
+               COALESCE(cl.passing, 0)   AS passing,
+               cl.last_activity,
+               s.setup_json,
+               EXISTS (SELECT 1 FROM schedules sc
+                       WHERE sc.user_id = u.id AND sc.active = 1) AS has_schedule
+        FROM users u
+        LEFT JOIN (
+            SELECT user_id,
+                   COUNT(*) AS total,
+                   SUM(CASE WHEN status='approved'  THEN 1 ELSE 0 END) AS approved,
+                   SUM(CASE WHEN status='published' THEN 1 ELSE 0 END) AS published,
+                   SUM(CASE WHEN status='pending'   THEN 1 ELSE 0 END) AS pending,
+                   SUM(CASE WHEN status IN ('approved','published') AND verdict='pass'
+                            THEN 1 ELSE 0 END) AS passing,
+                   MAX(COALESCE(approved_at, saved_at)) AS last_activity
+            FROM content_library
+            WHERE user_id IN (SELECT id FROM users
+                              WHERE {scope_col}=? AND role='agent' AND is_active=1)
+            GROUP BY user_id
+        ) cl ON cl.user_id = u.id
+        LEFT JOIN agent_setup s ON s.user_id = u.id
+        WHERE u.{scope_col}=? AND u.role='agent' AND u.is_active=1
+        ORDER BY u.agent_name ASC
+    """, (scope_id, scope_id))
+    rows = c.fetchall()
+    conn.close()
+
     results = []
     now = datetime.utcnow()
-
-    for agent in agents:
-        uid = agent["id"]
-
-        # Content counts + last activity
-        c.execute("""
-            SELECT COUNT(*) as total,
-                   SUM(CASE WHEN status='approved'  THEN 1 ELSE 0 END) as approved,
-                   SUM(CASE WHEN status='published' THEN 1 ELSE 0 END) as published,
-                   SUM(CASE WHEN status='pending'   THEN 1 ELSE 0 END) as pending,
-                   MAX(COALESCE(approved_at, saved_at)) as last_activity
-            FROM content_library WHERE user_id=?
-        """, (uid,))
-        stats = c.fetchone()
-
-        # Compliance rate
-        c.execute("SELECT compliance FROM content_library WHERE user_id=? AND status IN ('approved','published')", (uid,))
-        passing = sum(1 for cr in c.fetchall() if _compliance_verdict(cr["compliance"]) == "pass")
-        total_reviewed  = (stats["approved"] or 0) + (stats["published"] or 0)
-        compliance_rate = round((passing / total_reviewed) * 100) if total_reviewed > 0 else None
+    for r in rows:
+        total_reviewed  = r["approved"] + r["published"]
+        compliance_rate = round((r["passing"] / total_reviewed) * 100) if total_reviewed > 0 else None
 
         # Lightweight identity score (broker/team dashboards only — internal use)
-        published_count = stats["published"] or 0
-        identity_score  = _calc_lightweight_identity(c, uid, compliance_rate, published_count)
-
-        # Active schedule
-        c.execute("SELECT COUNT(*) as cnt FROM schedules WHERE user_id=? AND active=1", (uid,))
-        sched = c.fetchone()
-        has_schedule = (sched["cnt"] > 0) if sched else False
+        identity_score = _calc_lightweight_identity(r["setup_json"], compliance_rate, r["published"])
 
         # Activity status — derived from last_activity timestamp
-        last_act = stats["last_activity"]
-        if not last_act or stats["total"] == 0:
+        last_act = r["last_activity"]
+        if not last_act or r["total"] == 0:
             activity_status = "new"
         else:
             try:
-                last_dt = datetime.fromisoformat(str(last_act)[:19])
-                days_ago = (now - last_dt).days
-                if days_ago <= 7:    activity_status = "active"
-                elif days_ago <= 30: activity_status = "active"
-                else:                activity_status = "inactive"
+                days_ago = (now - datetime.fromisoformat(str(last_act)[:19])).days
+                activity_status = "active" if days_ago <= 30 else "inactive"
             except Exception:
                 activity_status = "active"
 
         results.append({
             # "name" alias — fixes frontend a.name reference in renderBrokerOffice
-            "id":             uid,
-            "name":           agent["agent_name"],
-            "agent_name":     agent["agent_name"],
-            "email":          agent["email"],
-            "brokerage":      agent["brokerage"] or "",
-            "joined":         agent["created_at"],
-            "total_content":  stats["total"] or 0,
-            "pending":        stats["pending"] or 0,
-            "approved":       stats["approved"] or 0,
-            "published":      stats["published"] or 0,
+            "id":             r["id"],
+            "name":           r["agent_name"],
+            "agent_name":     r["agent_name"],
+            "email":          r["email"],
+            "brokerage":      r["brokerage"] or "",
+            "joined":         r["created_at"],
+            "total_content":  r["total"],
+            "pending":        r["pending"],
+            "approved":       r["approved"],
+            "published":      r["published"],
             "compliance_rate": compliance_rate,
             "score":          identity_score,
-            "has_schedule":   has_schedule,
+            "has_schedule":   bool(r["has_schedule"]),
             "last_activity":  last_act,
             "status":         activity_status,
         })
-
-    conn.close()
     return results
 
 
+def get_broker_office_stats(broker_id: int) -> list:
+    """
+    Returns per-agent stats for every active agent linked to this broker.
+    Used by the broker dashboard overview table.
+    Fields returned match what renderBrokerOffice() expects in app.js.
+    """
+    return _roster_stats("broker_id", broker_id)
+
+
 def get_team_stats(team_id: int) -> list:
     """
     Returns per-agent stats for every active agent linked to this team.
     Mirrors get_broker_office_stats but queries by team_id.
     Used by the team dashboard (same broker-panel UI).
     """
-    import json
-    from datetime import datetime, timedelta
-    conn = get_conn()
-    c    = conn.cursor()
-    c.execute("""
-        SELECT id, email, agent_name, brokerage, created_at
-        FROM users WHERE team_id=? AND role='agent' AND is_active=1
-        ORDER BY agent_name ASC
-    """, (team_id,))
-    agents = c.fetchall()
-    results = []
-    now = datetime.utcnow()
-
-    for agent in agents:
-        uid = agent["id"]
-        c.execute("""
-            SELECT COUNT(*) as total,
-                   SUM(CASE WHEN status='approved'  THEN 1 ELSE 0 END) as approved,
-                   SUM(CASE WHEN status='published' THEN 1 ELSE 0 END) as published,
-                   SUM(CASE WHEN status='pending'   THEN 1 ELSE 0 END) as pending,
-                   MAX(COALESCE(approved_at, saved_at)) as last_activity
-            FROM content_library WHERE user_id=?
-        """, (uid,))
-        stats = c.fetchone()
-
-        c.execute("SELECT compliance FROM content_library WHERE user_id=? AND status IN ('approved','published')", (uid,))
-        passing = sum(1 for cr in c.fetchall() if _compliance_verdict(cr["compliance"]) == "pass")
-        total_reviewed  = (stats["approved"] or 0) + (stats["published"] or 0)
-        compliance_rate = round((passing / total_reviewed) * 100) if total_reviewed > 0 else None
-
-        # Lightweight identity score (broker/team dashboards only — internal use)
-        published_count = stats["published"] or 0
-        identity_score  = _calc_lightweight_identity(c, uid, compliance_rate, published_count)
-
-        c.execute("SELECT COUNT(*) as cnt FROM schedules WHERE user_id=? AND active=1", (uid,))
-        sched = c.fetchone()
-        last_act = stats["last_activity"]
-        if not last_act or stats["total"] == 0:
-            activity_status = "new"
-        else:
-            try:
-                days_ago = (now - datetime.fromisoformat(str(last_act)[:19])).days
-                activity_status = "active" if days_ago <= 30 else "inactive"
-            except Exception:
-                activity_status = "active"
-
-        results.append({
-            "id": uid, "name": agent["agent_name"], "agent_name": agent["agent_name"],
-            "email": agent["email"], "brokerage": agent["brokerage"] or "",
-            "joined": agent["created_at"], "total_content": stats["total"] or 0,
-            "pending": stats["pending"] or 0, "approved": stats["approved"] or 0,
-            "published": stats["published"] or 0, "compliance_rate": compliance_rate,
-            "score": identity_score, "has_schedule": (sched["cnt"]>0) if sched else False,
-            "last_activity": last_act, "status": activity_status,
-        })
-    conn.close()
-    return results
+    return _roster_stats("team_id", team_id)
 
 
 def get_broker_agent_content(broker_id: int, agent_id: int, limit: int = 20) -> list:
@@ -3718,7 +4783,7 @@ def get_broker_agent_content(broker_id: int, agent_id: int, limit: int = 20) ->
         return []
 
     c.execute("""
-        SELECT id, niche, status, content, compliance,
+        SELECT id, niche, status, content, verdict,
                copied_platforms, saved_at, approved_at, published_at, cir_id
         FROM content_library
         WHERE user_id=?
@@ -3736,8 +4801,8 @@ def get_broker_agent_content(broker_id: int, agent_id: int, limit: int = 20) ->
         except Exception:
             cd = {}
 
-        # Use _compliance_verdict for consistent parsing
-        verdict = _compliance_verdict(r["compliance"])
+        # Stored _compliance_verdict() result (content_library.verdict)
+        verdict = r["verdict"] or "pending"
         if verdict == "pass":   comp_label = "pass"
         elif verdict == "warn": comp_label = "review"
         elif verdict == "fail": comp_label = "attention"
@@ -3817,28 +4882,9 @@ def cancel_subscription(user_id: int):
 # ─────────────────────────────────────────────
 # PASSWORD RESET
 # ─────────────────────────────────────────────
-def init_reset_tokens_table():
-    """
-    Legacy compatibility wrapper. password_reset_tokens is now created in init_db().
-    Safe to call — CREATE TABLE IF NOT EXISTS is idempotent.
-    """
-    conn = get_conn()
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS password_reset_tokens (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            token TEXT UNIQUE NOT NULL,
-            expires_at TEXT NOT NULL,
-            used INTEGER DEFAULT 0,
-            created_at TEXT DEFAULT (datetime('now'))
-        )
-    """)
-    conn.commit(); conn.close()
-
 def create_reset_token(user_id: int) -> str:
     import secrets
     from datetime import datetime, timedelta
-    init_reset_tokens_table()
     conn = get_conn()
     conn.execute("UPDATE password_reset_tokens SET used=1 WHERE user_id=? AND used=0", (user_id,))
     token      = secrets.token_urlsafe(32)
@@ -3849,7 +4895,6 @@ def create_reset_token(user_id: int) -> str:
 
 def validate_reset_token(token: str) -> Optional[dict]:
     from datetime import datetime
-    init_reset_tokens_table()
     conn = get_conn()
     c    = conn.cursor()
     c.execute("""
@@ -3867,7 +4912,6 @@ def validate_reset_token(token: str) -> Optional[dict]:
     return dict(row)
 
 def consume_reset_token(token: str):
-    init_reset_tokens_table()
     conn = get_conn()
     conn.execute("UPDATE password_reset_tokens SET used=1 WHERE token=?", (token,))
     conn.commit(); conn.close()
@@ -4005,6 +5049,44 @@ def signals_purge_expired():
     conn.close()
 
 
+def rss_cache_get(feed_url: str):
+    """Return {'payload_json', 'fetched_at', 'etag', 'last_modified'} for a cached feed, or None."""
+    conn = get_conn()
+    c    = conn.cursor()
+    c.execute("""
+        SELECT payload_json, fetched_at, etag, last_modified
+        FROM rss_feed_cache WHERE feed_url = ?
+    """, (feed_url,))
+    row = c.fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+
+def rss_cache_put(feed_url: str, payload_json: str, fetched_at: str,
+                  etag: str = None, last_modified: str = None):
+    """Upsert the last good payload (and its HTTP validators) for a feed URL."""
+    conn = get_conn()
+    conn.execute("""
+        INSERT INTO rss_feed_cache (feed_url, payload_json, fetched_at, etag, last_modified)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(feed_url) DO UPDATE SET
+            payload_json  = excluded.payload_json,
+            fetched_at    = excluded.fetched_at,
+            etag          = excluded.etag,
+            last_modified = excluded.last_modified
+    """, (feed_url, payload_json, fetched_at, etag, last_modified))
+    conn.commit()
+    conn.close()
+
+
+def rss_cache_purge(older_than: str):
+    """Drop cached feeds fetched before the given ISO timestamp."""
+    conn = get_conn()
+    conn.execute("DELETE FROM rss_feed_cache WHERE fetched_at < ?", (older_than,))
+    conn.commit()
+    conn.close()
+
+
 # ─────────────────────────────────────────────
 # USAGE LIMITS
 # ─────────────────────────────────────────────
@@ -0,0 +1,294 @@
+"""
+distribution_worker.py — HomeBridge distribution drip worker
+
+Drains distribution_queue (filled by database.distribution_enqueue): every
+DISTRIBUTION_POLL_SECONDS it
+  1. Stops if the super-admin global pause is set
+  2. Returns rows orphaned in 'claimed' by a dead worker to 'queued' (rows
+     that already carry a post_ref went live and are finished as 'posted')
+  3. For each platform, fetches due rows for members who are not paused and
+     claims as many as that platform has free slots. Rate-limit tokens are
+     spent only after the claim is won
+  4. Posts the claimed rows concurrently on this thread's own event loop via
+     social.publish_queued_item
+  5. Records the platform's post ref, then marks the row posted (retried
+     until it sticks), or marks it failed with exponential backoff on attempts
+
+A platform is throttled on three levels. A per-platform semaphore
+(DISTRIBUTION_PLATFORM_CONCURRENCY) means a slow platform only holds its own
+slots. A shared per-platform hourly rate and a per-connection (member +
+platform) hourly rate are enforced through rate_limit.py. A platform answering
+HTTP 429 is cooled off for DISTRIBUTION_429_COOLDOWN_SECS.
+
+Every uvicorn worker runs this loop. distribution_claim_due is the cross-
+process guard, so a row is posted exactly once.
+"""
+
+import os
+import time
+import random
+import asyncio
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+DISTRIBUTION_ENABLED              = os.getenv("DISTRIBUTION_ENABLED", "true").lower() == "true"
+DISTRIBUTION_POLL_SECONDS         = float(os.getenv("DISTRIBUTION_POLL_SECONDS", "30"))
+DISTRIBUTION_CONCURRENCY          = int(os.getenv("DISTRIBUTION_CONCURRENCY", "20"))          # posts in flight, all platforms
+DISTRIBUTION_PLATFORM_CONCURRENCY = int(os.getenv("DISTRIBUTION_PLATFORM_CONCURRENCY", "5"))  # posts in flight per platform
+DISTRIBUTION_POST_TIMEOUT_SECS    = float(os.getenv("DISTRIBUTION_POST_TIMEOUT_SECS", "120"))
+DISTRIBUTION_MAX_ATTEMPTS         = int(os.getenv("DISTRIBUTION_MAX_ATTEMPTS", "6"))
+DISTRIBUTION_BACKOFF_BASE_SECS    = int(os.getenv("DISTRIBUTION_BACKOFF_BASE_SECS", "60"))
+DISTRIBUTION_BACKOFF_MAX_SECS     = int(os.getenv("DISTRIBUTION_BACKOFF_MAX_SECS", "21600"))   # 6h
+DISTRIBUTION_PLATFORM_PER_HOUR    = int(os.getenv("DISTRIBUTION_PLATFORM_PER_HOUR", "1200"))   # override: DISTRIBUTION_<PLATFORM>_PER_HOUR
+DISTRIBUTION_CONNECTION_PER_HOUR  = int(os.getenv("DISTRIBUTION_CONNECTION_PER_HOUR", "6"))
+DISTRIBUTION_429_COOLDOWN_SECS    = int(os.getenv("DISTRIBUTION_429_COOLDOWN_SECS", "300"))
+DISTRIBUTION_STALE_CLAIM_MINUTES  = int(os.getenv("DISTRIBUTION_STALE_CLAIM_MINUTES", "30"))
+DISTRIBUTION_MARK_RETRIES         = int(os.getenv("DISTRIBUTION_MARK_RETRIES", "3"))
+
+_worker_started    = False
+_worker_start_lock = threading.Lock()
+
+# Read by /admin/scheduler-stats.
+_drip_metrics: dict = {
+    "posted": 0, "failed": 0, "retried": 0, "deferred": 0, "throttled": 0,
+    "in_flight": 0, "last_tick": None,
+}
+_drip_metrics_lock = threading.Lock()
+
+# Rows that went live but couldn't be marked posted yet: queue id -> post_ref.
+# Retried every tick; only touched from the drip loop's thread.
+_unmarked_posts: dict = {}
+
+
+def _count(key: str, n: int = 1) -> None:
+    with _drip_metrics_lock:
+        _drip_metrics[key] += n
+
+
+def drip_metrics() -> dict:
+    with _drip_metrics_lock:
+        return dict(_drip_metrics)
+
+
+def _utc_in(seconds: float) -> str:
+    return (datetime.utcnow() + timedelta(seconds=seconds)).isoformat()
+
+
+def _backoff_seconds(attempts: int) -> float:
+    """Exponential backoff on the row's prior attempts, with jitter so retries spread out."""
+    delay = min(DISTRIBUTION_BACKOFF_MAX_SECS, DISTRIBUTION_BACKOFF_BASE_SECS * (2 ** attempts))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def _platforms() -> list:
+    from social import PLATFORMS
+    return list(PLATFORMS)
+
+
+# ── Rate limits ───────────────────────────────────────────────────────────────
+
+_platform_limiters: dict = {}
+_connection_limiter = None
+
+
+def _platform_limiter(platform: str):
+    from rate_limit import TokenBucketLimiter
+    if platform not in _platform_limiters:
+        per_hour = int(os.getenv(f"DISTRIBUTION_{platform.upper()}_PER_HOUR", DISTRIBUTION_PLATFORM_PER_HOUR))
+        _platform_limiters[platform] = TokenBucketLimiter(
+            f"distribution:{platform}", rate=per_hour / 3600.0, burst=max(1, per_hour // 60),
+            backend="sqlite",   # one budget across workers; this thread isn't the event loop
+        )
+    return _platform_limiters[platform]
+
+
+def _connection_allows(user_id: int, platform: str) -> bool:
+    global _connection_limiter
+    from rate_limit import SlidingWindowLimiter
+    if _connection_limiter is None:
+        _connection_limiter = SlidingWindowLimiter(
+            "distribution:connection", limit=DISTRIBUTION_CONNECTION_PER_HOUR, window=3600,
+            backend="sqlite",
+        )
+    return _connection_limiter.allow(f"{user_id}:{platform}")
+
+
+# ── Posting ───────────────────────────────────────────────────────────────────
+
+def _finish_posted(qid: int, post_ref: str) -> None:
+    """Record the post ref, then clear the claim. Raises if either write fails."""
+    from database import distribution_record_post, distribution_mark_posted
+    distribution_record_post(qid, post_ref)
+    distribution_mark_posted(qid)
+
+
+async def _finish_posted_with_retry(qid: int, post_ref: str) -> bool:
+    for attempt in range(DISTRIBUTION_MARK_RETRIES):
+        try:
+            _finish_posted(qid, post_ref)
+            return True
+        except Exception as e:
+            error = e
+            await asyncio.sleep(2 ** attempt)
+    print(f"[Distribution] #{qid} posted but could not be marked posted (will keep retrying): {error}")
+    return False
+
+
+def _retry_unmarked() -> None:
+    for qid, post_ref in list(_unmarked_posts.items()):
+        try:
+            _finish_posted(qid, post_ref)
+            del _unmarked_posts[qid]
+        except Exception:
+            pass
+
+
+async def _post_one(row: dict, global_slots: asyncio.Semaphore, platform_slots: asyncio.Semaphore,
+                    cooldown_until: dict) -> None:
+    from fastapi import HTTPException
+    from social import publish_queued_item
+    from database import distribution_mark_failed
+
+    qid, platform = row["id"], row["platform"]
+    # Platform slot first: a row waiting on a slow platform must not sit on a
+    # global slot that another platform's post could be using.
+    async with platform_slots, global_slots:
+        result = None
+        try:
+            result = await asyncio.wait_for(publish_queued_item(row), DISTRIBUTION_POST_TIMEOUT_SECS)
+        except HTTPException as e:
+            error     = str(e.detail)
+            permanent = 400 <= e.status_code < 500
+            if " 429" in error:
+                cooldown_until[platform] = time.time() + DISTRIBUTION_429_COOLDOWN_SECS
+                print(f"[Distribution] {platform} rate limited us — pausing it for "
+                      f"{DISTRIBUTION_429_COOLDOWN_SECS}s")
+        except asyncio.TimeoutError:
+            error, permanent = f"timed out after {DISTRIBUTION_POST_TIMEOUT_SECS:.0f}s", False
+        except Exception as e:
+            error, permanent = str(e) or e.__class__.__name__, False
+
+    if result is not None:
+        # The post is live — never let a bookkeeping error turn it into a retry.
+        post_ref = str(result.get("id") or result.get("url") or "posted")
+        if not await _finish_posted_with_retry(qid, post_ref):
+            _unmarked_posts[qid] = post_ref
+        _count("posted")
+        print(f"[Distribution] ✓ #{qid} {platform} user {row['userId']} "
+              f"→ {result.get('action', 'posted')}")
+        return
+
+    attempts = row.get("attempts") or 0
+    give_up  = permanent or attempts + 1 >= DISTRIBUTION_MAX_ATTEMPTS
+    try:
+        distribution_mark_failed(qid, error, give_up=give_up,
+                                 retry_at=None if give_up else _utc_in(_backoff_seconds(attempts)))
+    except Exception as e:
+        print(f"[Distribution] ✗ #{qid} could not record failure (stale-claim sweep will requeue): {e}")
+    _count("failed" if give_up else "retried")
+    print(f"[Distribution] ✗ #{qid} {platform} user {row['userId']} attempt {attempts + 1}"
+          f"{' — giving up' if give_up else ' — will retry'}: {error[:200]}")
+
+
+def _admit(row: dict, platform: str) -> str:
+    """
+    Claim a due row and spend its rate-limit tokens. Returns "claimed" (post
+    it), "lost" (another worker won it), "deferred" (member at the hourly cap)
+    or "throttled" (platform budget spent). The claim comes first, so only
+    the worker that will post the row spends the member's or platform's budget.
+    """
+    from database import distribution_claim_due, distribution_release_claim, distribution_defer
+
+    if not distribution_claim_due(row["id"]):
+        return "lost"
+    if not _connection_allows(row["userId"], platform):
+        # This member's account is at its hourly cap: push the row back so it
+        # doesn't hold a slot at the head of the queue.
+        distribution_release_claim(row["id"])
+        distribution_defer(row["id"], _utc_in(3600 / max(1, DISTRIBUTION_CONNECTION_PER_HOUR)))
+        _count("deferred")
+        return "deferred"
+    if not _platform_limiter(platform).allow(platform):
+        distribution_release_claim(row["id"])
+        _count("throttled")
+        return "throttled"
+    return "claimed"
+
+
+async def _drip_loop() -> None:
+    from database import distribution_global_pause_get, distribution_get_due, distribution_requeue_stale
+
+    global_slots   = asyncio.Semaphore(DISTRIBUTION_CONCURRENCY)
+    platform_slots = defaultdict(lambda: asyncio.Semaphore(DISTRIBUTION_PLATFORM_CONCURRENCY))
+    pending        = defaultdict(int)     # claimed-but-unfinished per platform (this process)
+    cooldown_until = {}                   # platform -> epoch seconds
+    tasks          = set()
+    stale_swept_at = 0.0
+
+    def _done(task, platform):
+        tasks.discard(task)
+        pending[platform] -= 1
+        _count("in_flight", -1)
+
+    while True:
+        busy = False
+        try:
+            _retry_unmarked()
+            if distribution_global_pause_get():
+                await asyncio.sleep(DISTRIBUTION_POLL_SECONDS)
+                continue
+            now = time.time()
+            if now - stale_swept_at > 600:
+                stale_swept_at = now
+                n = distribution_requeue_stale(DISTRIBUTION_STALE_CLAIM_MINUTES)
+                if n:
+                    print(f"[Distribution] Requeued {n} row(s) orphaned in 'claimed'.")
+
+            for platform in _platforms():
+                if cooldown_until.get(platform, 0) > now:
+                    continue
+                # Claim at most two rounds of slots ahead so a slow platform's
+                # backlog stays in the queue (visible, cancelable) not in memory.
+                free = 2 * DISTRIBUTION_PLATFORM_CONCURRENCY - pending[platform]
+                if free <= 0:
+                    continue
+                rows = distribution_get_due(limit=free, platform=platform, skip_paused=True)
+                for row in rows:
+                    admitted = _admit(row, platform)
+                    if admitted == "throttled":
+                        break   # platform budget spent — the rest wait for next tick
+                    if admitted != "claimed":
+                        continue
+                    pending[platform] += 1
+                    _count("in_flight")
+                    task = asyncio.create_task(
+                        _post_one(row, global_slots, platform_slots[platform], cooldown_until)
+                    )
+                    tasks.add(task)
+                    task.add_done_callback(lambda t, p=platform: _done(t, p))
+                if len(rows) == free:
+                    busy = True
+            with _drip_metrics_lock:
+                _drip_metrics["last_tick"] = datetime.utcnow().isoformat()
+        except Exception as e:
+            print(f"[Distribution] Error in drip loop: {e}")
+        # A full batch means more is due right now — come back quickly.
+        await asyncio.sleep(2 if busy else DISTRIBUTION_POLL_SECONDS)
+
+
+def distribution_worker():
+    global _worker_started
+    with _worker_start_lock:
+        if _worker_started:
+            print("[Distribution] Worker already running in this process -- second thread exiting.")
+            return
+        _worker_started = True
+    print("[Distribution] Drip worker started.")
+    asyncio.run(_drip_loop())
+
+
+def start_distribution_worker():
+    """Start the drip worker on its own daemon thread (own event loop). Called from app startup."""
+    t = threading.Thread(target=distribution_worker, daemon=True, name="distribution-drip")
+    t.start()
@@ -0,0 +1,207 @@
+"""
+http_clients.py — HomeBridge shared outbound HTTP clients
+
+Every integration call used to build its own httpx.AsyncClient, and a few
+(`await httpx.AsyncClient().post(...)`) never closed it. Each request paid a
+fresh DNS + TCP + TLS handshake, and the unclosed clients leaked sockets. For
+HeyGen and LinkedIn, that connection setup was most of the latency.
+
+This module keeps one long-lived client per upstream (UPSTREAMS below). Each
+client has its own keep-alive pool, connection limits and default timeout.
+HTTP/2 is used when the optional `h2` package is installed (pip install
+"httpx[http2]"), and HTTP/1.1 keep-alive otherwise.
+
+An httpx.AsyncClient belongs to the event loop it was first used on. The
+uvicorn loop, the distribution drip worker and the notification dispatcher
+each run their own loop, so the registry is keyed by (loop, upstream).
+
+Usage — a drop-in for the old per-call client:
+
+    async with upstream_client("heygen", timeout=30.0) as client:
+        resp = await client.post(...)
+
+Leaving the block does not close the pooled client. It is closed on app
+shutdown (close_all). pool_stats() backs /admin/http-stats.
+"""
+
+import os
+import time
+import asyncio
+import threading
+import weakref
+from contextlib import asynccontextmanager
+
+import httpx
+
+try:
+    import h2  # noqa: F401  (httpx only needs it importable)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+HTTP_CLIENT_HTTP2     = os.getenv("HTTP_CLIENT_HTTP2", "true").lower() == "true"
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+
+# upstream -> (default timeout secs, max connections, max keep-alive connections)
+# Override any field per upstream: HTTP_<UPSTREAM>_TIMEOUT / _MAX_CONNECTIONS / _MAX_KEEPALIVE
+UPSTREAMS: dict = {
+    "heygen":   (30.0,  20, 10),
+    "lmnt":     (60.0,  10,  5),
+    "linkedin": (30.0,  20, 10),
+    "facebook": (30.0,  20, 10),
+    "google":   (30.0,  20, 10),
+    "sendgrid": (15.0,  10,  5),
+    "twilio":   (15.0,  10,  5),
+    "openai":   (120.0, 10,  5),
+    "default":  (30.0,  20, 10),
+}
+
+
+def _upstream_config(name: str) -> tuple:
+    timeout, max_conn, max_keepalive = UPSTREAMS[name]
+    prefix = f"HTTP_{name.upper()}_"
+    return (
+        float(os.getenv(prefix + "TIMEOUT", timeout)),
+        int(os.getenv(prefix + "MAX_CONNECTIONS", max_conn)),
+        int(os.getenv(prefix + "MAX_KEEPALIVE", max_keepalive)),
+    )
+
+
+# ── Registry ──────────────────────────────────────────────────────────────────
+
+_clients_lock = threading.Lock()
+_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()   # loop -> {upstream: AsyncClient}
+
+_metrics_lock = threading.Lock()
+_metrics: dict = {}   # upstream -> counters, summed across loops
+
+
+def _metric(name: str) -> dict:
+    m = _metrics.get(name)
+    if m is None:
+        m = _metrics[name] = {
+            "requests": 0, "errors": 0, "in_flight": 0, "peak_in_flight": 0,
+            "total_ms": 0, "clients_opened": 0,
+        }
+    return m
+
+
+def get_client(name: str) -> httpx.AsyncClient:
+    """The pooled client for `name` on the running event loop, created on first use."""
+    if name not in UPSTREAMS:
+        raise ValueError(f"Unknown upstream {name!r}")
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        per_loop = _clients.setdefault(loop, {})
+        client   = per_loop.get(name)
+        if client is None or client.is_closed:
+            timeout, max_conn, max_keepalive = _upstream_config(name)
+            client = httpx.AsyncClient(
+                timeout=timeout,
+                limits=httpx.Limits(
+                    max_connections=max_conn,
+                    max_keepalive_connections=max_keepalive,
+                    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+                ),
+                http2=HTTP2_AVAILABLE and HTTP_CLIENT_HTTP2,
+            )
+            per_loop[name] = client
+            with _metrics_lock:
+                _metric(name)["clients_opened"] += 1
+        return client
+
+
+class _ScopedClient:
+    """Request methods over a shared client. Applies the caller's timeout to each
+    call and records usage metrics. Closing it is a no-op; the pool outlives it."""
+
+    def __init__(self, name: str, client: httpx.AsyncClient, timeout):
+        self._name    = name
+        self._client  = client
+        self._timeout = timeout
+
+    async def request(self, method: str, url, **kwargs) -> httpx.Response:
+        if self._timeout is not None:
+            kwargs.setdefault("timeout", self._timeout)
+        with _metrics_lock:
+            m = _metric(self._name)
+            m["requests"]  += 1
+            m["in_flight"] += 1
+            m["peak_in_flight"] = max(m["peak_in_flight"], m["in_flight"])
+        t0 = time.monotonic()
+        try:
+            return await self._client.request(method, url, **kwargs)
+        except Exception:
+            with _metrics_lock:
+                _metrics[self._name]["errors"] += 1
+            raise
+        finally:
+            with _metrics_lock:
+                m = _metrics[self._name]
+                m["in_flight"] -= 1
+                m["total_ms"]  += int((time.monotonic() - t0) * 1000)
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    async def put(self, url, **kwargs):
+        return await self.request("PUT", url, **kwargs)
+
+    async def patch(self, url, **kwargs):
+        return await self.request("PATCH", url, **kwargs)
+
+    async def delete(self, url, **kwargs):
+        return await self.request("DELETE", url, **kwargs)
+
+
+@asynccontextmanager
+async def upstream_client(name: str, timeout: float = None):
+    """`async with upstream_client("linkedin", timeout=30) as client:` — pooled, not closed on exit."""
+    yield _ScopedClient(name, get_client(name), timeout)
+
+
+async def close_all() -> None:
+    """Close the running loop's clients; ask other live loops to close theirs. Called on app shutdown."""
+    current = asyncio.get_running_loop()
+    with _clients_lock:
+        owned = [(loop, dict(per_loop)) for loop, per_loop in _clients.items()]
+        _clients.clear()
+    for loop, per_loop in owned:
+        for client in per_loop.values():
+            if loop is current:
+                await client.aclose()
+            elif loop.is_running():
+                asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+
+
+# ── Metrics ───────────────────────────────────────────────────────────────────
+
+def _pool_usage(client: httpx.AsyncClient) -> tuple:
+    """(open connections, idle connections) — reads httpcore internals, best effort."""
+    try:
+        conns = list(client._transport._pool.connections)
+        return len(conns), sum(1 for c in conns if c.is_idle())
+    except Exception:
+        return 0, 0
+
+
+def pool_stats() -> dict:
+    """Per-upstream request counters plus current pool occupancy across all loops."""
+    with _clients_lock:
+        clients = [(name, client) for per_loop in _clients.values() for name, client in per_loop.items()]
+    with _metrics_lock:
+        out = {name: dict(m) for name, m in _metrics.items()}
+    for name, client in clients:
+        s = out.setdefault(name, {})
+        open_, idle = _pool_usage(client)
+        s["open_connections"] = s.get("open_connections", 0) + open_
+        s["idle_connections"] = s.get("idle_connections", 0) + idle
+        s["loops"]            = s.get("loops", 0) + 1
+    for name, s in out.items():
+        done = s.get("requests", 0) - s.get("in_flight", 0)
+        s["avg_ms"] = round(s.get("total_ms", 0) / done, 1) if done > 0 else None
+        s["timeout"], s["max_connections"], s["max_keepalive"] = _upstream_config(name)
+    return {"http2": HTTP2_AVAILABLE and HTTP_CLIENT_HTTP2, "upstreams": out}
@@ -0,0 +1,246 @@
+"""
+notifications.py — HomeBridge notification dispatcher
+
+Approval emails (SendGrid) and SMS (Twilio) used to be sent with
+asyncio.run(send_approval_*(...)) straight from scheduler threads. Each message
+built and tore down its own event loop and HTTP client. A send that failed was
+logged and lost.
+
+Callers now enqueue into notification_outbox (database migration 18) and
+return immediately. One long-lived dispatcher thread handles delivery:
+  - runs one event loop; sends go through the pooled SendGrid/Twilio clients
+    in http_clients.py
+  - delivers at most NOTIFY_CONCURRENCY messages at once
+  - wakes as soon as something is enqueued (and polls every
+    NOTIFY_POLL_SECONDS for retries and other workers' rows)
+  - retries failures with exponential backoff up to NOTIFY_MAX_ATTEMPTS.
+    Config errors and 4xx responses other than 429 give up at once.
+  - sends emails that share a template as one SendGrid request. Each
+    recipient is a personalization, up to SENDGRID_MAX_PERSONALIZATIONS per
+    request. After a wake it lingers NOTIFY_BATCH_LINGER_SECONDS so a
+    scheduler fan-out coalesces. Every provider request gets a
+    notification_batches row for delivery accounting.
+  - drops malformed email addresses before batching. SendGrid rejects a
+    whole request over one bad address, so a batch answered with a 4xx is
+    bisected and retried until the rejection is pinned to single rows; only
+    those give up.
+
+Rows survive restarts. notification_claim_many is the cross-process guard, so
+several uvicorn workers can each run a dispatcher without double-sending.
+"""
+
+import os
+import re
+import time
+import random
+import asyncio
+import threading
+from datetime import datetime, timedelta
+
+NOTIFY_CONCURRENCY    = int(os.getenv("NOTIFY_CONCURRENCY", "8"))
+NOTIFY_POLL_SECONDS   = float(os.getenv("NOTIFY_POLL_SECONDS", "15"))
+NOTIFY_MAX_ATTEMPTS   = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "5"))
+NOTIFY_BACKOFF_SECS   = int(os.getenv("NOTIFY_BACKOFF_SECS", "30"))
+NOTIFY_SEND_TIMEOUT   = float(os.getenv("NOTIFY_SEND_TIMEOUT", "30"))
+NOTIFY_BATCH_LINGER_SECONDS = float(os.getenv("NOTIFY_BATCH_LINGER_SECONDS", "2"))
+NOTIFY_FETCH_LIMIT    = int(os.getenv("NOTIFY_FETCH_LIMIT", "2000"))
+
+_dispatcher_lock  = threading.Lock()
+_dispatcher       = {"thread": None, "loop": None, "wake": None}
+
+
+# ── Enqueue (any thread) ──────────────────────────────────────────────────────
+
+def _enqueue(channel: str, recipient: str, payload: dict) -> int:
+    from database import notification_enqueue
+    outbox_id = notification_enqueue(channel, recipient, payload)
+    start_notification_dispatcher()
+    _wake_dispatcher()
+    return outbox_id
+
+
+def enqueue_approval_email(to_email: str, agent_name: str, headline: str, approve_url: str) -> int:
+    """Queue an approval-request email. Returns the outbox id; delivery is asynchronous."""
+    return _enqueue("email", to_email, {
+        "template": "approval",
+        "agent_name": agent_name, "headline": headline, "approve_url": approve_url,
+    })
+
+
+def enqueue_approval_sms(to_phone: str, agent_name: str, headline: str, approve_url: str) -> int:
+    """Queue an approval-request SMS. Returns the outbox id; delivery is asynchronous."""
+    return _enqueue("sms", to_phone, {
+        "agent_name": agent_name, "headline": headline, "approve_url": approve_url,
+    })
+
+
+def _wake_dispatcher() -> None:
+    loop, wake = _dispatcher["loop"], _dispatcher["wake"]
+    if loop is not None and wake is not None:
+        try:
+            loop.call_soon_threadsafe(wake.set)
+        except RuntimeError:
+            pass   # loop closed (interpreter shutting down)
+
+
+# ── Delivery (dispatcher thread) ──────────────────────────────────────────────
+
+_EMAIL_RE = re.compile(r"^[^@\s,;<>\"]+@[^@\s,;<>\"]+\.[^@\s,;<>\"]+$")
+
+
+def _is_rejected(error: Exception) -> bool:
+    """
+    The provider refused the request's content (400 bad recipient/payload, 413
+    too large). Only these are worth splitting a batch over. Account-level
+    refusals (401/403: bad or revoked key, unverified sender) fail every
+    request alike, so they stay whole-batch, retryable failures.
+    """
+    m = re.search(r"error (\d{3})", str(error))
+    return bool(m) and m.group(1) in ("400", "413")
+
+
+def _is_permanent(error: Exception) -> bool:
+    return "not configured" in str(error) or _is_rejected(error)
+
+
+def _drop_invalid(rows: list) -> list:
+    """Give up on emails with a malformed address so they never join a batch. Returns the rest."""
+    from database import notification_mark_failed
+    valid = []
+    for r in rows:
+        if r["channel"] == "email" and not _EMAIL_RE.match((r["recipient"] or "").strip()):
+            notification_mark_failed(r["id"], "invalid email address", give_up=True)
+            print(f"[Notify] ✗ #{r['id']}: invalid email address {r['recipient']!r} — giving up")
+        else:
+            valid.append(r)
+    return valid
+
+
+def _record_failure(row: dict, error: Exception) -> bool:
+    """Count one failed attempt on an outbox row. Returns True if it gave up."""
+    from database import notification_mark_failed
+    attempts = row.get("attempts") or 0
+    give_up  = _is_permanent(error) or attempts + 1 >= NOTIFY_MAX_ATTEMPTS
+    delay    = NOTIFY_BACKOFF_SECS * (2 ** attempts) * random.uniform(0.5, 1.0)
+    notification_mark_failed(
+        row["id"], str(error) or error.__class__.__name__, give_up=give_up,
+        retry_at=None if give_up else (datetime.utcnow() + timedelta(seconds=delay)).isoformat(),
+    )
+    return give_up
+
+
+async def _deliver_batch(channel: str, template: str, rows: list, slots: asyncio.Semaphore) -> None:
+    """One provider request carrying every row (email batch, or a single SMS)."""
+    from social import send_approval_email_batch, send_approval_sms
+    from database import notification_batch_start, notification_batch_finish, notification_mark_sent_many
+
+    ids      = [r["id"] for r in rows]
+    batch_id = notification_batch_start(channel, template, ids)
+    t0       = time.monotonic()
+    error    = None
+    async with slots:
+        try:
+            if channel == "email" and template == "approval":
+                send = send_approval_email_batch(
+                    [{"to_email": r["recipient"], **r["payload"]} for r in rows],
+                )
+            elif channel == "sms" and len(rows) == 1:
+                p = rows[0]["payload"]
+                send = send_approval_sms(rows[0]["recipient"], p.get("agent_name", "there"),
+                                         p.get("headline", ""), p.get("approve_url", ""))
+            else:
+                raise RuntimeError(f"no sender for {channel}/{template!r} — not configured")
+            await asyncio.wait_for(send, NOTIFY_SEND_TIMEOUT)
+        except Exception as e:
+            error = e
+    elapsed_ms = int((time.monotonic() - t0) * 1000)
+
+    if error is None:
+        notification_mark_sent_many(ids)
+        notification_batch_finish(batch_id, "sent", elapsed_ms)
+        print(f"[Notify] ✓ {channel} batch #{batch_id}: {len(ids)} message(s) in one request ({elapsed_ms}ms)")
+        return
+    if len(rows) > 1 and _is_rejected(error):
+        # One bad recipient fails the whole request — bisect so only its row gives up.
+        notification_batch_finish(batch_id, "split", elapsed_ms, str(error))
+        print(f"[Notify] {channel} batch #{batch_id} rejected, splitting {len(ids)} message(s): {error}")
+        mid = len(rows) // 2
+        await _deliver_batch(channel, template, rows[:mid], slots)
+        await _deliver_batch(channel, template, rows[mid:], slots)
+        return
+    gave_up = sum(1 for r in rows if _record_failure(r, error))
+    notification_batch_finish(batch_id, "failed", elapsed_ms, str(error))
+    print(f"[Notify] ✗ {channel} batch #{batch_id}: {len(ids)} message(s) failed "
+          f"({gave_up} giving up, {len(ids) - gave_up} will retry): {error}")
+
+
+def _group_for_delivery(rows: list) -> list:
+    """[(channel, template, [rows])] — emails chunked by template, SMS one per request."""
+    from social import SENDGRID_MAX_PERSONALIZATIONS
+    groups, emails = [], {}
+    for r in rows:
+        if r["channel"] == "email":
+            emails.setdefault(r["payload"].get("template", "approval"), []).append(r)
+        else:
+            groups.append((r["channel"], r["payload"].get("template", "approval"), [r]))
+    for template, items in emails.items():
+        for i in range(0, len(items), SENDGRID_MAX_PERSONALIZATIONS):
+            groups.append(("email", template, items[i:i + SENDGRID_MAX_PERSONALIZATIONS]))
+    return groups
+
+
+async def _dispatch_loop() -> None:
+    from database import (notification_get_due, notification_claim_many,
+                          notification_requeue_stale, notification_prune)
+
+    wake  = asyncio.Event()
+    slots = asyncio.Semaphore(NOTIFY_CONCURRENCY)
+    tasks = set()
+    _dispatcher["loop"], _dispatcher["wake"] = asyncio.get_running_loop(), wake
+    housekeeping_at = 0.0
+
+    while True:
+        wake.clear()
+        try:
+            now = asyncio.get_running_loop().time()
+            if now - housekeeping_at > 600:
+                housekeeping_at = now
+                requeued = notification_requeue_stale()
+                if requeued:
+                    print(f"[Notify] Requeued {requeued} message(s) orphaned in 'sending'.")
+                notification_prune()
+            # Claim only when a request slot is free; the rest stays in the outbox.
+            rows = notification_get_due(limit=NOTIFY_FETCH_LIMIT) if len(tasks) < 2 * NOTIFY_CONCURRENCY else []
+            won  = set(notification_claim_many([r["id"] for r in rows]))   # others may be another worker's
+            for channel, template, group in _group_for_delivery(_drop_invalid([r for r in rows if r["id"] in won])):
+                task = asyncio.create_task(_deliver_batch(channel, template, group, slots))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                task.add_done_callback(lambda _t: wake.set())   # a slot freed up
+        except Exception as e:
+            print(f"[Notify] Error in dispatcher loop: {e}")
+        try:
+            await asyncio.wait_for(wake.wait(), NOTIFY_POLL_SECONDS)
+            # Let the rest of a fan-out land so it ships in the same batch.
+            await asyncio.sleep(NOTIFY_BATCH_LINGER_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+def _run_dispatcher() -> None:
+    print("[Notify] Dispatcher started.")
+    try:
+        asyncio.run(_dispatch_loop())
+    finally:
+        _dispatcher["loop"] = _dispatcher["wake"] = None
+
+
+def start_notification_dispatcher() -> None:
+    """Start the dispatcher thread once per process. Safe to call repeatedly."""
+    with _dispatcher_lock:
+        t = _dispatcher["thread"]
+        if t is not None and t.is_alive():
+            return
+        t = threading.Thread(target=_run_dispatcher, daemon=True, name="notify-dispatch")
+        _dispatcher["thread"] = t
+        t.start()
@@ -0,0 +1,170 @@
+"""
+rate_limit.py — HomeBridge shared request rate limiter
+
+One limiter for every public/auth endpoint that used to keep its own
+{ip: [timestamps]} dict (auth, waitlist/contact, public compliance checker,
+onboarding reflection, demo generation). Those lists were rebuilt on every
+call and never evicted idle IPs, so a scraper cycling addresses grew worker
+memory without bound — and each uvicorn worker enforced its own limit.
+
+Two algorithms, both O(1) per call with a fixed-size state per key:
+  SlidingWindowLimiter — sliding-window counter: current + previous fixed
+                         window, previous weighted by how much of it still
+                         overlaps the rolling window. "N per window".
+  TokenBucketLimiter   — bucket of `burst` tokens refilled at `rate`/sec.
+                         Allows short bursts, enforces a steady average.
+
+Two stores:
+  memory — per-process OrderedDict LRU capped at RATE_LIMIT_MAX_KEYS keys.
+           The default: no I/O, safe to call on the event loop.
+  sqlite — rate_limit_state table (database migration 17), shared by every
+           worker on the same DB. Stale keys are pruned periodically. On any
+           DB error the limiter falls back to its memory store (fail open to
+           per-process limits, never to "no limits"). Each call is a BEGIN
+           IMMEDIATE write, so it competes for the writer lock and blocks the
+           calling thread; opt in only off the event loop or where a shared
+           budget matters more than that cost.
+
+RATE_LIMIT_BACKEND picks the default store ("memory" or "sqlite"); a limiter
+can also pass backend= explicitly.
+"""
+
+import os
+import abc
+import time
+import threading
+from collections import OrderedDict
+
+RATE_LIMIT_BACKEND     = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+RATE_LIMIT_MAX_KEYS    = int(os.getenv("RATE_LIMIT_MAX_KEYS", "10000"))   # per limiter, memory store
+RATE_LIMIT_PRUNE_SECS  = int(os.getenv("RATE_LIMIT_PRUNE_SECS", "300"))   # sqlite stale-key sweep interval
+
+
+# ── Stores ────────────────────────────────────────────────────────────────────
+# A store maps key -> state tuple and applies step(state, now) -> (allowed, new_state)
+# atomically. The algorithm owns the tuple's meaning; stores treat it as opaque.
+
+class _MemoryStore:
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._states  = OrderedDict()
+        self._lock    = threading.Lock()
+
+    def apply(self, key: str, step, now: float) -> bool:
+        with self._lock:
+            allowed, state = step(self._states.get(key), now)
+            self._states[key] = state
+            self._states.move_to_end(key)
+            while len(self._states) > self.max_keys:
+                self._states.popitem(last=False)   # least recently seen key
+            return allowed
+
+    def __len__(self):
+        return len(self._states)
+
+
+class _SqliteStore:
+    def __init__(self, name: str, ttl: float):
+        self.name        = name
+        self.ttl         = ttl
+        self._pruned_at  = 0.0
+
+    def apply(self, key: str, step, now: float) -> bool:
+        from database import db_conn
+        with db_conn() as conn:
+            # IMMEDIATE takes the write lock up front so two workers can't both
+            # read the same state and each let a request through.
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT s0, s1, s2 FROM rate_limit_state WHERE bucket = ? AND key = ?",
+                (self.name, key),
+            ).fetchone()
+            allowed, state = step(tuple(row) if row else None, now)
+            conn.execute(
+                """INSERT INTO rate_limit_state (bucket, key, s0, s1, s2, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(bucket, key) DO UPDATE SET
+                       s0 = excluded.s0, s1 = excluded.s1, s2 = excluded.s2,
+                       updated_at = excluded.updated_at""",
+                (self.name, key, state[0], state[1], state[2], now),
+            )
+            if now - self._pruned_at > RATE_LIMIT_PRUNE_SECS:
+                self._pruned_at = now
+                conn.execute(
+                    "DELETE FROM rate_limit_state WHERE bucket = ? AND updated_at < ?",
+                    (self.name, now - self.ttl),
+                )
+        return allowed
+
+
+# ── Limiters ──────────────────────────────────────────────────────────────────
+
+class _Limiter(abc.ABC):
+    def __init__(self, name: str, ttl: float, backend: str = None, max_keys: int = None):
+        self.name    = name
+        self.backend = (backend or RATE_LIMIT_BACKEND).lower()
+        self._memory = _MemoryStore(max_keys or RATE_LIMIT_MAX_KEYS)
+        self._shared = _SqliteStore(name, ttl) if self.backend == "sqlite" else None
+        self._warned = False
+
+    @abc.abstractmethod
+    def _step(self, state, now):
+        """(allowed, new_state) for this key's state at time now (state is None for a new key)."""
+
+    def allow(self, key: str) -> bool:
+        """True if the request is allowed (and counts it), False if rate limited."""
+        key = key or "unknown"
+        now = time.time()
+        if self._shared is not None:
+            try:
+                return self._shared.apply(key, self._step, now)
+            except Exception as e:
+                if not self._warned:
+                    self._warned = True
+                    print(f"[RateLimit] {self.name}: shared store failed, using per-process limits: {e}")
+        return self._memory.apply(key, self._step, now)
+
+
+class SlidingWindowLimiter(_Limiter):
+    """At most `limit` requests per rolling `window` seconds per key."""
+
+    def __init__(self, name: str, limit: int, window: float, **kw):
+        self.limit  = limit
+        self.window = float(window)
+        super().__init__(name, ttl=2 * self.window, **kw)
+
+    def _step(self, state, now):
+        # state = (window_start, current_count, previous_count)
+        start = (now // self.window) * self.window
+        if state is None:
+            cur_start, cur, prev = start, 0.0, 0.0
+        else:
+            cur_start, cur, prev = state
+            if start != cur_start:
+                # Rolled into a new fixed window; the old current becomes previous
+                # only if it is the immediately preceding window.
+                prev      = cur if start - cur_start == self.window else 0.0
+                cur       = 0.0
+                cur_start = start
+        overlap  = 1.0 - (now - cur_start) / self.window
+        estimate = prev * overlap + cur
+        if estimate >= self.limit:
+            return False, (cur_start, cur, prev)
+        return True, (cur_start, cur + 1, prev)
+
+
+class TokenBucketLimiter(_Limiter):
+    """Bursts of up to `burst` requests, refilled at `rate` tokens per second."""
+
+    def __init__(self, name: str, rate: float, burst: int, **kw):
+        self.rate  = float(rate)
+        self.burst = float(burst)
+        super().__init__(name, ttl=self.burst / self.rate if self.rate else 86400, **kw)
+
+    def _step(self, state, now):
+        # state = (tokens, last_refill, unused)
+        tokens, last = (self.burst, now) if state is None else (state[0], state[1])
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        if tokens < 1:
+            return False, (tokens, now, 0.0)
+        return True, (tokens - 1, now, 0.0)
@@ -20,7 +20,6 @@ import os
 import json
 import time
 import threading
-import urllib.request
 from datetime import datetime
 
 COLLECT_INTERVAL_HOURS   = int(os.getenv("SIGNAL_COLLECT_HOURS", "24"))  # Default 24hr — override via Render env var
@@ -28,6 +27,12 @@ HIGH_RELEVANCE_THRESHOLD = 0.6  # Minimum score to count as "strong"
 MIN_STRONG_SIGNALS       = 2    # Escalate if fewer than this many strong signals found
 MAX_SIGNAL_SEARCHES      = int(os.getenv("MAX_SIGNAL_SEARCHES", "3"))    # Max Tier 1 searches per agent per run
 RSS_ENABLED              = os.getenv("RSS_ENABLED", "true").lower() == "true"
+RSS_CACHE_TTL_MINUTES    = int(os.getenv("RSS_CACHE_TTL_MINUTES", "720"))  # One feed download per cycle, shared by every agent
+RSS_FETCH_CONCURRENCY    = int(os.getenv("RSS_FETCH_CONCURRENCY", "10"))   # Max feeds in flight at once
+RSS_PER_HOST_LIMIT       = int(os.getenv("RSS_PER_HOST_LIMIT", "2"))       # Max in flight per publisher host
+RSS_FETCH_DEADLINE_SECS  = float(os.getenv("RSS_FETCH_DEADLINE_SECS", "45"))  # Whole fetch stage gives up after this
+RSS_FETCH_RETRIES        = int(os.getenv("RSS_FETCH_RETRIES", "2"))        # Retries on timeout / 429 / 5xx
+RSS_FEED_TIMEOUT_SECS    = 12
 _collector_started       = False
 
 
@@ -361,6 +366,290 @@ def _get_market_rss_feeds(market: str) -> list:
     return matched
 
 
+# ── TIER 0 FEED CACHE ────────────────────────────────────────────────────────
+#
+# Every agent in a market subscribes to the same national feeds plus the same
+# MARKET_RSS_FEEDS entries, so the raw rss2json payload is cached per feed URL
+# and fanned out to each agent. Date filtering and signal shaping still run
+# per agent against the cached items.
+#
+#   memory — _rss_cache, {url: (fetched_epoch, items_or_None)}. A None entry
+#            records a failed fetch so a dead feed is tried once per cycle,
+#            not once per agent (held _RSS_FAILURE_TTL_SECONDS). Failures
+#            are never written to disk.
+#   disk   — rss_feed_cache table, last good payload per URL plus its
+#            ETag / Last-Modified. Survives a restart mid-cycle so the
+#            remaining agents don't re-download.
+#
+# Entries expire after RSS_CACHE_TTL_MINUTES; _rss_cache_begin_cycle() drops
+# failures and anything expired at the start of each collection run.
+# ─────────────────────────────────────────────────────────────────────────────
+
+_rss_cache      = {}
+_rss_cache_lock = threading.Lock()
+_RSS_FAILURE_TTL_SECONDS = 900  # A dead feed is retried after 15 min (e.g. manual trigger)
+
+
+def _rss_cache_begin_cycle():
+    """Forget failed feeds and expired payloads so this cycle retries them."""
+    from datetime import timedelta
+    from database import rss_cache_purge
+
+    ttl_seconds = RSS_CACHE_TTL_MINUTES * 60
+    now = time.time()
+    with _rss_cache_lock:
+        for url, (fetched_at, items) in list(_rss_cache.items()):
+            if items is None or now - fetched_at >= ttl_seconds:
+                del _rss_cache[url]
+    # Expired disk rows are kept a while longer — their ETag / Last-Modified
+    # validators let the next fetch come back as a cheap 304.
+    keep = max(timedelta(seconds=ttl_seconds), timedelta(days=7))
+    try:
+        rss_cache_purge((datetime.utcnow() - keep).isoformat())
+    except Exception as e:
+        print(f"[Signals/RSS] Cache purge error: {e}")
+
+
+def _rss_cache_lookup(url: str):
+    """
+    Return (hit, items) for a feed URL — memory first, then disk.
+    hit=False means the caller must fetch. items may be None on a hit if the
+    feed already failed this cycle.
+    """
+    from database import rss_cache_get
+
+    ttl_seconds = RSS_CACHE_TTL_MINUTES * 60
+    with _rss_cache_lock:
+        entry = _rss_cache.get(url)
+    if entry:
+        age = time.time() - entry[0]
+        if age < (ttl_seconds if entry[1] is not None else _RSS_FAILURE_TTL_SECONDS):
+            return True, entry[1]
+
+    try:
+        row = rss_cache_get(url)
+    except Exception as e:
+        print(f"[Signals/RSS] Cache read error for {url}: {e}")
+        row = None
+    if row:
+        try:
+            fetched_at = datetime.fromisoformat(row["fetched_at"])
+            age        = (datetime.utcnow() - fetched_at).total_seconds()
+            if age < ttl_seconds:
+                items = json.loads(row["payload_json"])
+                with _rss_cache_lock:
+                    _rss_cache[url] = (time.time() - age, items)
+                return True, items
+        except Exception as e:
+            print(f"[Signals/RSS] Cache row unreadable for {url}: {e}")
+    return False, None
+
+
+def _rss_cache_store(url: str, items, etag: str = None, last_modified: str = None):
+    """Record a fetch result. items=None marks a failure (memory only)."""
+    from database import rss_cache_put
+
+    with _rss_cache_lock:
+        _rss_cache[url] = (time.time(), items)
+    if items is None:
+        return
+    try:
+        rss_cache_put(url, json.dumps(items), datetime.utcnow().isoformat(),
+                      etag=etag, last_modified=last_modified)
+    except Exception as e:
+        print(f"[Signals/RSS] Cache write error for {url}: {e}")
+
+
+# ── TIER 0 FETCH STAGE ───────────────────────────────────────────────────────
+#
+# Cache misses are fetched concurrently on a private event loop with httpx:
+#   - RSS_FETCH_CONCURRENCY caps total requests in flight (rss2json quota)
+#   - RSS_PER_HOST_LIMIT caps requests per publisher host, so the ~25
+#     feeds.bizjournals.com feeds don't all land on one origin at once
+#   - RSS_FETCH_DEADLINE_SECS bounds the whole stage; stragglers are
+#     cancelled and treated as failed for this cycle
+#   - timeouts, 429 and 5xx are retried with exponential backoff + full jitter
+#   - stored ETag / Last-Modified are sent as If-None-Match /
+#     If-Modified-Since; a 304 re-arms the cached payload without a download
+# Tier 0 wall time is therefore bounded by the slowest feed, not the sum.
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _rss2json_url(url: str, api_key: str) -> str:
+    import urllib.parse
+    return (
+        f"https://api.rss2json.com/v1/api.json"
+        f"?api_key={api_key}"
+        f"&rss_url={urllib.parse.quote(url, safe='')}"
+        f"&count=10"
+    )
+
+
+async def _fetch_feed_async(client, label: str, url: str, api_key: str,
+                            global_sem, host_sem, validators: dict) -> dict:
+    """
+    Fetch one feed with retries. Never raises.
+    Returns {'status': 'ok'|'not_modified'|'error', 'items', 'etag', 'last_modified'}.
+    """
+    import asyncio
+    import random
+    import httpx
+
+    headers = {"User-Agent": "AutoMates/1.0 (signal-collector)"}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+
+    last_err = None
+    for attempt in range(RSS_FETCH_RETRIES + 1):
+        if attempt:
+            await asyncio.sleep(random.uniform(0, min(8.0, 0.5 * (2 ** attempt))))
+        try:
+            async with global_sem, host_sem:
+                resp = await client.get(_rss2json_url(url, api_key), headers=headers)
+        except httpx.TransportError as e:
+            last_err = f"{type(e).__name__}: {e}"
+            continue
+
+        if resp.status_code == 304:
+            return {"status": "not_modified", "items": None,
+                    "etag": validators.get("etag"), "last_modified": validators.get("last_modified")}
+        if resp.status_code == 429 or resp.status_code >= 500:
+            last_err = f"HTTP {resp.status_code}"
+            continue
+        if resp.status_code >= 400:
+            print(f"[Signals/RSS] Feed skipped — {label}: HTTP {resp.status_code}")
+            return {"status": "error"}
+
+        try:
+            data = resp.json()
+        except Exception as e:
+            print(f"[Signals/RSS] Feed skipped — {label}: bad JSON ({e})")
+            return {"status": "error"}
+
+        # rss2json returns status "ok" on success, "error" on bad feed
+        if data.get("status") != "ok":
+            msg = data.get("message", "unknown error")
+            print(f"[Signals/RSS] Feed skipped — {label}: rss2json status={data.get('status')} — {msg}")
+            return {"status": "error"}
+        return {"status": "ok", "items": data.get("items", []) or [],
+                "etag": resp.headers.get("etag"), "last_modified": resp.headers.get("last-modified")}
+
+    print(f"[Signals/RSS] Feed skipped — {label}: {last_err} after {RSS_FETCH_RETRIES + 1} attempt(s)")
+    return {"status": "error"}
+
+
+async def _fetch_feeds_async(feeds: list, api_key: str, validators: dict) -> dict:
+    """Fetch (label, url) pairs concurrently under the stage deadline. Returns {url: result}."""
+    import asyncio
+    import urllib.parse
+    import httpx
+
+    global_sem = asyncio.Semaphore(max(1, RSS_FETCH_CONCURRENCY))
+    host_sems  = {}
+    results    = {}
+
+    async with httpx.AsyncClient(timeout=RSS_FEED_TIMEOUT_SECS, follow_redirects=True) as client:
+        tasks = {}
+        for label, url in feeds:
+            host = urllib.parse.urlsplit(url).hostname or url
+            if host not in host_sems:
+                host_sems[host] = asyncio.Semaphore(max(1, RSS_PER_HOST_LIMIT))
+            task = asyncio.ensure_future(_fetch_feed_async(
+                client, label, url, api_key, global_sem, host_sems[host], validators.get(url, {}),
+            ))
+            tasks[task] = (label, url)
+
+        done, pending = await asyncio.wait(tasks, timeout=RSS_FETCH_DEADLINE_SECS)
+        for task in pending:
+            task.cancel()
+            label, url = tasks[task]
+            print(f"[Signals/RSS] Feed skipped — {label}: exceeded {RSS_FETCH_DEADLINE_SECS:.0f}s stage deadline")
+            results[url] = {"status": "error"}
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        for task in done:
+            _, url = tasks[task]
+            try:
+                results[url] = task.result()
+            except Exception as e:
+                print(f"[Signals/RSS] Feed skipped — {tasks[task][0]}: {e}")
+                results[url] = {"status": "error"}
+    return results
+
+
+def _run_coroutine(coro):
+    """
+    asyncio.run() from sync code. If this thread already has a running loop
+    (e.g. the manual /signals/trigger endpoint) run it on a helper thread.
+    """
+    import asyncio
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=1) as ex:
+        return ex.submit(asyncio.run, coro).result()
+
+
+def _prefetch_feeds(feeds: list, api_key: str):
+    """
+    Make sure every (label, url) in feeds is in the Tier 0 cache, fetching
+    all misses concurrently in one batch. Failures are cached as None.
+    """
+    from database import rss_cache_get
+
+    misses, seen = [], set()
+    for label, url in feeds:
+        if url in seen:
+            continue
+        seen.add(url)
+        if not _rss_cache_lookup(url)[0]:
+            misses.append((label, url))
+    if not misses:
+        return
+
+    validators = {}
+    for _, url in misses:
+        try:
+            row = rss_cache_get(url)
+        except Exception:
+            row = None
+        if row:
+            validators[url] = row
+
+    started = time.perf_counter()
+    results = _run_coroutine(_fetch_feeds_async(misses, api_key, validators))
+
+    counts = {"ok": 0, "not_modified": 0, "error": 0}
+    for _, url in misses:
+        res = results.get(url) or {"status": "error"}
+        status = res["status"]
+        if status == "not_modified":
+            try:
+                items = json.loads(validators[url]["payload_json"])
+            except Exception:
+                items, status = None, "error"
+            else:
+                _rss_cache_store(url, items, res.get("etag"), res.get("last_modified"))
+        if status == "ok":
+            _rss_cache_store(url, res["items"], res.get("etag"), res.get("last_modified"))
+        elif status == "error":
+            _rss_cache_store(url, None)
+        counts[status] += 1
+
+    print(f"[Signals/RSS] Fetched {len(misses)} feed(s) in {time.perf_counter() - started:.1f}s — "
+          f"{counts['ok']} ok, {counts['not_modified']} not modified, {counts['error']} failed.")
+
+
+def _feeds_for_context(market: str, context: str = "agent") -> tuple:
+    """Return (national_list, market_feeds) subscribed to by one agent in a context."""
+    if context == "hb_marketing":
+        return HB_MARKETING_NATIONAL_RSS_FEEDS + DUAL_NATIONAL_RSS_FEEDS, []
+    return AGENT_NATIONAL_RSS_FEEDS + DUAL_NATIONAL_RSS_FEEDS, _get_market_rss_feeds(market)
+
+
 def _fetch_rss_signals(market: str, cutoff_dt: datetime, context: str = "agent") -> list:
     """
     Tier 0 — Fetch RSS feeds via rss2json.com API and return signals in the
@@ -373,6 +662,9 @@ def _fetch_rss_signals(market: str, cutoff_dt: datetime, context: str = "agent")
 
     Uses rss2json.com as a proxy — bypasses publisher-side SSL/403 blocks
     that direct urllib fetches hit on Render. Requires RSS2JSON_API_KEY env var.
+    Raw feed payloads come from the shared Tier 0 feed cache, so each feed is
+    downloaded once per cycle no matter how many agents subscribe to it;
+    misses are fetched concurrently by _prefetch_feeds().
 
     Only returns items published after cutoff_dt (14-day hard limit).
     Never raises — individual feed failures are logged and skipped.
@@ -382,7 +674,6 @@ def _fetch_rss_signals(market: str, cutoff_dt: datetime, context: str = "agent")
         return []
 
     import re as _re
-    import urllib.parse
 
     api_key = os.getenv("RSS2JSON_API_KEY", "")
     if not api_key:
@@ -390,12 +681,7 @@ def _fetch_rss_signals(market: str, cutoff_dt: datetime, context: str = "agent")
         return []
 
     # Build the feed list based on context
-    if context == "hb_marketing":
-        national_list = HB_MARKETING_NATIONAL_RSS_FEEDS + DUAL_NATIONAL_RSS_FEEDS
-        market_feeds  = []
-    else:
-        national_list = AGENT_NATIONAL_RSS_FEEDS + DUAL_NATIONAL_RSS_FEEDS
-        market_feeds  = _get_market_rss_feeds(market)
+    national_list, market_feeds = _feeds_for_context(market, context)
 
     all_feeds = [(label, url, sig_type, "National") for label, url, sig_type in national_list]
     all_feeds += [(label, url, sig_type, market or "Local") for label, url, sig_type in market_feeds]
@@ -405,27 +691,15 @@ def _fetch_rss_signals(market: str, cutoff_dt: datetime, context: str = "agent")
     else:
         print(f"[Signals/RSS] context={context} market='{market}': {len(national_list)} national feeds, no local.")
 
+    # Cache misses are fetched concurrently; everything below reads the cache
+    _prefetch_feeds([(label, url) for label, url, _, _ in all_feeds], api_key)
+
     results = []
     for label, url, sig_type, default_area in all_feeds:
         try:
-            # Call rss2json API — returns JSON regardless of source feed format
-            api_url = (
-                f"https://api.rss2json.com/v1/api.json"
-                f"?api_key={api_key}"
-                f"&rss_url={urllib.parse.quote(url, safe='')}"
-                f"&count=10"
-            )
-            req = urllib.request.Request(api_url, headers={"User-Agent": "AutoMates/1.0 (signal-collector)"})
-            with urllib.request.urlopen(req, timeout=12) as resp:
-                data = json.loads(resp.read())
-
-            # rss2json returns status "ok" on success, "error" on bad feed
-            if data.get("status") != "ok":
-                msg = data.get("message", "unknown error")
-                print(f"[Signals/RSS] Feed skipped — {label}: rss2json status={data.get('status')} — {msg}")
-                continue
-
-            items = data.get("items", [])
+            _, items = _rss_cache_lookup(url)
+            if items is None:
+                continue  # Failed this cycle — already logged by the fetch stage
             feed_count = 0
 
             for item in items:
@@ -521,24 +795,44 @@ def _collect_all_agent_signals():
     except Exception as e:
         print(f"[Signals] Purge error: {e}")
 
+    _rss_cache_begin_cycle()
+    _shared_search_prune()
+
+    # Hot setup fields come from agent_setup's projected columns; agents are
+    # walked market by market so each market's shared Tier 2/3 searches and
+    # RSS entries are reused back-to-back while still warm.
     conn = get_conn()
     c    = conn.cursor()
     c.execute("""
-        SELECT u.id, u.agent_name, a.setup_json
+        SELECT u.id, u.agent_name, a.market, a.primary_niches, a.service_areas
         FROM users u
         JOIN agent_setup a ON a.user_id = u.id
         WHERE u.is_active = 1
           AND u.role IN ('agent', 'admin', 'super_admin')
+          AND (a.market != '' OR a.service_areas != '[]')
+        ORDER BY a.market COLLATE NOCASE, u.id
     """)
     rows = c.fetchall()
     conn.close()
 
+    # Warm the Tier 0 cache with every feed any market subscribes to in one
+    # concurrent batch, so per-agent collection below never waits on RSS.
+    api_key = os.getenv("RSS2JSON_API_KEY", "")
+    if RSS_ENABLED and api_key:
+        feeds = []
+        for market in {row["market"] or "" for row in rows}:
+            national_list, market_feeds = _feeds_for_context(market)
+            feeds += [(label, url) for label, url, _ in national_list + market_feeds]
+        try:
+            _prefetch_feeds(feeds, api_key)
+        except Exception as e:
+            print(f"[Signals/RSS] Prefetch error: {e}")
+
     for row in rows:
         try:
-            setup         = json.loads(row["setup_json"] or "{}")
-            service_areas = setup.get("serviceAreas", [])
-            market        = setup.get("market", "")
-            primary_niches= setup.get("primaryNiches", [])
+            service_areas = json.loads(row["service_areas"] or "[]")
+            market        = row["market"] or ""
+            primary_niches= json.loads(row["primary_niches"] or "[]")
             if not service_areas and not market:
                 continue
             _collect_signals_for_agent(
@@ -555,7 +849,8 @@ def _collect_all_agent_signals():
 def _search_signals(client, prompt: str, user_id: int) -> list:
     """
     Execute a single Claude web search call and return parsed signals list.
-    Returns [] on any failure — caller decides what to do.
+    Returns [] when the search found nothing usable, None if the Claude call
+    itself failed — both are falsy, caller decides what to do.
     """
     try:
         response = client.messages.create(
@@ -566,7 +861,7 @@ def _search_signals(client, prompt: str, user_id: int) -> list:
         )
     except Exception as e:
         print(f"[Signals] Claude call failed for user {user_id}: {e}")
-        return []
+        return None
 
     raw_text = ""
     for block in (response.content or []):
@@ -605,6 +900,54 @@ def _search_signals(client, prompt: str, user_id: int) -> list:
         return []
 
 
+# ── SHARED MARKET SEARCHES ───────────────────────────────────────────────────
+#
+# Tier 2 (metro) prompts depend only on the market, Tier 3 (national) only on
+# market + niche — not on the agent. Results are cached per
+# (tier, market, niche, UTC day) so every agent in a metro reuses one search;
+# each agent still saves through _save_signals() with its own dedupe.
+# A per-key lock makes concurrent callers wait for the first search instead
+# of issuing their own. Failed Claude calls (None) are not cached.
+# ─────────────────────────────────────────────────────────────────────────────
+
+_shared_search_cache = {}   # key -> list of signals
+_shared_search_locks = {}   # key -> threading.Lock
+_shared_search_lock  = threading.Lock()
+
+
+def _shared_search_prune():
+    """Drop cached searches from previous days."""
+    today = datetime.utcnow().strftime("%Y-%m-%d")
+    with _shared_search_lock:
+        for key in [k for k in _shared_search_cache if k[-1] != today]:
+            _shared_search_cache.pop(key, None)
+            _shared_search_locks.pop(key, None)
+
+
+def _search_signals_shared(client, tier: str, market: str, niche: str,
+                           prompt: str, user_id: int) -> list:
+    """
+    _search_signals() for agent-independent prompts, memoised per
+    (tier, market, niche, day). tier must identify the prompt, e.g. 'metro:0'.
+    """
+    key = (tier, (market or "").strip().lower(), (niche or "").strip().lower(),
+           datetime.utcnow().strftime("%Y-%m-%d"))
+    with _shared_search_lock:
+        key_lock = _shared_search_locks.setdefault(key, threading.Lock())
+
+    with key_lock:
+        if key in _shared_search_cache:
+            cached = _shared_search_cache[key]
+            print(f"[Signals] Shared {tier} search reused for '{key[1]}'"
+                  f"{' / ' + key[2] if key[2] else ''}: {len(cached)} signal(s) — user {user_id}")
+            return list(cached)
+        signals = _search_signals(client, prompt, user_id)
+        if signals is not None:
+            with _shared_search_lock:
+                _shared_search_cache[key] = list(signals)
+        return signals
+
+
 def _validate_published_date(raw_date: str, user_id: int, headline: str) -> tuple:
     """
     Validate a published_date string from Claude.
@@ -876,8 +1219,8 @@ Return ONLY the JSON array.""",
     ]
 
     strong2 = 0
-    for t2_prompt in tier2_prompts:
-        t2_signals = _search_signals(client, t2_prompt, user_id)
+    for idx, t2_prompt in enumerate(tier2_prompts):
+        t2_signals = _search_signals_shared(client, f"metro:{idx}", market_str, "", t2_prompt, user_id)
         if t2_signals:
             saved = _save_signals(t2_signals, user_id, "metro", market_str)
             total_saved += saved
@@ -921,7 +1264,7 @@ Return ONLY a valid JSON array of up to 5 signals. No explanation, no preamble.
 
 Return ONLY the JSON array."""
 
-    tier3_signals = _search_signals(client, tier3_prompt, user_id)
+    tier3_signals = _search_signals_shared(client, "national", market_str, niche_str, tier3_prompt, user_id)
     if tier3_signals:
         saved = _save_signals(tier3_signals, user_id, "national", niche_str)
         total_saved += saved
@@ -12,7 +12,6 @@ Flow per platform:
 
 import os
 import json
-import httpx
 import secrets
 from datetime import datetime, timedelta
 from urllib.parse import urlencode
@@ -23,6 +22,7 @@ from pydantic import BaseModel
 from typing import Optional, List
 
 from auth import get_current_user, forbid_demo
+from http_clients import upstream_client
 import database
 
 router = APIRouter(prefix="/social", tags=["social"])
@@ -40,6 +40,8 @@ YOUTUBE_CLIENT_ID      = os.getenv("YOUTUBE_CLIENT_ID", os.getenv("GOOGLE_CLIENT
 YOUTUBE_CLIENT_SECRET  = os.getenv("YOUTUBE_CLIENT_SECRET", os.getenv("GOOGLE_CLIENT_SECRET", ""))
 FRONTEND_URL           = os.getenv("FRONTEND_URL", "https://app.homebridgegroup.co")
 BACKEND_URL            = os.getenv("BACKEND_URL", "https://api.homebridgegroup.co")
+SENDGRID_API_URL       = os.getenv("SENDGRID_API_URL", "https://api.sendgrid.com/v3/mail/send")  # point at a local stub in dev
+SENDGRID_MAX_PERSONALIZATIONS = min(1000, int(os.getenv("SENDGRID_MAX_PERSONALIZATIONS", "1000")))  # SendGrid's per-request cap
 
 # ─────────────────────────────────────────────
 # PLATFORM CONFIG
@@ -52,6 +54,7 @@ PLATFORMS = {
         "client_id":     LINKEDIN_CLIENT_ID,
         "client_secret": LINKEDIN_CLIENT_SECRET,
         "redirect_uri":  f"{BACKEND_URL}/social/linkedin/callback",
+        "upstream":      "linkedin",   # http_clients pool
         "enabled":       bool(LINKEDIN_CLIENT_ID),
     },
     "google": {
@@ -61,6 +64,7 @@ PLATFORMS = {
         "client_id":     GOOGLE_CLIENT_ID,
         "client_secret": GOOGLE_CLIENT_SECRET,
         "redirect_uri":  f"{BACKEND_URL}/social/google/callback",
+        "upstream":      "google",   # http_clients pool
         "enabled":       bool(GOOGLE_CLIENT_ID),
     },
     "facebook": {
@@ -70,6 +74,7 @@ PLATFORMS = {
         "client_id":     META_APP_ID,
         "client_secret": META_APP_SECRET,
         "redirect_uri":  f"{BACKEND_URL}/social/facebook/callback",
+        "upstream":      "facebook",   # http_clients pool
         "enabled":       bool(META_APP_ID),
     },
     "youtube": {
@@ -79,6 +84,7 @@ PLATFORMS = {
         "client_id":     YOUTUBE_CLIENT_ID,
         "client_secret": YOUTUBE_CLIENT_SECRET,
         "redirect_uri":  f"{BACKEND_URL}/social/youtube/callback",
+        "upstream":      "google",   # http_clients pool
         "enabled":       bool(YOUTUBE_CLIENT_ID),
     },
 }
@@ -161,7 +167,7 @@ async def oauth_callback(platform: str, request: Request):
     user_id = session["user_id"]
     cfg     = PLATFORMS[platform]
 
-    async with httpx.AsyncClient() as client:
+    async with upstream_client(cfg["upstream"]) as client:
         try:
             resp = await client.post(cfg["token_url"], data={
                 "grant_type":    "authorization_code",
@@ -185,7 +191,7 @@ async def oauth_callback(platform: str, request: Request):
     platform_user_id = ""
     platform_handle  = ""
 
-    async with httpx.AsyncClient() as client:
+    async with upstream_client(cfg["upstream"]) as client:
         try:
             if platform == "linkedin":
                 me               = await client.get("https://api.linkedin.com/v2/userinfo", headers={"Authorization": f"Bearer {access_token}"})
@@ -320,7 +326,7 @@ async def get_facebook_page_token(current_user=Depends(get_current_user)):
     if not user_id:
         raise HTTPException(400, "Facebook user ID not found. Please reconnect Facebook in Profile.")
 
-    async with httpx.AsyncClient(timeout=15) as client:
+    async with upstream_client("facebook", timeout=15) as client:
         resp = await client.get(
             f"https://graph.facebook.com/v19.0/{user_id}/accounts",
             params={"access_token": user_token}
@@ -363,7 +369,7 @@ async def facebook_select_page(body: FacebookPageSelectRequest, current_user=Dep
     # Page tokens obtained from a long-lived user token never expire
     final_page_token = body.page_token
     try:
-        async with httpx.AsyncClient(timeout=15) as client:
+        async with upstream_client("facebook", timeout=15) as client:
             # Use the stored long-lived user token to get a permanent page token
             user_token = conn_data["access_token"]
             accounts_resp = await client.get(
@@ -417,7 +423,7 @@ async def _refresh_youtube_token(user_id: int) -> Optional[str]:
         print(f"[YouTube] No refresh token found for user {user_id}")
         return None
     try:
-        async with httpx.AsyncClient(timeout=30) as client:
+        async with upstream_client("google", timeout=30) as client:
             resp = await client.post(
                 "https://oauth2.googleapis.com/token",
                 data={
@@ -454,7 +460,7 @@ async def _refresh_youtube_token(user_id: int) -> Optional[str]:
 async def _upload_youtube_video(access_token: str, video_source_url: str, title: str, description: str) -> dict:
     """Download a video from HeyGen CDN and upload it to YouTube via resumable upload API."""
     # Step 1: Download video from HeyGen
-    async with httpx.AsyncClient(timeout=60.0) as client:
+    async with upstream_client("heygen", timeout=60.0) as client:
         dl = await client.get(video_source_url)
     if dl.status_code != 200:
         raise HTTPException(502, "Could not retrieve your rendered video. Please try again.")
@@ -473,7 +479,7 @@ async def _upload_youtube_video(access_token: str, video_source_url: str, title:
             "selfDeclaredMadeForKids":  False,
         },
     }
-    async with httpx.AsyncClient(timeout=30) as client:
+    async with upstream_client("google", timeout=30) as client:
         init_resp = await client.post(
             "https://www.googleapis.com/upload/youtube/v3/videos",
             params={"uploadType": "resumable", "part": "snippet,status"},
@@ -491,7 +497,7 @@ async def _upload_youtube_video(access_token: str, video_source_url: str, title:
         raise HTTPException(502, "YouTube video upload failed. Please try again.")
 
     # Step 3: Upload video bytes
-    async with httpx.AsyncClient(timeout=120) as client:
+    async with upstream_client("google", timeout=120) as client:
         put_resp = await client.put(
             upload_url,
             content=video_bytes,
@@ -533,7 +539,7 @@ async def _upload_linkedin_video(
 
     # Step 1: Download video from HeyGen
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
+        async with upstream_client("heygen", timeout=60.0) as client:
             dl = await client.get(video_source_url)
         if dl.status_code != 200:
             raise Exception(f"HeyGen download returned {dl.status_code}")
@@ -544,7 +550,7 @@ async def _upload_linkedin_video(
 
     # Step 2: Register video upload
     try:
-        async with httpx.AsyncClient(timeout=30) as client:
+        async with upstream_client("linkedin", timeout=30) as client:
             reg = await client.post(
                 "https://api.linkedin.com/v2/assets?action=registerUpload",
                 json={
@@ -573,7 +579,7 @@ async def _upload_linkedin_video(
 
     # Step 3: Upload video bytes
     try:
-        async with httpx.AsyncClient(timeout=120) as client:
+        async with upstream_client("linkedin", timeout=120) as client:
             put_resp = await client.put(
                 upload_url,
                 content=video_bytes,
@@ -607,7 +613,7 @@ async def _upload_linkedin_video(
         },
         "visibility": {"com.linkedin.ugc.MemberNetworkVisibility": "PUBLIC"},
     }
-    async with httpx.AsyncClient() as client:
+    async with upstream_client("linkedin") as client:
         resp = await client.post(
             "https://api.linkedin.com/v2/ugcPosts",
             json=payload,
@@ -640,7 +646,7 @@ async def _upload_facebook_video(
     Facebook fetches the video from the HeyGen CDN URL directly.
     Falls back to text-only post on failure."""
     try:
-        async with httpx.AsyncClient(timeout=60) as client:
+        async with upstream_client("facebook", timeout=60) as client:
             resp = await client.post(
                 f"https://graph.facebook.com/v19.0/{page_id}/videos",
                 data={
@@ -676,8 +682,7 @@ async def post_to_platform(body: PostRequest, current_user=Depends(forbid_demo))
     if _is_expired(conn_data.get("expires_at", "")):
         raise HTTPException(401, f"Your {platform} connection has expired. Please reconnect in Profile.")
 
-    access_token = conn_data["access_token"]
-    post_text    = body.content or body.content_override
+    post_text = body.content or body.content_override
 
     item = None
     if not post_text and body.library_item_id:
@@ -713,81 +718,17 @@ async def post_to_platform(body: PostRequest, current_user=Depends(forbid_demo))
     video_url = body.video_url  # May be None — routes to text/image path when absent
 
     try:
-        if platform == "linkedin":
-            if video_url:
-                result = await _upload_linkedin_video(
-                    access_token,
-                    conn_data.get("platform_user_id", ""),
-                    video_url,
-                    post_text,
-                    body.org_urn,
-                )
-            else:
-                result = await _post_linkedin(access_token, conn_data.get("platform_user_id", ""), post_text, image_url, body.org_urn)
-
-        elif platform == "google":
-            # Google Business Profile does not support video upload
-            result = await _post_google(access_token, post_text)
-
-        elif platform == "facebook":
-            page_token = conn_data.get("page_token", "")
-            if video_url:
-                # Resolve page_id and page_token the same way _post_facebook does
-                fb_page_id    = os.getenv("FACEBOOK_PAGE_ID", "")
-                fb_page_token = page_token or os.getenv("FACEBOOK_PAGE_TOKEN", "")
-                if not fb_page_token:
-                    raise HTTPException(400, "No Facebook page token found. Please reconnect Facebook and select your page.")
-                if not fb_page_id and fb_page_token:
-                    async with httpx.AsyncClient(timeout=10) as client:
-                        me = await client.get(
-                            "https://graph.facebook.com/me",
-                            params={"access_token": fb_page_token, "fields": "id"},
-                        )
-                        fb_page_id = me.json().get("id", "")
-                result = await _upload_facebook_video(fb_page_token, fb_page_id, video_url, post_text)
-            else:
-                result = await _post_facebook(access_token, conn_data.get("platform_user_id", ""), post_text, image_url, page_token)
-
-        elif platform == "youtube":
-            if video_url:
-                # Refresh token if expired — YouTube tokens expire after 1 hour
-                if _is_expired(conn_data.get("expires_at", "")):
-                    new_token = await _refresh_youtube_token(current_user["id"])
-                    if new_token:
-                        access_token = new_token
-                    else:
-                        raise HTTPException(401, "Your YouTube connection has expired. Please reconnect in Profile.")
-                # Build title from library item headline if available
-                yt_title = ""
-                if item:
-                    yt_title = (item.get("content", {}).get("headline") or "")[:100]
-                if not yt_title:
-                    yt_title = post_text[:100]
-                result = await _upload_youtube_video(access_token, video_url, yt_title, post_text)
-            else:
-                result = await _post_youtube(access_token, conn_data.get("platform_user_id", ""), post_text, image_url)
-
-        else:
-            raise HTTPException(400, f"Direct posting to {platform} is not yet supported.")
+        result = await _dispatch_post(
+            platform, conn_data, current_user["id"], post_text,
+            image_url=image_url, video_url=video_url, org_urn=body.org_urn, item=item,
+        )
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(500, f"Failed to post to {platform}: {str(e)}")
 
-    # Mark as published for all outcomes — including script_ready
-    # (the script was "sent" — it's done from HomeBridge's perspective)
     if body.library_item_id:
-        database.library_update(body.library_item_id, current_user["id"], {
-            "status":       "published",
-            "published_at": datetime.utcnow().isoformat(),
-        })
-        database.log_platform_post(
-            user_id=current_user["id"],
-            library_item_id=body.library_item_id,
-            platform=platform,
-            post_id=result.get("id", ""),
-            post_url=result.get("url", ""),
-        )
+        _record_published(current_user["id"], body.library_item_id, platform, result)
 
     return {
         "ok":       True,
@@ -799,6 +740,122 @@ async def post_to_platform(body: PostRequest, current_user=Depends(forbid_demo))
     }
 
 
+async def _dispatch_post(platform: str, conn_data: dict, user_id: int, post_text: str,
+                         image_url: str = None, video_url: str = None,
+                         org_urn: str = None, item: dict = None) -> dict:
+    """Route one ready-to-send post to the platform's _post_* / _upload_* helper."""
+    access_token = conn_data["access_token"]
+
+    if platform == "linkedin":
+        if video_url:
+            return await _upload_linkedin_video(
+                access_token,
+                conn_data.get("platform_user_id", ""),
+                video_url,
+                post_text,
+                org_urn,
+            )
+        return await _post_linkedin(access_token, conn_data.get("platform_user_id", ""), post_text, image_url, org_urn)
+
+    if platform == "google":
+        # Google Business Profile does not support video upload
+        return await _post_google(access_token, post_text)
+
+    if platform == "facebook":
+        page_token = conn_data.get("page_token", "")
+        if video_url:
+            # Resolve page_id and page_token the same way _post_facebook does
+            fb_page_id    = os.getenv("FACEBOOK_PAGE_ID", "")
+            fb_page_token = page_token or os.getenv("FACEBOOK_PAGE_TOKEN", "")
+            if not fb_page_token:
+                raise HTTPException(400, "No Facebook page token found. Please reconnect Facebook and select your page.")
+            if not fb_page_id and fb_page_token:
+                async with upstream_client("facebook", timeout=10) as client:
+                    me = await client.get(
+                        "https://graph.facebook.com/me",
+                        params={"access_token": fb_page_token, "fields": "id"},
+                    )
+                    fb_page_id = me.json().get("id", "")
+            return await _upload_facebook_video(fb_page_token, fb_page_id, video_url, post_text)
+        return await _post_facebook(access_token, conn_data.get("platform_user_id", ""), post_text, image_url, page_token)
+
+    if platform == "youtube":
+        if video_url:
+            # Refresh token if expired — YouTube tokens expire after 1 hour
+            if _is_expired(conn_data.get("expires_at", "")):
+                new_token = await _refresh_youtube_token(user_id)
+                if new_token:
+                    access_token = new_token
+                else:
+                    raise HTTPException(401, "Your YouTube connection has expired. Please reconnect in Profile.")
+            # Build title from library item headline if available
+            yt_title = ""
+            if item:
+                yt_title = (item.get("content", {}).get("headline") or "")[:100]
+            if not yt_title:
+                yt_title = post_text[:100]
+            return await _upload_youtube_video(access_token, video_url, yt_title, post_text)
+        return await _post_youtube(access_token, conn_data.get("platform_user_id", ""), post_text, image_url)
+
+    raise HTTPException(400, f"Direct posting to {platform} is not yet supported.")
+
+
+def _record_published(user_id: int, library_item_id: int, platform: str, result: dict) -> None:
+    # Mark as published for all outcomes — including script_ready
+    # (the script was "sent" — it's done from HomeBridge's perspective)
+    database.library_update(library_item_id, user_id, {
+        "status":       "published",
+        "published_at": datetime.utcnow().isoformat(),
+    })
+    database.log_platform_post(
+        user_id=user_id,
+        library_item_id=library_item_id,
+        platform=platform,
+        post_id=result.get("id", ""),
+        post_url=result.get("url", ""),
+    )
+
+
+async def publish_queued_item(row: dict) -> dict:
+    """
+    Post one claimed distribution_queue row — the drip worker's unit of work
+    (distribution_worker.py). Same text formatting, verify footer, saved image
+    and published bookkeeping as POST /social/post. Raises HTTPException: 4xx
+    means the member has to act (no/expired connection, item not approved),
+    anything else is a platform failure worth retrying.
+    """
+    user_id  = row["userId"]
+    platform = row["platform"]
+
+    conn_data = database.get_platform_connection(user_id, platform)
+    if not conn_data:
+        raise HTTPException(400, f"No {platform} account connected.")
+    if _is_expired(conn_data.get("expires_at", "")):
+        raise HTTPException(401, f"{platform} connection has expired.")
+
+    item = database.library_get_item(row["libraryItemId"], user_id)
+    if not item:
+        raise HTTPException(404, "Content item not found.")
+    if item["status"] not in ("approved", "published"):
+        raise HTTPException(400, "Content must be approved before posting.")
+    post_text = _format_post_text(item.get("content", {}), platform)
+    if not post_text:
+        raise HTTPException(400, "No content to post.")
+    if item.get("cir_id"):
+        _vfooter = _verify_footer_line(item.get("cir_id"), user_id)
+        if _vfooter:
+            post_text = f"{post_text}\n\n{_vfooter}"
+
+    result = await _dispatch_post(platform, conn_data, user_id, post_text,
+                                  image_url=item.get("image_url") or None, item=item)
+    try:
+        _record_published(user_id, row["libraryItemId"], platform, result)
+    except Exception as e:
+        # Already live on the platform — report success so it is not re-posted.
+        print(f"[Distribution] Posted item {row['libraryItemId']} to {platform} but bookkeeping failed: {e}")
+    return result
+
+
 # ─────────────────────────────────────────────
 # PLATFORM POSTING — LinkedIn
 # ─────────────────────────────────────────────
@@ -822,7 +879,7 @@ async def _post_linkedin(access_token: str, person_urn: str, text: str, image_ur
             else:
                 image_bytes = None
 
-            async with httpx.AsyncClient(timeout=30) as client:
+            async with upstream_client("linkedin", timeout=30) as client:
                 reg = await client.post(
                     "https://api.linkedin.com/v2/assets?action=registerUpload",
                     json={"registerUploadRequest": {
@@ -869,7 +926,7 @@ async def _post_linkedin(access_token: str, person_urn: str, text: str, image_ur
             "visibility": {"com.linkedin.ugc.MemberNetworkVisibility": "PUBLIC"},
         }
 
-    async with httpx.AsyncClient() as client:
+    async with upstream_client("linkedin") as client:
         resp = await client.post(
             "https://api.linkedin.com/v2/ugcPosts", json=payload,
             headers={"Authorization": f"Bearer {access_token}", "Content-Type": "application/json", "X-Restli-Protocol-Version": "2.0.0"}
@@ -886,7 +943,7 @@ async def _post_linkedin(access_token: str, person_urn: str, text: str, image_ur
 # PLATFORM POSTING — Google Business Profile
 # ─────────────────────────────────────────────
 async def _post_google(access_token: str, text: str) -> dict:
-    async with httpx.AsyncClient() as client:
+    async with upstream_client("google") as client:
         accts = await client.get("https://mybusinessaccountmanagement.googleapis.com/v1/accounts", headers={"Authorization": f"Bearer {access_token}"})
         acct_data = accts.json()
 
@@ -896,7 +953,7 @@ async def _post_google(access_token: str, text: str) -> dict:
 
     account_name = accounts[0]["name"]
 
-    async with httpx.AsyncClient() as client:
+    async with upstream_client("google") as client:
         locs     = await client.get(f"https://mybusinessbusinessinformation.googleapis.com/v1/{account_name}/locations", params={"readMask": "name,title"}, headers={"Authorization": f"Bearer {access_token}"})
         loc_data = locs.json()
 
@@ -906,7 +963,7 @@ async def _post_google(access_token: str, text: str) -> dict:
 
     location_name = locations[0]["name"]
 
-    async with httpx.AsyncClient() as client:
+    async with upstream_client("google") as client:
         resp = await client.post(
             f"https://mybusiness.googleapis.com/v4/{location_name}/localPosts",
             json={"languageCode": "en-US", "summary": text[:1500], "topicType": "STANDARD"},
@@ -942,14 +999,14 @@ async def _post_facebook(access_token: str, user_id: str, text: str, image_url:
 
     # If we have a page token but no page_id, extract page_id from the token owner
     if not page_id:
-        async with httpx.AsyncClient(timeout=10) as client:
+        async with upstream_client("facebook", timeout=10) as client:
             me = await client.get("https://graph.facebook.com/me", params={"access_token": page_token, "fields": "id"})
             page_id = me.json().get("id", "")
 
     post_data   = {"message": text, "access_token": page_token}
     fb_endpoint = f"https://graph.facebook.com/v19.0/{page_id}/feed"
 
-    async with httpx.AsyncClient() as client:
+    async with upstream_client("facebook") as client:
         if image_url:
             import base64 as _base64
             # Handle base64 data URI — send raw bytes to Facebook /photos endpoint
@@ -1000,7 +1057,7 @@ async def _post_youtube(access_token: str, channel_id: str, text: str, image_url
     }
 
     try:
-        async with httpx.AsyncClient(timeout=30) as client:
+        async with upstream_client("google", timeout=30) as client:
             resp = await client.post(
                 "https://www.googleapis.com/youtube/v3/communityPosts",
                 params={"part": "snippet"},
@@ -1041,13 +1098,8 @@ async def _post_youtube(access_token: str, channel_id: str, text: str, image_url
 # SendGrid email + Twilio SMS for content approval flow
 # ─────────────────────────────────────────────
 
-async def send_approval_email(to_email: str, agent_name: str, headline: str, approve_url: str):
-    """Send approval request email via SendGrid. Raises on failure."""
-    sendgrid_key  = os.getenv("SENDGRID_API_KEY", "")
-    sendgrid_from = os.getenv("SENDGRID_FROM_EMAIL", "noreply@homebridgegroup.co")
-    if not sendgrid_key:
-        raise RuntimeError("SENDGRID_API_KEY not configured.")
-
+def _approval_email_parts(agent_name: str, headline: str, approve_url: str) -> tuple:
+    """(subject, text, html) for the approval-request email."""
     subject   = "Content ready for your approval — HomeBridge"
     body_text = (
         "Hi " + agent_name + ",\n\n"
@@ -1080,16 +1132,54 @@ async def send_approval_email(to_email: str, agent_name: str, headline: str, app
         'If you did not request this, you can ignore this email.</p>'
         '</div></div>'
     )
+    return subject, body_text, body_html
 
-    async with httpx.AsyncClient(timeout=15) as client:
-        resp = await client.post(
-            "https://api.sendgrid.com/v3/mail/send",
+
+async def send_approval_email(to_email: str, agent_name: str, headline: str, approve_url: str):
+    """Send approval request email via SendGrid. Raises on failure."""
+    await send_approval_email_batch(
+        [{"to_email": to_email, "agent_name": agent_name, "headline": headline, "approve_url": approve_url}],
+    )
+
+
+async def send_approval_email_batch(recipients: list) -> int:
+    """
+    Send the approval email to many recipients with one SendGrid request per
+    SENDGRID_MAX_PERSONALIZATIONS. The template is rendered once with -tag-
+    placeholders. Each recipient is one personalization carrying its own
+    substitutions, so every member still gets a private, individual email.
+    recipients: [{"to_email", "agent_name", "headline", "approve_url"}].
+    Raises on the first failed request. Returns the number of requests made.
+    """
+    sendgrid_key  = os.getenv("SENDGRID_API_KEY", "")
+    sendgrid_from = os.getenv("SENDGRID_FROM_EMAIL", "noreply@homebridgegroup.co")
+    if not sendgrid_key:
+        raise RuntimeError("SENDGRID_API_KEY not configured.")
+    if not recipients:
+        return 0
+
+    subject, body_text, body_html = _approval_email_parts("-agent_name-", "-headline-", "-approve_url-")
+    personalizations = [
+        {
+            "to": [{"email": r["to_email"]}],
+            "substitutions": {
+                "-agent_name-":  r.get("agent_name") or "there",
+                "-headline-":    r.get("headline") or "",
+                "-approve_url-": r.get("approve_url") or "",
+            },
+        }
+        for r in recipients
+    ]
+
+    async def _post(c, chunk):
+        resp = await c.post(
+            SENDGRID_API_URL,
             headers={
                 "Authorization": f"Bearer {sendgrid_key}",
                 "Content-Type": "application/json",
             },
             json={
-                "personalizations": [{"to": [{"email": to_email}]}],
+                "personalizations": chunk,
                 "from": {"email": sendgrid_from, "name": "HomeBridge"},
                 "subject": subject,
                 "content": [
@@ -1098,8 +1188,15 @@ async def send_approval_email(to_email: str, agent_name: str, headline: str, app
                 ],
             },
         )
-    if resp.status_code not in (200, 202):
-        raise RuntimeError(f"SendGrid error {resp.status_code}: {resp.text}")
+        if resp.status_code not in (200, 202):
+            raise RuntimeError(f"SendGrid error {resp.status_code}: {resp.text}")
+
+    step   = SENDGRID_MAX_PERSONALIZATIONS
+    chunks = [personalizations[i:i + step] for i in range(0, len(personalizations), step)]
+    async with upstream_client("sendgrid", timeout=30) as client:
+        for chunk in chunks:
+            await _post(client, chunk)
+    return len(chunks)
 
 
 async def send_approval_sms(to_phone: str, agent_name: str, headline: str, approve_url: str):
@@ -1127,7 +1224,7 @@ async def send_approval_sms(to_phone: str, agent_name: str, headline: str, appro
         short_headline = headline[:max(20, 60 - overage)] + "…"
         message = f'AutoMates: "{short_headline}" ready. Tap: {approve_url}'
 
-    async with httpx.AsyncClient(timeout=15) as client:
+    async with upstream_client("twilio", timeout=15) as client:
         resp = await client.post(
             f"https://api.twilio.com/2010-04-01/Accounts/{account_sid}/Messages.json",
             auth=(account_sid, auth_token),
@@ -0,0 +1,24 @@
+"""
+Shared test setup. The app modules read DB_PATH and JWT_SECRET at import time,
+so both are pointed at throwaway values before anything is imported.
+"""
+
+import os
+import sys
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="homebridge-tests-")
+os.environ["DB_PATH"] = os.path.join(_tmp, "test.db")
+os.environ.setdefault("JWT_SECRET", "test-secret-" + "x" * 40)
+os.environ.setdefault("SENDGRID_API_KEY", "test-key")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def db():
+    import database
+    database.init_db()
+    return database
@@ -0,0 +1,67 @@
+"""
+sendgrid_stub.py — local stand-in for SendGrid's v3 mail/send endpoint.
+
+Point social.SENDGRID_API_URL at SendGridStub.url. Every request body is kept
+in .requests. A request whose personalizations include an address in
+.reject is answered 400, which is how SendGrid fails a whole request over one
+bad recipient. Setting .status (e.g. 401 for a revoked API key) answers every
+request with that code instead. Everything else gets a 202.
+
+Also runnable on its own for manual checks:
+    python tests/sendgrid_stub.py 8799
+"""
+
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class SendGridStub:
+    def __init__(self, port: int = 0):
+        self.requests = []
+        self.reject   = set()
+        self.status   = None
+        self._lock    = threading.Lock()
+        stub = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with stub._lock:
+                    stub.requests.append(body)
+                    rejected = any(p["to"][0]["email"] in stub.reject for p in body.get("personalizations", []))
+                    status   = stub.status or (400 if rejected else 202)
+                reply = b'{"errors":[{"message":"request refused"}]}' if status >= 400 else b""
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(reply)))
+                self.end_headers()
+                self.wfile.write(reply)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self.url     = f"http://127.0.0.1:{self._server.server_address[1]}/v3/mail/send"
+
+    def start(self) -> "SendGridStub":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests.clear()
+            self.reject.clear()
+            self.status = None
+
+
+if __name__ == "__main__":
+    stub = SendGridStub(int(sys.argv[1]) if len(sys.argv) > 1 else 8799)
+    print(f"SendGrid stub listening on {stub.url}")
+    stub._server.serve_forever()
@@ -0,0 +1,56 @@
+"""Drip-worker admission: only the claim winner spends rate-limit budget (user-022)."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+PLATFORM = "linkedin"
+
+
+@pytest.fixture
+def worker(db, monkeypatch):
+    import distribution_worker
+    conn = db.get_conn()
+    conn.execute("DELETE FROM distribution_queue")
+    conn.execute("DELETE FROM rate_limit_state")
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(distribution_worker, "DISTRIBUTION_CONNECTION_PER_HOUR", 2)
+    monkeypatch.setattr(distribution_worker, "_connection_limiter", None)
+    return distribution_worker
+
+
+def _due_rows(db, user_id, n):
+    due = (datetime.utcnow() - timedelta(minutes=1)).isoformat()
+    for item_id in range(1, n + 1):
+        db.distribution_enqueue(user_id, 9000 + item_id, PLATFORM, due)
+    return sorted(db.distribution_get_due(platform=PLATFORM), key=lambda r: r["id"])
+
+
+def _status(db, qid):
+    conn = db.get_conn()
+    row = conn.execute("SELECT status, scheduled_for FROM distribution_queue WHERE id = ?", (qid,)).fetchone()
+    conn.close()
+    return dict(row)
+
+
+def test_lost_claim_leaves_the_connection_budget_untouched(db, worker):
+    a, b, c = _due_rows(db, 501, 3)
+
+    # Two worker loops see the same due row; only the first claims it.
+    assert worker._admit(a, PLATFORM) == "claimed"
+    assert worker._admit(a, PLATFORM) == "lost"
+
+    # The loser spent nothing, so the member's second post this hour still goes out.
+    assert worker._admit(b, PLATFORM) == "claimed"
+    assert worker._admit(c, PLATFORM) == "deferred"
+
+
+def test_connection_cap_releases_the_claim_and_defers_the_row(db, worker):
+    rows = _due_rows(db, 502, 3)
+    before = rows[2]["scheduledFor"]
+
+    assert [worker._admit(r, PLATFORM) for r in rows] == ["claimed", "claimed", "deferred"]
+    deferred = _status(db, rows[2]["id"])
+    assert deferred["status"] == "queued"
+    assert deferred["scheduled_for"] > before
@@ -0,0 +1,137 @@
+"""Approval-email batching against the local SendGrid stub (user-024)."""
+
+import asyncio
+
+import pytest
+
+from sendgrid_stub import SendGridStub
+
+
+@pytest.fixture(scope="module")
+def stub():
+    s = SendGridStub().start()
+    yield s
+    s.stop()
+
+
+@pytest.fixture
+def sendgrid(db, stub, monkeypatch):
+    import social
+    monkeypatch.setattr(social, "SENDGRID_API_URL", stub.url)
+    monkeypatch.setattr(social, "SENDGRID_MAX_PERSONALIZATIONS", 3)
+    stub.reset()
+    conn = db.get_conn()
+    conn.execute("DELETE FROM notification_outbox")
+    conn.execute("DELETE FROM notification_batches")
+    conn.commit()
+    conn.close()
+    return stub
+
+
+def _recipient(i):
+    return {"to_email": f"agent{i}@example.com", "agent_name": f"Agent {i}",
+            "headline": f"Headline {i}", "approve_url": f"https://app.test/a/{i}"}
+
+
+def _claimed_rows(db, emails):
+    for i, email in enumerate(emails):
+        db.notification_enqueue("email", email, {
+            "template": "approval", "agent_name": f"Agent {i}",
+            "headline": f"Headline {i}", "approve_url": f"https://app.test/a/{i}",
+        })
+    rows = db.notification_get_due(limit=100)
+    won  = set(db.notification_claim_many([r["id"] for r in rows]))
+    return [r for r in rows if r["id"] in won]
+
+
+def _deliver(rows):
+    import notifications
+
+    async def _run():
+        slots = asyncio.Semaphore(4)
+        groups = notifications._group_for_delivery(notifications._drop_invalid(rows))
+        for channel, template, group in groups:
+            await notifications._deliver_batch(channel, template, group, slots)
+    asyncio.run(_run())
+
+
+def _outbox(db):
+    conn = db.get_conn()
+    rows = {r["recipient"]: dict(r) for r in conn.execute("SELECT * FROM notification_outbox")}
+    conn.close()
+    return rows
+
+
+def _batches(db):
+    conn = db.get_conn()
+    rows = [dict(r) for r in conn.execute("SELECT * FROM notification_batches ORDER BY id")]
+    conn.close()
+    return rows
+
+
+def test_personalizations_are_chunked_with_per_recipient_substitutions(sendgrid):
+    import social
+    requests_made = asyncio.run(social.send_approval_email_batch([_recipient(i) for i in range(7)]))
+
+    assert requests_made == 3
+    assert [len(r["personalizations"]) for r in sendgrid.requests] == [3, 3, 1]
+    body = sendgrid.requests[0]
+    assert "-agent_name-" in body["content"][1]["value"]
+    assert "-approve_url-" in body["content"][1]["value"]
+    sent = [p for r in sendgrid.requests for p in r["personalizations"]]
+    for i, p in enumerate(sent):
+        assert p["to"] == [{"email": f"agent{i}@example.com"}]
+        assert p["substitutions"] == {
+            "-agent_name-":  f"Agent {i}",
+            "-headline-":    f"Headline {i}",
+            "-approve_url-": f"https://app.test/a/{i}",
+        }
+
+
+def test_each_provider_request_is_recorded_as_a_batch(db, sendgrid):
+    rows = _claimed_rows(db, [f"agent{i}@example.com" for i in range(5)])
+    _deliver(rows)
+
+    batches = _batches(db)
+    assert [(b["channel"], b["template"], b["size"], b["status"]) for b in batches] == [
+        ("email", "approval", 3, "sent"),
+        ("email", "approval", 2, "sent"),
+    ]
+    assert len(sendgrid.requests) == 2
+    outbox = _outbox(db)
+    assert {r["status"] for r in outbox.values()} == {"sent"}
+    assert sorted(r["batch_id"] for r in outbox.values()) == sorted(
+        [batches[0]["id"]] * 3 + [batches[1]["id"]] * 2)
+
+
+def test_rejected_batch_is_split_so_only_the_bad_recipient_gives_up(db, sendgrid):
+    emails = [f"agent{i}@example.com" for i in range(3)]
+    sendgrid.reject.add("agent1@example.com")
+    _deliver(_claimed_rows(db, emails))
+
+    outbox = _outbox(db)
+    assert outbox["agent1@example.com"]["status"] == "failed"
+    assert outbox["agent0@example.com"]["status"] == "sent"
+    assert outbox["agent2@example.com"]["status"] == "sent"
+    statuses = [b["status"] for b in _batches(db)]
+    assert statuses[0] == "split"
+    assert statuses.count("failed") == 1
+
+
+def test_malformed_address_never_joins_a_batch(db, sendgrid):
+    _deliver(_claimed_rows(db, ["agent0@example.com", "not-an-email", "a@b@example.com"]))
+
+    outbox = _outbox(db)
+    assert outbox["not-an-email"]["status"] == "failed"
+    assert outbox["a@b@example.com"]["status"] == "failed"
+    assert outbox["agent0@example.com"]["status"] == "sent"
+    assert [len(r["personalizations"]) for r in sendgrid.requests] == [1]
+
+
+def test_account_level_refusal_fails_the_batch_once_and_stays_retryable(db, sendgrid):
+    sendgrid.status = 401   # revoked API key: every request would fail the same way
+    _deliver(_claimed_rows(db, [f"agent{i}@example.com" for i in range(3)]))
+
+    assert len(sendgrid.requests) == 1
+    assert {r["status"] for r in _outbox(db).values()} == {"queued"}
+    assert [(b["size"], b["status"]) for b in _batches(db)] == [(3, "failed")]
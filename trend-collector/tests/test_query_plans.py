@@ -0,0 +1,101 @@
+"""
+Hot read paths must stay on an index (user-003).
+
+Each case calls the real function or public route and records every statement
+it sends to SQLite through the connection trace callback. It then runs
+EXPLAIN QUERY PLAN on each read, so the plan checked is always the one for
+the SQL that actually ships. Any "SCAN <table>" step without an index fails.
+"""
+
+import sqlite3
+
+import pytest
+
+SLUG = "plan-agent-austin"
+CIR  = "CIR-PLAN-0001"
+
+
+@pytest.fixture(scope="module")
+def seeded(db):
+    conn = db.get_conn()
+    c    = conn.cursor()
+    c.execute("""INSERT OR IGNORE INTO users (email, password_hash, agent_name, agent_slug)
+                 VALUES ('plans@example.com', 'x', 'Plan Agent', ?)""", (SLUG,))
+    uid = c.execute("SELECT id FROM users WHERE agent_slug = ?", (SLUG,)).fetchone()["id"]
+    conn.commit()
+    conn.close()
+    db.save_agent_setup(uid, {"market": "Austin, TX", "primaryNiches": ["first-time buyers"]})
+    db.library_save(uid, "first-time buyers", {"headline": "Rates", "content": "x" * 300},
+                    {"verdict": "pass"})
+    conn = db.get_conn()
+    conn.execute("""UPDATE content_library SET status = 'approved', approved_at = datetime('now'),
+                    cir_id = ? WHERE user_id = ?""", (CIR, uid))
+    conn.commit()
+    conn.close()
+    return uid
+
+
+@pytest.fixture
+def traced(db, monkeypatch):
+    """Collect the SQL of every statement run on a pooled connection."""
+    statements = []
+    acquire = db._pool.acquire
+
+    def _acquire():
+        conn = acquire()
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    monkeypatch.setattr(db._pool, "acquire", _acquire)
+    yield statements
+    db._pool.close_all()  # don't hand traced connections to later tests
+
+
+def _full_scans(statements):
+    import os
+    conn = sqlite3.connect(os.environ["DB_PATH"])
+    offenders = []
+    try:
+        for sql in statements:
+            if not sql.lstrip().upper().startswith(("SELECT", "WITH")):
+                continue
+            for row in conn.execute("EXPLAIN QUERY PLAN " + sql):
+                detail = row[3]
+                if detail.startswith("SCAN ") and " USING " not in detail:
+                    offenders.append((detail, " ".join(sql.split())))
+    finally:
+        conn.close()
+    return offenders
+
+
+def _client():
+    from fastapi.testclient import TestClient
+    import app
+    return TestClient(app.app)  # no `with`: keeps the background workers off
+
+
+HOT_PATHS = {
+    "library_get_all":      lambda db, uid: db.library_get_all(uid),
+    "get_voice_exemplars":  lambda db, uid: db.get_voice_exemplars(uid),
+    "get_agent_guidance":   lambda db, uid: db.get_agent_guidance(uid),
+    "signals_dedupe_check": lambda db, uid: db.signals_dedupe_check(uid, "https://example.com/a", "Headline"),
+    "signals_get_latest":   lambda db, uid: db.signals_get_latest(uid),
+    "schedules_get_due":    lambda db, uid: db.schedules_get_due(),
+    "distribution_get_due": lambda db, uid: db.distribution_get_due(),
+    "distribution_get_due(platform, skip_paused)":
+        lambda db, uid: db.distribution_get_due(platform="linkedin", skip_paused=True),
+    "public_agent_profile": lambda db, uid: _client().get(f"/public/agent/{SLUG}"),
+    "public_agent_rss":     lambda db, uid: _client().get(f"/public/agent/{SLUG}/feed"),
+    "public_agent_sitemap": lambda db, uid: _client().get(f"/public/agent/{SLUG}/sitemap.xml"),
+    "public_verify_cir":    lambda db, uid: _client().get(f"/public/verify/{CIR}"),
+}
+
+
+@pytest.mark.parametrize("name", list(HOT_PATHS))
+def test_hot_path_reads_use_an_index(name, db, seeded, traced):
+    _client()  # import app before tracing so its startup-time reads aren't counted
+    traced.clear()
+    HOT_PATHS[name](db, seeded)
+
+    assert any(s.lstrip().upper().startswith(("SELECT", "WITH")) for s in traced), "no reads traced"
+    assert _full_scans(traced) == []